@@ -0,0 +1,108 @@
+"""
+Сравнение проверки дубликатов: линейный поиск по истории против LRU/TTL кэша.
+
+Запуск: PYTHONPATH=src python -m benchmarks.bench_dedup
+
+С --mongo дополнительно сохраняет сообщения через DialogueService.save_message
+в базу из настроек (MONGO__URL, MONGO__DB_NAME): каждое сообщение канал
+присылает дважды, повтор отсекается либо кэшем, либо уникальным индексом.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import timeit
+
+from beanie import PydanticObjectId
+from starlette.requests import Request
+
+from app.services.dedup import MessageDeduplicator
+from app.services.dialogue_service import DialogueService
+from core import settings
+from core.database import initialize_database
+from core.database.models.dialogue import DialogueMessage, MessageRole
+from core.settings_model import DedupSettings
+
+HISTORY_SIZES = [100, 1_000, 10_000, 100_000]
+LOOKUPS = 1_000
+MONGO_MESSAGES = 2_000
+
+
+def bench_linear_scan(history: list[str], message_id: str) -> float:
+    """Прежняя проверка: any(m.message_id == msg.message_id for m in message_list)."""
+    timer = timeit.Timer(lambda: any(m == message_id for m in history))
+    return min(timer.repeat(repeat=3, number=LOOKUPS)) / LOOKUPS
+
+
+def bench_cache(history: list[str], message_id: str) -> float:
+    bot_id = PydanticObjectId()
+    deduplicator = MessageDeduplicator(DedupSettings(cache_size=len(history) + 1, ttl=600))
+    for m in history:
+        deduplicator.remember(bot_id, m)
+
+    timer = timeit.Timer(lambda: deduplicator.is_duplicate(bot_id, message_id))
+    return min(timer.repeat(repeat=3, number=LOOKUPS)) / LOOKUPS
+
+
+async def bench_save_message(use_deduplicator: bool) -> tuple[float, int]:
+    """Время на одно входящее сообщение (с учётом повторов) и число запросов insert в Mongo."""
+    service = DialogueService(Request({"type": "http", "headers": []}))
+    deduplicator = MessageDeduplicator(settings.dedup)
+    bot_id, dialogue_id = PydanticObjectId(), PydanticObjectId()
+    inserts = 0
+
+    started = time.perf_counter()
+    for i in range(MONGO_MESSAGES):
+        # Исходное сообщение и горячий ретрай канала сразу за ним
+        for _ in range(2):
+            message_id = f"message-{i}"
+            if use_deduplicator and deduplicator.is_duplicate(bot_id, message_id):
+                continue
+            inserts += 1
+            await service.save_message(
+                DialogueMessage(
+                    dialogue_id=dialogue_id,
+                    chat_bot_id=bot_id,
+                    message_id=message_id,
+                    chat_id="bench",
+                    text="hi",
+                    role=MessageRole.USER,
+                ),
+            )
+            deduplicator.remember(bot_id, message_id)
+    elapsed = time.perf_counter() - started
+
+    await DialogueMessage.find(DialogueMessage.chat_bot_id == bot_id).delete()
+    return elapsed / (MONGO_MESSAGES * 2), inserts
+
+
+async def bench_mongo() -> None:
+    await initialize_database()
+    sys.stdout.write(f"\n{MONGO_MESSAGES} messages x2 via save_message\n")
+    sys.stdout.write(f"{'mode':>14} | {'per message, us':>16} | {'inserts':>8}\n")
+    for name, use_deduplicator in (("index only", False), ("deduplicator", True)):
+        per_message, inserts = await bench_save_message(use_deduplicator)
+        sys.stdout.write(f"{name:>14} | {per_message * 1e6:>16.1f} | {inserts:>8}\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo", action="store_true", help="Сохранять сообщения в Mongo через save_message")
+    args = parser.parse_args()
+
+    sys.stdout.write(f"{'messages':>10} | {'linear scan, us':>16} | {'cache, us':>10}\n")
+    for size in HISTORY_SIZES:
+        history = [f"message-{i}" for i in range(size)]
+        # Новое сообщение: линейный поиск проходит всю историю
+        new_message_id = "message-new"
+        linear = bench_linear_scan(history, new_message_id) * 1e6
+        cached = bench_cache(history, new_message_id) * 1e6
+        sys.stdout.write(f"{size:>10} | {linear:>16.2f} | {cached:>10.2f}\n")
+
+    if args.mongo:
+        asyncio.run(bench_mongo())
+
+
+if __name__ == "__main__":
+    main()
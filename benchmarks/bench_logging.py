@@ -0,0 +1,140 @@
+"""
+Стоимость одной строки access-лога uvicorn: прежний конвейер против нового.
+
+Запуск: PYTHONPATH=src python -m benchmarks.bench_logging
+
+Строки пишутся во временный файл, а в сценариях "slow output" - в вывод,
+каждая запись в который стоит SLOW_WRITE секунд.
+"в запросе" - время, которое тратит поток запроса; "всего" - вместе с
+дозаписью очереди фоновым потоком.
+"""
+
+import asyncio
+import inspect
+import logging
+import sys
+import time
+from tempfile import TemporaryFile
+from typing import TYPE_CHECKING, TextIO, cast
+
+from loguru import logger
+
+from core.logs import UvicornHandler, configure_logger
+from core.settings_model import LogSettings
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+RECORDS = 20_000
+# Задержка записи в медленный вывод: pipe в сборщик логов, терминал
+SLOW_WRITE = 0.0002
+
+
+class SlowStream:
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+
+    def write(self, message: str) -> int:
+        time.sleep(SLOW_WRITE)
+        return self.stream.write(message)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def isatty(self) -> bool:
+        return False
+
+
+class LegacyUvicornHandler(logging.Handler):
+    """UvicornHandler до оптимизации: поиск уровня и обход кадров на каждую строку."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        level: str | int
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+
+        frame, depth = inspect.currentframe(), 0
+        while frame and (depth == 0 or frame.f_code.co_filename == logging.__file__):
+            frame = frame.f_back
+            depth += 1
+
+        if record.name == "uvicorn.access":
+            level = "REQUEST"
+
+        logger.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
+
+
+def access_logger(handler: logging.Handler) -> logging.Logger:
+    access = logging.getLogger("uvicorn.access")
+    access.handlers = [handler]
+    access.propagate = False
+    access.setLevel(logging.INFO)
+    return access
+
+
+async def complete() -> None:
+    await logger.complete()
+
+
+def run(
+    config: LogSettings,
+    handler: logging.Handler,
+    request_id: bool = False,
+    loguru_enqueue: bool = False,
+    slow: bool = False,
+) -> tuple[float, float]:
+    with TemporaryFile("w") as file:
+        sink = cast("TextIO", SlowStream(file)) if slow else file
+        configure_logger(config, sink=sink)
+        if loguru_enqueue:
+            logger.remove()
+            logger.add(sink, format="{time} | {level} | {message}\n", enqueue=True)
+        access = access_logger(handler)
+
+        def emit() -> None:
+            for i in range(RECORDS):
+                access.info('%s - "%s %s HTTP/%s" %d', "127.0.0.1:52000", "POST", f"/api/webhook/{i}", "1.1", 202)
+
+        started = time.perf_counter()
+        if request_id:
+            with logger.contextualize(request_id="0123456789abcdef"):
+                emit()
+        else:
+            emit()
+        emitted = time.perf_counter() - started
+        asyncio.run(complete())
+        total = time.perf_counter() - started
+        logger.remove()
+    return emitted / RECORDS, total / RECORDS
+
+
+def main() -> None:
+    scenarios: list[tuple[str, Callable[[], tuple[float, float]]]] = [
+        (
+            "before: sync, diagnose, frame walk",
+            lambda: run(LogSettings(enqueue=False, diagnose=True), LegacyUvicornHandler()),
+        ),
+        ("sync, fast access path", lambda: run(LogSettings(enqueue=False), UvicornHandler())),
+        (
+            "loguru enqueue=True",
+            lambda: run(LogSettings(enqueue=False), UvicornHandler(), loguru_enqueue=True),
+        ),
+        ("after: enqueue, text", lambda: run(LogSettings(), UvicornHandler())),
+        ("after: enqueue, json, request_id", lambda: run(LogSettings(format="json"), UvicornHandler(), True)),
+        ("after: enqueue, sampled 10%", lambda: run(LogSettings(), UvicornHandler(sample_rate=0.1))),
+        (
+            "slow output, before",
+            lambda: run(LogSettings(enqueue=False, diagnose=True), LegacyUvicornHandler(), slow=True),
+        ),
+        ("slow output, after", lambda: run(LogSettings(queue_size=RECORDS), UvicornHandler(), slow=True)),
+    ]
+    sys.stdout.write(f"{'pipeline':<36} | {'in request, us':>14} | {'total, us':>9}\n")
+    for name, scenario in scenarios:
+        emitted, total = scenario()
+        sys.stdout.write(f"{name:<36} | {emitted * 1e6:>14.2f} | {total * 1e6:>9.2f}\n")
+
+
+if __name__ == "__main__":
+    main()
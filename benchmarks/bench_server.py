@@ -0,0 +1,84 @@
+"""
+Сравнение профилей сервера: один воркер на asyncio и h11 против продового.
+
+Запуск: PYTHONPATH=src python -m benchmarks.bench_server --requests 2000 --concurrency 100
+
+Каждый профиль - набор переменных SERVER__*, сервер запускается через
+main.main, как в проде. uvloop и httptools используются, только если
+установлены (uvicorn[standard]); без них профили различаются воркерами.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+from typing import Any
+
+from benchmarks import load_test
+from core.settings_model import ServerSettings
+from main import resolve_http, resolve_loop, worker_count
+
+PROFILES: dict[str, dict[str, str]] = {
+    "dev": {"SERVER__WORKERS": "1", "SERVER__LOOP": "asyncio", "SERVER__HTTP": "h11"},
+    "fast-loop": {"SERVER__WORKERS": "1", "SERVER__LOOP": "auto", "SERVER__HTTP": "auto"},
+    "production": {
+        "SERVER__WORKERS": "0",
+        "SERVER__LOOP": "auto",
+        "SERVER__HTTP": "auto",
+        "SERVER__BACKLOG": "4096",
+        # Несколько воркеров обрабатывают один чат по очереди только с блокировкой в Mongo
+        "REPLY_WORKER__CHAT_LOCK": "true",
+    },
+}
+
+
+def describe(env: dict[str, str]) -> str:
+    config = ServerSettings.model_validate(
+        {key.removeprefix("SERVER__").lower(): value for key, value in env.items() if key.startswith("SERVER__")},
+    )
+    return f"{worker_count(config)}w {resolve_loop(config)}/{resolve_http(config)}"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="Запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=100, help="Одновременных запросов")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        default=["webhook", "channels_list"],
+        choices=["webhook", "channels_list", "channels_create"],
+    )
+    parser.add_argument("--output", type=Path, default=Path("bench_server.json"))
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results: dict[str, Any] = {}
+    for profile in args.profiles:
+        run_args = argparse.Namespace(
+            requests=args.requests,
+            concurrency=args.concurrency,
+            chats=100,
+            channels=100,
+            scenarios=args.scenarios,
+            uvicorn_workers=0,
+            delivery_timeout=30.0,
+        )
+        results[profile] = asyncio.run(load_test.run(run_args, server_env=PROFILES[profile]))
+    args.output.write_text(json.dumps(results, indent=2))
+
+    sys.stdout.write(f"{'profile':<12} {'server':<24} {'scenario':<16} {'rps':>8} {'p50 ms':>8} {'p99 ms':>8}\n")
+    for profile, result in results.items():
+        for item in result["scenarios"]:
+            sys.stdout.write(
+                f"{profile:<12} {describe(PROFILES[profile]):<24} {item['scenario']:<16} {item['rps']:>8.1f} "
+                f"{item['latency_ms']['p50']:>8.1f} {item['latency_ms']['p99']:>8.1f}\n",
+            )
+
+
+if __name__ == "__main__":
+    main()
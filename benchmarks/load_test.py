@@ -0,0 +1,284 @@
+"""
+Нагрузочный тест вебхука и API каналов.
+
+Запуск в процессе через ASGI (LLM заменена мгновенной заглушкой):
+    PYTHONPATH=src python -m benchmarks.load_test --requests 2000 --concurrency 50
+
+Против uvicorn с несколькими воркерами (запускается автоматически):
+    PYTHONPATH=src python -m benchmarks.load_test --uvicorn-workers 4
+
+Результаты пишутся в JSON (--output). С --baseline результаты сравниваются
+с предыдущим прогоном, и скрипт завершается с кодом 1 при регрессии.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.app import app
+from benchmarks.stubs import StubChannel, free_port, patch_llm, serve_in_background
+from core import settings
+from core.database import initialize_database
+from core.database.models.channel import Channel
+from core.database.models.chat_bot import ChatBot
+
+BOT_TOKEN = "load-test-bot-token"  # noqa: S105
+OPCOUNTERS = ("insert", "query", "update", "delete", "getmore", "command")
+
+type RequestFactory = Callable[[int], Awaitable[httpx.Response]]
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def mongo_ops(mongo: AsyncIOMotorClient) -> int:
+    """Суммарное число операций сервера Mongo, в том числе из других процессов."""
+    status = await mongo.admin.command("serverStatus")
+    return sum(status["opcounters"][name] for name in OPCOUNTERS)
+
+
+async def run_scenario(
+    name: str,
+    send: RequestFactory,
+    requests: int,
+    concurrency: int,
+    mongo: AsyncIOMotorClient,
+) -> dict[str, Any]:
+    latencies: list[float] = []
+    statuses: Counter[str] = Counter()
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                response = await send(i)
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    ops_before = await mongo_ops(mongo)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    # Сам serverStatus тоже попадает в opcounters
+    ops = await mongo_ops(mongo) - ops_before - 1
+
+    return {
+        "scenario": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "duration_s": elapsed,
+        "rps": requests / elapsed,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50) * 1000,
+            "p95": percentile(latencies, 0.95) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+            "max": max(latencies, default=0) * 1000,
+        },
+        "mongo_ops_per_request": ops / requests,
+        "statuses": dict(statuses),
+    }
+
+
+async def prepare_data(channel_url: str, channels: int) -> None:
+    await ChatBot.find(ChatBot.secret_token == BOT_TOKEN).delete()
+    bot = ChatBot(name="Load test bot", secret_token=BOT_TOKEN)
+    await bot.insert()
+    await Channel.find(Channel.bot_id == str(bot.id)).delete()
+    await Channel(bot_id=str(bot.id), channel_url=channel_url, channel_token="load-test").insert()  # noqa: S106
+    if channels > 1:
+        await Channel.insert_many(
+            [
+                Channel(bot_id=f"load-test-{i}", channel_url=channel_url, channel_token="load-test")  # noqa: S106
+                for i in range(channels - 1)
+            ],
+        )
+
+
+@asynccontextmanager
+async def asgi_client() -> AsyncIterator[httpx.AsyncClient]:
+    async with (
+        app.router.lifespan_context(app),
+        httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as client,
+    ):
+        yield client
+
+
+@asynccontextmanager
+async def uvicorn_client(server_env: dict[str, str]) -> AsyncIterator[httpx.AsyncClient]:
+    """Запустить сервер через main.main, как в проде; профиль задаётся переменными SERVER__*."""
+    port = free_port()
+    env = (
+        os.environ
+        | {
+            "SERVER__HOST": "127.0.0.1",
+            "SERVER__PORT": str(port),
+            "SERVER__ACCESS_LOG": "false",
+            "LOG__LEVEL": "WARNING",
+        }
+        | server_env
+    )
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-c",
+        "import main; main.main('benchmarks.server:app')",
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/api/hello_world")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.2)
+            yield client
+    finally:
+        process.terminate()
+        await asyncio.wait_for(process.wait(), 30)
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], max_regression: float) -> list[str]:
+    """Вернуть список регрессий относительно предыдущего прогона."""
+    previous = {item["scenario"]: item for item in baseline["scenarios"]}
+    regressions = []
+    for item in results["scenarios"]:
+        before = previous.get(item["scenario"])
+        if before is None:
+            continue
+        if item["rps"] < before["rps"] * (1 - max_regression):
+            regressions.append(f"{item['scenario']}: rps {before['rps']:.1f} -> {item['rps']:.1f}")
+        regressions.extend(
+            f"{item['scenario']}: {q} {before['latency_ms'][q]:.1f}ms -> {item['latency_ms'][q]:.1f}ms"
+            for q in ("p95", "p99")
+            if item["latency_ms"][q] > before["latency_ms"][q] * (1 + max_regression)
+        )
+    return regressions
+
+
+async def run(args: argparse.Namespace, server_env: dict[str, str] | None = None) -> dict[str, Any]:
+    patch_llm()
+    await initialize_database()
+    mongo: AsyncIOMotorClient = AsyncIOMotorClient(settings.mongo.url)
+
+    stub = StubChannel()
+    stub_port = free_port()
+    stub_server, stub_task = await serve_in_background(stub.app, stub_port)
+    await prepare_data(f"http://127.0.0.1:{stub_port}/webhook", args.channels)
+
+    if args.uvicorn_workers:
+        server_env = {"SERVER__WORKERS": str(args.uvicorn_workers)} | (server_env or {})
+    client_context = uvicorn_client(server_env) if server_env is not None else asgi_client()
+    scenarios: list[dict[str, Any]] = []
+    run_id = int(time.time())
+    async with client_context as client:
+
+        async def send_message(i: int) -> httpx.Response:
+            return await client.post(
+                "/api/webhook/new_message",
+                json={
+                    "message_id": f"{run_id}-{i}",
+                    "chat_id": f"chat-{i % args.chats}",
+                    "text": "where is my order?",
+                    "message_sender": "customer",
+                },
+                headers={"Authorization": f"Bearer {BOT_TOKEN}"},
+            )
+
+        async def list_channels(i: int) -> httpx.Response:
+            return await client.get("/api/channels/")
+
+        async def create_channel(i: int) -> httpx.Response:
+            return await client.post(
+                "/api/channels/",
+                json={"bot_id": f"load-test-created-{i}", "channel_url": f"http://127.0.0.1:{stub_port}/webhook"},
+            )
+
+        available = {"webhook": send_message, "channels_list": list_channels, "channels_create": create_channel}
+        for name in args.scenarios:
+            result = await run_scenario(name, available[name], args.requests, args.concurrency, mongo)
+            scenarios.append(result)
+
+        if "webhook" in args.scenarios:
+            # Ответы генерируются в фоне, серии сообщений одного чата получают один ответ
+            started = time.perf_counter()
+            delivered = await stub.wait_until_quiet(quiet=1.0, max_wait=args.delivery_timeout)
+            webhook = scenarios[args.scenarios.index("webhook")]
+            webhook["replies_delivered"] = delivered
+            webhook["delivery_drain_s"] = time.perf_counter() - started
+
+    stub_server.should_exit = True
+    await stub_task
+
+    return {
+        "timestamp": datetime.now(UTC).isoformat(),
+        "python": platform.python_version(),
+        "mode": "uvicorn" if server_env is not None else "asgi",
+        "server_env": server_env,
+        "scenarios": scenarios,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="Запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=50, help="Одновременных запросов")
+    parser.add_argument("--chats", type=int, default=100, help="Различных chat_id в сценарии webhook")
+    parser.add_argument("--channels", type=int, default=100, help="Каналов в базе для сценария channels_list")
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        default=["webhook", "channels_list", "channels_create"],
+        choices=["webhook", "channels_list", "channels_create"],
+    )
+    parser.add_argument("--uvicorn-workers", type=int, default=0, help="Запустить uvicorn с N воркерами вместо ASGI")
+    parser.add_argument("--delivery-timeout", type=float, default=30.0, help="Сколько ждать доставки ответов, с")
+    parser.add_argument("--output", type=Path, default=Path("bench_results.json"))
+    parser.add_argument("--baseline", type=Path, help="Результаты предыдущего прогона для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.1, help="Допустимое ухудшение, доля")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results = asyncio.run(run(args))
+    args.output.write_text(json.dumps(results, indent=2))
+
+    for item in results["scenarios"]:
+        latency = item["latency_ms"]
+        sys.stdout.write(
+            f"{item['scenario']:>16}: {item['rps']:8.1f} rps | p50 {latency['p50']:7.2f} ms | "
+            f"p95 {latency['p95']:7.2f} ms | p99 {latency['p99']:7.2f} ms | "
+            f"mongo ops/req {item['mongo_ops_per_request']:5.2f} | {item['statuses']}\n",
+        )
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.max_regression)
+        for regression in regressions:
+            sys.stdout.write(f"REGRESSION {regression}\n")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""
+Приложение для запуска под uvicorn в нагрузочных тестах: LLM заменена мгновенной заглушкой.
+
+uvicorn импортирует его заново в каждом воркере, поэтому заглушка действует во всех процессах.
+"""
+
+from app.app import app
+from benchmarks.stubs import patch_llm
+
+patch_llm()
+
+__all__ = ["app"]
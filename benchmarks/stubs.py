@@ -0,0 +1,76 @@
+"""Заглушки для нагрузочных тестов: канал-приёмник и мгновенная LLM."""
+
+import asyncio
+import socket
+from collections.abc import Hashable
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+from app.services import context_builder
+from app.services.llm import llm
+from core import settings
+from core.database.models.dialogue import ContextMessage
+from predict.backends import MockBackend
+from predict.scheduler import LLMScheduler
+
+
+async def instant_summarize(
+    llm: LLMScheduler,
+    bot_id: Hashable,
+    summary: str | None,
+    chat_history: list[ContextMessage],
+) -> str:
+    return "Summary of the conversation"
+
+
+def patch_llm() -> None:
+    """
+    Убрать задержку заглушки LLM.
+
+    С LLM__BACKEND=openai запросы ответов идут в настроенный сервер, например в
+    predict.stub_server; summary в нагрузочных тестах не генерируется, чтобы не
+    смешивать его запросы с ответами.
+    """
+    if settings.llm.backend == "mock":
+        llm.backend = MockBackend(min_delay=0, max_delay=0)
+    context_builder.summarize = instant_summarize  # type: ignore[assignment]
+
+
+class StubChannel:
+    """Канал, принимающий ответы бота и считающий их."""
+
+    def __init__(self) -> None:
+        self.received = 0
+        self.app = FastAPI()
+        self.app.post("/webhook")(self.receive)
+
+    async def receive(self, request: Request) -> Response:
+        await request.body()
+        self.received += 1
+        return Response(status_code=200)
+
+    async def wait_until_quiet(self, quiet: float, max_wait: float) -> int:
+        """Дождаться, пока ответы перестанут приходить в течение quiet секунд, вернуть их число."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_wait
+        last_count, last_change = self.received, loop.time()
+        while loop.time() < deadline and loop.time() - last_change < quiet:
+            await asyncio.sleep(0.05)
+            if self.received != last_count:
+                last_count, last_change = self.received, loop.time()
+        return self.received
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def serve_in_background(app: FastAPI, port: int) -> tuple[uvicorn.Server, asyncio.Task[None]]:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:  # noqa: ASYNC110
+        await asyncio.sleep(0.01)
+    return server, task
@@ -3,15 +3,42 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
+from loguru import logger
 
 from app.routers import router as main_router
-from core.database import initialize_database
+from app.services.http_client import http_clients
+from app.services.live_push import live_hub
+from app.services.llm import llm
+from app.services.lookup_cache import lookup_cache
+from app.services.outbox import outbox_dispatcher
+from app.services.reply_worker import reply_pool
+from app.services.retention import retention_job
+from core import settings
+from core.database import close_client, initialize_database, warm_up
+from core.logs import RequestIdMiddleware, configure_logger
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None]:
+    # Воркеры uvicorn - отдельные процессы, настройка логов из main.py до них не доходит
+    configure_logger()
     await initialize_database()
+    await warm_up()
+    lookup_cache.start()
+    reply_pool.start()
+    outbox_dispatcher.start()
+    retention_job.start()
+    live_hub.start()
     yield
+    await live_hub.stop()
+    await retention_job.stop()
+    await reply_pool.stop(settings.reply_worker.drain_timeout)
+    await outbox_dispatcher.stop(settings.outbox.drain_timeout)
+    await lookup_cache.stop()
+    await llm.aclose()
+    await http_clients.aclose()
+    close_client()
+    await logger.complete()
 
 
 app = FastAPI(
@@ -24,4 +51,5 @@ def index_to_docs_redirect() -> RedirectResponse:
     return RedirectResponse(url="docs")
 
 
+app.add_middleware(RequestIdMiddleware, header=settings.log.request_id_header)
 app.include_router(main_router)
@@ -1,11 +1,17 @@
 from fastapi import APIRouter
 
 from app.routers.api.channels import router as channels_router
+from app.routers.api.dialogues import router as dialogues_router
 from app.routers.api.hello_world import router as hello_world_router
+from app.routers.api.live import router as live_router
+from app.routers.api.system import router as system_router
 from app.routers.api.webhook import router as webhook_router
 
 router = APIRouter(prefix="/api")
 
 router.include_router(hello_world_router)
 router.include_router(channels_router, prefix="/channels", tags=["channels"])
+router.include_router(dialogues_router, prefix="/dialogues", tags=["dialogues"])
+router.include_router(live_router, prefix="/live", tags=["live"])
 router.include_router(webhook_router, prefix="/webhook", tags=["webhook"])
+router.include_router(system_router, prefix="/system", tags=["system"])
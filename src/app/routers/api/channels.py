@@ -1,12 +1,33 @@
+from typing import Annotated, Any, Literal
+
 from beanie import PydanticObjectId
 from bson.errors import InvalidId
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
 
-from app.schemas import ChannelBase, ChannelRead
+from app.schemas import BulkResult, ChannelBase, ChannelBulkUpdate, ChannelHealth, ChannelRead, ChannelRef
+from app.services.channel_bulk import NDJSON_MEDIA_TYPE, bulk_create, bulk_delete, bulk_update, new_channel, read_items
+from app.services.circuit_breaker import channel_breakers
+from app.services.lookup_cache import lookup_cache
+from app.services.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursorError,
+    after_cursor,
+    find_page,
+    stream_ndjson,
+    to_public,
+)
+from core import settings
 from core.database.models.channel import Channel
 
 router = APIRouter()
 
+CHANNEL_FIELDS = frozenset(
+    {"bot_id", "channel_url", "channel_token", "delivery_mode", "fanout", "delivery_timeout"},
+)
+
 
 async def get_channel_or_404(channel_id: str) -> Channel:
     try:
@@ -19,22 +40,95 @@ async def get_channel_or_404(channel_id: str) -> Channel:
     return channel
 
 
+def bulk_body(model: type[BaseModel]) -> dict[str, Any]:
+    """Описание тела bulk запроса для OpenAPI: тело читается вручную, чтобы принимать NDJSON потоком."""
+    schema = model.model_json_schema()
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": schema}},
+                NDJSON_MEDIA_TYPE: {"schema": schema},
+            },
+        },
+    }
+
+
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_channel(channel_payload: ChannelBase) -> ChannelRead:
-    channel_token = "generate_token"  # todo implement # noqa: S105
-    channel = Channel(
-        channel_token=channel_token,
-        channel_url=str(channel_payload.channel_url),
-        bot_id=channel_payload.bot_id,
-    )
+    channel = new_channel(channel_payload)
     await channel.insert()
+    lookup_cache.invalidate_channel(channel)
     return ChannelRead.model_validate(channel)  # from_attributes=True
 
 
-@router.get("/")
-async def get_list_channels() -> list[ChannelRead]:
-    channels = await Channel.find_all().to_list()
-    return [ChannelRead.model_validate(channel) for channel in channels]
+def parse_fields(fields: str | None) -> list[str] | None:
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = set(requested) - CHANNEL_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested
+
+
+@router.get("/", response_model=list[ChannelRead])
+async def get_list_channels(
+    request: Request,
+    response: Response,
+    bot_id: str | None = None,
+    cursor: Annotated[str | None, Query(description="Курсор из заголовка X-Next-Cursor")] = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+    fields: Annotated[str | None, Query(description="Поля через запятую, id возвращается всегда")] = None,
+    output_format: Annotated[Literal["json", "ndjson"], Query(alias="format")] = "json",
+) -> list[ChannelRead] | Response:
+    """
+    Список каналов постранично, по возрастанию id.
+
+    Курсор следующей страницы возвращается в заголовках X-Next-Cursor и Link.
+    С format=ndjson отдаются все каналы после курсора построчно, без limit.
+    """
+    projected_fields = parse_fields(fields)
+    query: dict[str, Any] = {} if bot_id is None else {"bot_id": bot_id}
+    try:
+        query = after_cursor(query, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    collection = Channel.get_motor_collection()
+    if output_format == "ndjson":
+        return StreamingResponse(stream_ndjson(collection, query, projected_fields), media_type="application/x-ndjson")
+
+    documents, next_cursor = await find_page(collection, query, limit, projected_fields)
+    headers = {}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+
+    if projected_fields is not None:
+        # Неполные документы не проходят схему ChannelRead, отдаём их как есть
+        return JSONResponse([to_public(document) for document in documents], headers=headers)
+
+    response.headers.update(headers)
+    return [ChannelRead.model_validate(to_public(document)) for document in documents]
+
+
+@router.post("/bulk", openapi_extra=bulk_body(ChannelBase))
+async def bulk_create_channels(request: Request, ordered: bool = True) -> BulkResult:
+    """Создать каналы пачками через insert_many, результат по каждому элементу."""
+    return await bulk_create(read_items(request), ordered)
+
+
+@router.patch("/bulk", openapi_extra=bulk_body(ChannelBulkUpdate))
+async def bulk_update_channels(request: Request, ordered: bool = True) -> BulkResult:
+    """Обновить каналы пачками через bulk_write, результат по каждому элементу."""
+    return await bulk_update(read_items(request), ordered)
+
+
+@router.post("/bulk/delete", openapi_extra=bulk_body(ChannelRef))
+async def bulk_delete_channels(request: Request, ordered: bool = True) -> BulkResult:
+    """Удалить каналы по id, результат по каждому элементу."""
+    return await bulk_delete(read_items(request), ordered)
 
 
 @router.get("/{channel_id}")
@@ -43,13 +137,28 @@ async def get_channel(channel_id: str) -> ChannelRead:
     return ChannelRead.model_validate(channel)
 
 
+@router.get("/{channel_id}/health")
+async def get_channel_health(channel_id: str) -> ChannelHealth:
+    """
+    Состояние доставки в канал в этом процессе: предохранитель, задержки и текущий таймаут.
+
+    Предохранитель общий для каналов с одним URL.
+    """
+    channel = await get_channel_or_404(channel_id)
+    upper = channel.delivery_timeout if channel.delivery_timeout is not None else settings.http_client.timeout
+    return channel_breakers.get(channel.channel_url).health(str(channel.id), upper)
+
+
 @router.patch("/{channel_id}")
 async def update_channel(channel_id: str, channel_update: ChannelBase) -> ChannelRead:
     channel = await get_channel_or_404(channel_id)
+    # Каналы прежнего бота сбрасываются по его id, а не по обратной ссылке кэша, которая могла истечь
+    previous_bot_id = channel.bot_id
     update_fields = channel_update.model_dump(exclude_unset=True)
     for k, v in update_fields.items():
         setattr(channel, k, v)
     await channel.save()
+    lookup_cache.invalidate_channels([str(channel.id)], {previous_bot_id, channel.bot_id})
     return ChannelRead.model_validate(channel)
 
 
@@ -57,3 +166,4 @@ async def update_channel(channel_id: str, channel_update: ChannelBase) -> Channe
 async def delete_channel(channel_id: str) -> None:
     channel = await get_channel_or_404(channel_id)
     await channel.delete()
+    lookup_cache.invalidate_channel(channel)
@@ -0,0 +1,110 @@
+from datetime import datetime
+from typing import Annotated, Any, Literal
+
+from beanie import PydanticObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+
+from app.schemas import DialogueMessageRead, DialogueRead
+from app.services.dialogue_history import SortOrder, find_messages_page, messages_query, stream_messages
+from app.services.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursorError,
+    after_cursor,
+    find_page,
+    to_public,
+)
+from core.database.models.dialogue import Dialogue
+
+router = APIRouter()
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+
+def parse_object_id(value: str, name: str) -> PydanticObjectId:
+    try:
+        return PydanticObjectId(value)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} id")
+
+
+def pagination_headers(request: Request, next_cursor: str | None) -> dict[str, str]:
+    if next_cursor is None:
+        return {}
+    return {
+        "X-Next-Cursor": next_cursor,
+        "Link": f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"',
+    }
+
+
+@router.get("/")
+async def get_list_dialogues(
+    request: Request,
+    response: Response,
+    bot_id: str,
+    chat_id: str | None = None,
+    cursor: Annotated[str | None, Query(description="Курсор из заголовка X-Next-Cursor")] = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+) -> list[DialogueRead]:
+    """Диалоги бота постранично по возрастанию id, с chat_id - диалог одного чата. Сообщения не читаются."""
+    query: dict[str, Any] = {"chat_bot_id": parse_object_id(bot_id, "bot")}
+    if chat_id is not None:
+        query["chat_id"] = chat_id
+    try:
+        query = after_cursor(query, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    documents, next_cursor = await find_page(Dialogue.get_motor_collection(), query, limit)
+    response.headers.update(pagination_headers(request, next_cursor))
+    return [DialogueRead.model_validate(to_public(document)) for document in documents]
+
+
+@router.get("/{dialogue_id}")
+async def get_dialogue(dialogue_id: str) -> DialogueRead:
+    dialogue = await Dialogue.get(parse_object_id(dialogue_id, "dialogue"))
+    if not dialogue:
+        raise HTTPException(status_code=404, detail="Dialogue not found")
+    return DialogueRead.model_validate(dialogue)
+
+
+@router.get("/{dialogue_id}/messages", response_model=list[DialogueMessageRead])
+async def get_dialogue_messages(
+    request: Request,
+    response: Response,
+    dialogue_id: str,
+    since: Annotated[datetime | None, Query(description="Сообщения начиная с этого времени")] = None,
+    until: Annotated[datetime | None, Query(description="Сообщения до этого времени, не включая его")] = None,
+    cursor: Annotated[str | None, Query(description="Курсор из заголовка X-Next-Cursor или id события SSE")] = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+    order: SortOrder = "asc",
+    output_format: Annotated[Literal["json", "ndjson", "sse"], Query(alias="format")] = "json",
+    last_event_id: Annotated[str | None, Header()] = None,
+) -> list[DialogueMessageRead] | Response:
+    """
+    Сообщения диалога в окне [since, until) по времени, постранично.
+
+    Читается только запрошенное окно по индексу (dialogue_id, timestamp, _id).
+    С format=ndjson или format=sse отдаются все сообщения окна после курсора
+    без limit, память не растёт с длиной диалога. SSE продолжает выгрузку
+    с заголовка Last-Event-ID при переподключении.
+    """
+    oid = parse_object_id(dialogue_id, "dialogue")
+    if not await Dialogue.find(Dialogue.id == oid).count():
+        raise HTTPException(status_code=404, detail="Dialogue not found")
+    try:
+        query = messages_query(oid, since, until, cursor or last_event_id, order)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if output_format != "json":
+        return StreamingResponse(
+            stream_messages(query, order, output_format),
+            media_type=STREAM_MEDIA_TYPES[output_format],
+        )
+
+    messages, next_cursor = await find_messages_page(query, limit, order)
+    response.headers.update(pagination_headers(request, next_cursor))
+    return messages
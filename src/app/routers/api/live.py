@@ -0,0 +1,103 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from contextlib import suppress
+
+from fastapi import APIRouter, HTTPException, WebSocket, status
+from fastapi.responses import StreamingResponse
+from loguru import logger
+
+from app.services.live_push import Subscription, SubscriptionClosedError, TooManySubscribersError, live_hub
+from core import settings
+
+router = APIRouter()
+
+
+async def sse_events(subscription: Subscription, heartbeat: float) -> AsyncIterator[bytes]:
+    """События подписки в формате SSE, id события - message_id."""
+    try:
+        while True:
+            try:
+                event = await subscription.next(heartbeat)
+            except SubscriptionClosedError as e:
+                yield f"event: closed\ndata: {json.dumps({'reason': str(e)})}\n\n".encode()
+                return
+            if event is None:
+                # Комментарий не даёт прокси закрыть простаивающее соединение
+                yield b": ping\n\n"
+                continue
+            yield f"id: {event.message_id}\nevent: message\ndata: {event.data}\n\n".encode()
+    finally:
+        live_hub.discard(subscription)
+
+
+@router.get("/messages")
+async def stream_messages(bot_id: str, chat_id: str | None = None) -> StreamingResponse:
+    """
+    Новые сообщения бота или одного чата через Server-Sent Events.
+
+    Отключённый за медленное чтение подписчик получает событие closed;
+    пропущенное за время переподключения читается через API истории диалогов.
+    """
+    try:
+        subscription = live_hub.add(bot_id, chat_id)
+    except TooManySubscribersError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many subscribers",
+            headers={"Retry-After": "5"},
+        )
+    return StreamingResponse(
+        sse_events(subscription, settings.live.heartbeat_interval),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def wait_disconnect(websocket: WebSocket) -> None:
+    """Читать входящие кадры до отключения клиента, сами сообщения клиента не нужны."""
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+@router.websocket("/messages/ws")
+async def websocket_messages(websocket: WebSocket, bot_id: str, chat_id: str | None = None) -> None:
+    """Новые сообщения бота или одного чата через WebSocket, по одному JSON в кадре."""
+    try:
+        subscription = live_hub.add(bot_id, chat_id)
+    except TooManySubscribersError:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Too many subscribers")
+        return
+
+    try:
+        await websocket.accept()
+        # Читать кадры можно только после accept: до него receive ждёт websocket.connect
+        disconnected = asyncio.create_task(wait_disconnect(websocket))
+        try:
+            await forward_events(websocket, subscription, disconnected)
+        finally:
+            disconnected.cancel()
+            with suppress(asyncio.CancelledError):
+                await disconnected
+    finally:
+        live_hub.discard(subscription)
+
+
+async def forward_events(websocket: WebSocket, subscription: Subscription, disconnected: asyncio.Task[None]) -> None:
+    """Пересылать события подписки, пока клиент не отключится или подписку не закроют."""
+    while True:
+        next_event = asyncio.create_task(subscription.next(settings.live.heartbeat_interval))
+        await asyncio.wait({next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+        if disconnected.done():
+            next_event.cancel()
+            if not disconnected.cancelled() and (error := disconnected.exception()):
+                logger.warning(f"Live websocket receive failed: {error!r}")
+                await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+            return
+        try:
+            event = next_event.result()
+        except SubscriptionClosedError as e:
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason=str(e))
+            return
+        if event is not None:
+            await websocket.send_text(event.data)
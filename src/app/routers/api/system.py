@@ -0,0 +1,37 @@
+from fastapi import APIRouter
+
+from app.schemas import HttpPoolStats, ResponseCacheStats, RetentionReport
+from app.services.dedup import deduplicator
+from app.services.http_client import http_clients
+from app.services.lookup_cache import lookup_cache
+from app.services.response_cache import response_cache
+from app.services.retention import retention_job
+from core.cache import CacheStats
+
+router = APIRouter()
+
+
+@router.get("/http_pools")
+async def get_http_pools() -> list[HttpPoolStats]:
+    return http_clients.stats()
+
+
+@router.get("/dedup")
+async def get_dedup_stats() -> CacheStats:
+    return deduplicator.stats()
+
+
+@router.get("/lookup_cache")
+async def get_lookup_cache_stats() -> dict[str, CacheStats]:
+    return {"bots": lookup_cache.bots.stats(), "channels": lookup_cache.channels.stats()}
+
+
+@router.get("/response_cache")
+async def get_response_cache_stats() -> ResponseCacheStats:
+    return response_cache.stats()
+
+
+@router.get("/retention")
+async def get_retention_report() -> RetentionReport | None:
+    """Отчёт последнего прохода хранения в этом процессе."""
+    return retention_job.last_report
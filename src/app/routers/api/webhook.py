@@ -1,12 +1,37 @@
-from fastapi import APIRouter, Request
+from typing import Annotated
+
+from fastapi import APIRouter, Body, Header, Query, Request, status
 from fastapi.responses import JSONResponse
 
-from app.schemas import IncomingMessage, OutgoingMessage
+from app.schemas import IncomingMessage, MessageBatchResult, OutgoingMessage
 from app.services.dialogue_service import DialogueService
 
-router = APIRouter(prefix="/webhook", tags=["webhook"])
+router = APIRouter()
+
+MAX_BATCH_SIZE = 1000
+
+ChannelIdQuery = Annotated[
+    str | None,
+    Query(description="ID канала, из которого пришло сообщение; по умолчанию первый канал бота без fanout"),
+]
+ChannelIdHeader = Annotated[str | None, Header(description="То же, что channel_id")]
+
+
+@router.post("/new_message", response_model=OutgoingMessage, status_code=status.HTTP_202_ACCEPTED)
+async def receive_webhook(
+    msg: IncomingMessage,
+    request: Request,
+    channel_id: ChannelIdQuery = None,
+    x_channel_id: ChannelIdHeader = None,
+) -> JSONResponse:
+    return await DialogueService(request, channel_id or x_channel_id).process_message(msg)
 
 
-@router.post("/new_message", response_model=OutgoingMessage)
-async def receive_webhook(msg: IncomingMessage, request: Request) -> JSONResponse:
-    return await DialogueService(request).process_message(msg)
+@router.post("/new_messages", status_code=status.HTTP_202_ACCEPTED)
+async def receive_webhook_batch(
+    messages: Annotated[list[IncomingMessage], Body(min_length=1, max_length=MAX_BATCH_SIZE)],
+    request: Request,
+    channel_id: ChannelIdQuery = None,
+    x_channel_id: ChannelIdHeader = None,
+) -> MessageBatchResult:
+    return await DialogueService(request, channel_id or x_channel_id).process_messages(messages)
@@ -1,21 +1,75 @@
+from datetime import datetime
+from enum import StrEnum, auto
 from typing import Literal
 
 from beanie import PydanticObjectId
-from pydantic import BaseModel, ConfigDict, Field, HttpUrl
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl, field_validator
 
+from core import settings
+from core.cache import CacheStats
+from core.database.models.channel import DeliveryMode
+from core.database.models.dialogue import MessageRole
 
-class ChannelBase(BaseModel):
+
+class ChannelFields(BaseModel):
     channel_url: HttpUrl = Field(..., title="URL канала")
     bot_id: str = Field(..., title="ID чат-бота")
+    delivery_mode: DeliveryMode = Field(
+        DeliveryMode.MESSAGE,
+        title="Режим доставки: message - только итоговое сообщение, typing - события набора, partial - частичный текст",
+    )
+    fanout: bool = Field(False, title="Получать ответы бота на сообщения из всех его каналов (CRM, зеркало)")
+    delivery_timeout: float | None = Field(None, gt=0, title="Таймаут доставки в канал, с")
 
     model_config = ConfigDict(validate_by_name=True, from_attributes=True, populate_by_name=True)
 
 
-class ChannelRead(ChannelBase):
+class ChannelBase(ChannelFields):
+    """Входные данные канала: проверки настроек только здесь, сохранённые каналы читаются как есть."""
+
+    @field_validator("delivery_timeout")
+    @classmethod
+    def delivery_within_lease(cls, value: float | None) -> float | None:
+        # Иначе аренда outbox истечёт посреди доставки и сообщение уйдёт в канал второй раз
+        if value is not None and value >= settings.outbox.lease:
+            raise ValueError(f"delivery_timeout must be less than the outbox lease ({settings.outbox.lease}s)")
+        return value
+
+
+class ChannelRead(ChannelFields):
     channel_id: PydanticObjectId = Field(..., alias="id")
     channel_token: str | None = Field(None, min_length=8, title="Токен канала")
 
 
+class ChannelBulkUpdate(ChannelBase):
+    channel_id: PydanticObjectId = Field(..., alias="id")
+
+
+class ChannelRef(BaseModel):
+    channel_id: PydanticObjectId = Field(..., alias="id")
+
+    model_config = ConfigDict(validate_by_name=True, populate_by_name=True)
+
+
+type BulkItemStatus = Literal["created", "updated", "deleted", "not_found", "invalid", "error", "skipped"]
+
+
+class BulkItemResult(BaseModel):
+    index: int = Field(..., title="Номер элемента в запросе")
+    status: BulkItemStatus
+    channel_id: PydanticObjectId | None = Field(None, alias="id")
+    error: str | None = None
+
+    model_config = ConfigDict(validate_by_name=True, populate_by_name=True)
+
+
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    skipped: int = Field(..., title="Не обработаны после первой ошибки в режиме ordered")
+    results: list[BulkItemResult]
+
+
 class IncomingMessage(BaseModel):
     message_id: str
     chat_id: str
@@ -23,7 +77,106 @@ class IncomingMessage(BaseModel):
     message_sender: Literal["customer", "employee"]
 
 
+class MessageResult(BaseModel):
+    message_id: str
+    status: Literal["accepted", "saved", "duplicate"] = Field(
+        ...,
+        title="accepted - ответ будет сгенерирован, saved - сообщение сотрудника сохранено, duplicate - уже получено",
+    )
+
+
+class MessageBatchResult(BaseModel):
+    saved: int
+    duplicates: int
+    results: list[MessageResult]
+
+
 class OutgoingMessage(BaseModel):
     event_type: Literal["new_message"]
     chat_id: str
     text: str
+
+
+class DialogueRead(BaseModel):
+    dialogue_id: PydanticObjectId = Field(..., alias="id")
+    chat_bot_id: PydanticObjectId
+    chat_id: str
+    summary: str | None = Field(None, title="Краткое содержание сообщений, не попадающих в контекст")
+    summary_until: datetime | None = None
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+
+class DialogueMessageRead(BaseModel):
+    dialogue_message_id: PydanticObjectId = Field(..., alias="id")
+    message_id: str
+    chat_id: str
+    text: str
+    role: MessageRole
+    timestamp: datetime
+
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+
+class DialogueMessageEvent(DialogueMessageRead):
+    dialogue_id: PydanticObjectId
+    chat_bot_id: PydanticObjectId
+
+
+class HttpPoolStats(BaseModel):
+    host: str
+    max_connections: int
+    connections: int = Field(..., title="Открытые соединения")
+    idle: int = Field(..., title="Свободные keep-alive соединения")
+    in_use: int = Field(..., title="Запросы в процессе")
+    waiting: int = Field(..., title="Запросы в ожидании соединения")
+    requests: int
+    wait_time_avg: float = Field(..., title="Среднее ожидание соединения, с")
+    wait_time_max: float = Field(..., title="Максимальное ожидание соединения, с")
+
+
+class BreakerState(StrEnum):
+    CLOSED = auto()
+    OPEN = auto()
+    HALF_OPEN = auto()
+
+
+class ChannelHealth(BaseModel):
+    channel_id: str = Field(..., alias="id")
+    channel_url: str
+    state: BreakerState = Field(
+        ...,
+        title="Состояние: closed - работает, open - запросы не отправляются, half_open - проба",
+    )
+    consecutive_failures: int = Field(..., title="Ошибок подряд")
+    successes: int
+    failures: int
+    rejected: int = Field(..., title="Запросов отклонено без отправки")
+    latency_p50: float | None = Field(..., title="Медиана времени ответа, с")
+    latency_p99: float | None = Field(..., title="p99 времени ответа, с")
+    timeout: float = Field(..., title="Текущий таймаут запроса, с")
+    retry_after: float = Field(..., title="Через сколько секунд канал снова получит запрос")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class RetentionReport(BaseModel):
+    started_at: datetime
+    finished_at: datetime | None = None
+    archived_dialogues: int = 0
+    archived_messages: int = 0
+    trimmed_messages: int = 0
+    archive_bytes: int = Field(0, title="Записано в архив после сжатия, байт")
+    bytes_reclaimed: int = Field(0, title="Освобождено в рабочих коллекциях за вычетом архива, байт")
+    throttled_seconds: float = Field(0.0, title="Время в паузах между пачками, с")
+
+
+class ResponseCacheStats(BaseModel):
+    memory: CacheStats
+    mongo_hits: int
+    mongo_misses: int
+    mongo_evictions: int = Field(..., title="Записи, удалённые при превышении max_entries")
+    coalesced: int = Field(..., title="Запросы, дождавшиеся уже идущей генерации того же ответа")
+    generated: int
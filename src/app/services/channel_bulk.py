@@ -0,0 +1,239 @@
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any
+
+from beanie import PydanticObjectId
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.schemas import BulkItemResult, BulkItemStatus, BulkResult, ChannelBase, ChannelBulkUpdate, ChannelRef
+from app.services.lookup_cache import lookup_cache
+from core.database.models.channel import Channel
+
+BULK_BATCH_SIZE = 1000
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+UPDATABLE_FIELDS = frozenset({"bot_id", "channel_url", "delivery_mode", "fanout", "delivery_timeout"})
+FAILED_STATUSES: frozenset[BulkItemStatus] = frozenset({"not_found", "invalid", "error"})
+
+type Batch[T] = list[tuple[int, T]]
+type BatchWriter[T] = Callable[[Batch[T], bool], Awaitable[list[BulkItemResult]]]
+
+
+def new_channel(payload: ChannelBase) -> Channel:
+    channel_token = "generate_token"  # todo implement # noqa: S105
+    return Channel(
+        channel_token=channel_token,
+        channel_url=str(payload.channel_url),
+        bot_id=payload.bot_id,
+        delivery_mode=payload.delivery_mode,
+        fanout=payload.fanout,
+        delivery_timeout=payload.delivery_timeout,
+    )
+
+
+async def read_items(request: Request) -> AsyncIterator[Any]:
+    """
+    Элементы тела запроса: JSON массив или NDJSON по одному элементу в строке.
+
+    NDJSON читается из потока по мере поступления, поэтому большая загрузка
+    не собирается в памяти целиком.
+    """
+    if request.headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE):
+        buffer = b""
+        async for chunk in request.stream():
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+        if buffer.strip():
+            yield buffer
+        return
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    for item in items:
+        yield item
+
+
+def validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, error['loc'])) or 'item'}: {error['msg']}" for error in e.errors())
+
+
+def batch_results(
+    batch: Batch[Any],
+    status: BulkItemStatus,
+    channel_ids: list[PydanticObjectId | None],
+    errors: dict[int, tuple[BulkItemStatus, str | None]],
+    ordered: bool,
+) -> list[BulkItemResult]:
+    """
+    Результаты пачки по позициям в ней.
+
+    В режиме ordered Mongo останавливается на первой ошибке, элементы после неё
+    не записаны и помечаются skipped, даже если для них тоже есть ошибка.
+    """
+    first_error = min(errors, default=len(batch))
+    results = []
+    for position, (index, _) in enumerate(batch):
+        if ordered and position > first_error:
+            results.append(BulkItemResult(index=index, status="skipped"))
+        elif position in errors:
+            error_status, error = errors[position]
+            results.append(
+                BulkItemResult(index=index, status=error_status, channel_id=channel_ids[position], error=error),
+            )
+        else:
+            results.append(BulkItemResult(index=index, status=status, channel_id=channel_ids[position]))
+    return results
+
+
+def write_errors(e: BulkWriteError) -> dict[int, tuple[BulkItemStatus, str | None]]:
+    return {error["index"]: ("error", error["errmsg"]) for error in e.details["writeErrors"]}
+
+
+async def run_bulk[T: BaseModel](
+    items: AsyncIterator[Any],
+    model: type[T],
+    write: BatchWriter[T],
+    ordered: bool,
+) -> BulkResult:
+    """
+    Провалидировать элементы и записать их пачками по BULK_BATCH_SIZE.
+
+    В режиме ordered обработка останавливается на первом невалидном или
+    не записанном элементе, остальные помечаются skipped.
+    """
+    results: list[BulkItemResult] = []
+    batch: Batch[T] = []
+    stopped = False
+
+    async def flush() -> None:
+        nonlocal stopped
+        if batch:
+            written = await write(batch, ordered)
+            results.extend(written)
+            stopped = ordered and any(result.status in FAILED_STATUSES for result in written)
+            batch.clear()
+
+    index = 0
+    async for item in items:
+        if stopped:
+            results.append(BulkItemResult(index=index, status="skipped"))
+        else:
+            try:
+                payload = model.model_validate_json(item) if isinstance(item, bytes) else model.model_validate(item)
+            except ValidationError as e:
+                if ordered:
+                    # Предыдущие элементы должны быть записаны до остановки
+                    await flush()
+                if stopped:
+                    results.append(BulkItemResult(index=index, status="skipped"))
+                else:
+                    results.append(BulkItemResult(index=index, status="invalid", error=validation_error(e)))
+                    stopped = ordered
+            else:
+                batch.append((index, payload))
+                if len(batch) >= BULK_BATCH_SIZE:
+                    await flush()
+        index += 1
+    await flush()
+
+    results.sort(key=lambda result: result.index)
+    failed = sum(result.status in FAILED_STATUSES for result in results)
+    skipped = sum(result.status == "skipped" for result in results)
+    return BulkResult(succeeded=len(results) - failed - skipped, failed=failed, skipped=skipped, results=results)
+
+
+async def insert_channels(batch: Batch[ChannelBase], ordered: bool) -> list[BulkItemResult]:
+    documents = [new_channel(payload).model_dump(exclude={"id"}) for _, payload in batch]
+    errors = {}
+    try:
+        # insert_many проставляет _id в документы ещё до отправки
+        await Channel.get_motor_collection().insert_many(documents, ordered=ordered)
+    except BulkWriteError as e:
+        errors = write_errors(e)
+
+    lookup_cache.invalidate_channels([], {payload.bot_id for _, payload in batch})
+    channel_ids: list[PydanticObjectId | None] = [
+        None if position in errors else PydanticObjectId(document["_id"]) for position, document in enumerate(documents)
+    ]
+    return batch_results(batch, "created", channel_ids, errors, ordered)
+
+
+async def find_bot_ids(channel_ids: list[PydanticObjectId]) -> dict[PydanticObjectId, str]:
+    """bot_id существующих каналов одним запросом."""
+    cursor = Channel.get_motor_collection().find({"_id": {"$in": channel_ids}}, {"bot_id": 1})
+    return {document["_id"]: document["bot_id"] async for document in cursor}
+
+
+def missing_errors(
+    channel_ids: list[PydanticObjectId],
+    existing: dict[PydanticObjectId, str],
+) -> dict[int, tuple[BulkItemStatus, str | None]]:
+    return {
+        position: ("not_found", None) for position, channel_id in enumerate(channel_ids) if channel_id not in existing
+    }
+
+
+def writable(channel_ids: list[PydanticObjectId], errors: dict[int, Any], ordered: bool) -> list[int]:
+    """Позиции, которые нужно отправить в Mongo."""
+    end = min(errors, default=len(channel_ids)) if ordered else len(channel_ids)
+    return [position for position in range(end) if position not in errors]
+
+
+async def update_channels(batch: Batch[ChannelBulkUpdate], ordered: bool) -> list[BulkItemResult]:
+    channel_ids = [payload.channel_id for _, payload in batch]
+    existing = await find_bot_ids(channel_ids)
+    errors = missing_errors(channel_ids, existing)
+    positions = writable(channel_ids, errors, ordered)
+
+    if positions:
+        operations = [
+            UpdateOne(
+                {"_id": batch[position][1].channel_id},
+                {"$set": batch[position][1].model_dump(mode="json", include=UPDATABLE_FIELDS, exclude_unset=True)},
+            )
+            for position in positions
+        ]
+        try:
+            await Channel.get_motor_collection().bulk_write(operations, ordered=ordered)
+        except BulkWriteError as e:
+            errors |= {positions[index]: error for index, error in write_errors(e).items()}
+
+    lookup_cache.invalidate_channels(
+        [str(channel_id) for channel_id in channel_ids],
+        set(existing.values()) | {payload.bot_id for _, payload in batch},
+    )
+    return batch_results(batch, "updated", list(channel_ids), errors, ordered)
+
+
+async def delete_channels(batch: Batch[ChannelRef], ordered: bool) -> list[BulkItemResult]:
+    channel_ids = [ref.channel_id for _, ref in batch]
+    existing = await find_bot_ids(channel_ids)
+    errors = missing_errors(channel_ids, existing)
+    positions = writable(channel_ids, errors, ordered)
+
+    if positions:
+        # Удаление по _id не может упасть для отдельного документа, хватает одного delete_many
+        await Channel.get_motor_collection().delete_many({"_id": {"$in": [channel_ids[i] for i in positions]}})
+
+    lookup_cache.invalidate_channels([str(channel_id) for channel_id in channel_ids], set(existing.values()))
+    return batch_results(batch, "deleted", list(channel_ids), errors, ordered)
+
+
+async def bulk_create(items: AsyncIterator[Any], ordered: bool) -> BulkResult:
+    return await run_bulk(items, ChannelBase, insert_channels, ordered)
+
+
+async def bulk_update(items: AsyncIterator[Any], ordered: bool) -> BulkResult:
+    return await run_bulk(items, ChannelBulkUpdate, update_channels, ordered)
+
+
+async def bulk_delete(items: AsyncIterator[Any], ordered: bool) -> BulkResult:
+    return await run_bulk(items, ChannelRef, delete_channels, ordered)
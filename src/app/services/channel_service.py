@@ -1,9 +1,107 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
 from typing import Any
 
 import httpx
+from loguru import logger
+from pydantic import BaseModel
 
+from app.schemas import BreakerState
+from app.services import metrics
+from app.services.circuit_breaker import channel_breakers
+from app.services.http_client import http_clients
+from core import settings
+from core.database.models.channel import Channel, DeliveryMode
+from core.settings_model import StreamingSettings
 
-async def post_to_channel(channel_url: str, channel_token: str, message_data: dict[str, Any]) -> bool:
+
+class DeliveryResult(BaseModel):
+    success: bool
+    status_code: int | None = None
+    error: str | None = None
+    # Канал разомкнут предохранителем, повторять раньше нет смысла
+    retry_after: float | None = None
+
+
+def is_channel_failure(status_code: int) -> bool:
+    """Ответ, говорящий о проблеме канала, а не запроса: такие ответы размыкают предохранитель."""
+    return status_code >= 500 or status_code in (408, 429)
+
+
+async def send_to_channel(
+    channel_url: str,
+    channel_token: str,
+    message_data: dict[str, Any],
+    request_timeout: float | None = None,
+    idempotency_key: str | None = None,
+    use_breaker: bool = True,
+) -> DeliveryResult:
+    """
+    Отправляет сообщение в канал и возвращает подробный результат.
+
+    Args:
+        channel_url: URL канала для отправки
+        channel_token: Токен авторизации канала
+        message_data: Данные сообщения для отправки
+        request_timeout: Таймаут запроса, по умолчанию из настроек HTTP клиента
+        idempotency_key: Ключ для заголовка Idempotency-Key, по которому канал отбрасывает повторы
+        use_breaker: Проверять предохранитель канала и учитывать в нём результат
+
+    Returns:
+        DeliveryResult: результат доставки
+    """
+    breaker = channel_breakers.get(channel_url) if use_breaker else None
+    if breaker is not None and not breaker.allow():
+        metrics.delivery_rejections.inc()
+        return DeliveryResult(success=False, error="Circuit breaker is open", retry_after=breaker.retry_after())
+
+    headers = {
+        "Authorization": f"Bearer {channel_token}",
+        "Content-Type": "application/json",
+    }
+    if idempotency_key:
+        headers["Idempotency-Key"] = idempotency_key
+    upper = request_timeout if request_timeout is not None else settings.http_client.timeout
+    timeout = breaker.timeout(upper) if breaker is not None else upper
+    # Без явного таймаута у клиента остаются свои таймауты подключения и ожидания пула
+    extra = {"timeout": timeout} if request_timeout is not None or timeout < upper else {}
+
+    started = time.perf_counter()
+    try:
+        response = await http_clients.post(channel_url, json=message_data, headers=headers, **extra)
+    except asyncio.CancelledError:
+        if breaker is not None:
+            breaker.release()
+        raise
+    except Exception as e:
+        if breaker is not None:
+            # Ожидание свободного соединения - наша очередь, а не задержка канала
+            timed_out = isinstance(e, httpx.TimeoutException) and not isinstance(e, httpx.PoolTimeout)
+            breaker.record_failure(timeout if timed_out else None)
+        logger.warning(f"Exception posting to channel {channel_url}: {e!r}")
+        metrics.delivery_failures.inc()
+        return DeliveryResult(success=False, error=repr(e))
+
+    if breaker is not None:
+        if is_channel_failure(response.status_code):
+            breaker.record_failure()
+        else:
+            breaker.record_success(time.perf_counter() - started)
+    if response.status_code not in [200, 201, 202]:
+        logger.warning(f"Error posting to channel {channel_url}: {response.status_code} - {response.text}")
+        metrics.delivery_failures.inc()
+        return DeliveryResult(success=False, status_code=response.status_code, error=response.text[:500])
+    metrics.delivery_successes.inc()
+    return DeliveryResult(success=True, status_code=response.status_code)
+
+
+async def post_to_channel(
+    channel_url: str,
+    channel_token: str,
+    message_data: dict[str, Any],
+    request_timeout: float | None = None,
+) -> bool:
     """
     Отправляет сообщение в канал.
 
@@ -11,29 +109,66 @@ async def post_to_channel(channel_url: str, channel_token: str, message_data: di
         channel_url: URL канала для отправки
         channel_token: Токен авторизации канала
         message_data: Данные сообщения для отправки
+        request_timeout: Таймаут запроса, по умолчанию из настроек HTTP клиента
 
     Returns:
         bool: True если сообщение отправлено успешно, False в противном случае
     """
-    try:
-        headers = {
-            "Authorization": f"Bearer {channel_token}",
-            "Content-Type": "application/json",
-        }
-
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                channel_url,
-                json=message_data,
-                headers=headers,
-                timeout=30.0,
-            )
-
-            # Логируем ошибку (в реальном проекте используйте proper logging)
-            # print(f"Error posting to channel: {response.status_code} - {response.text}")
-            return response.status_code in [200, 201, 202]
-
-    except Exception:
-        # Логируем исключение (в реальном проекте используйте proper logging)
-        # print(f"Exception posting to channel: {e}")
-        return False
+    result = await send_to_channel(channel_url, channel_token, message_data, request_timeout)
+    return result.success
+
+
+async def stream_to_channel(
+    channel: Channel,
+    chat_id: str,
+    chunks: AsyncIterator[str],
+    config: StreamingSettings,
+) -> str:
+    """
+    Пересылать в канал промежуточные события, пока генерируется ответ, и вернуть полный текст.
+
+    В режиме typing канал получает события набора, в режиме partial - уже
+    сгенерированный текст целиком. События доставляются без повторов и не
+    чаще интервала из настроек; пока предыдущее не отправлено, новые
+    пропускаются, чтобы медленный канал не тормозил генерацию. События
+    идут мимо предохранителя: отправляются, только пока он замкнут, и не
+    влияют на его состояние, чтобы не занимать пробный запрос и не
+    размыкать цепь из-за короткого event_timeout. Итоговое сообщение
+    отправляет вызывающий код, обычно через outbox.
+    """
+    interval = config.typing_interval if channel.delivery_mode == DeliveryMode.TYPING else config.partial_interval
+    breaker = channel_breakers.get(channel.channel_url)
+    loop = asyncio.get_running_loop()
+    parts: list[str] = []
+    last_sent = -interval
+    sending: asyncio.Task[DeliveryResult] | None = None
+    sequence = 0
+
+    async for chunk in chunks:
+        parts.append(chunk)
+        if channel.delivery_mode == DeliveryMode.MESSAGE:
+            continue
+        if loop.time() - last_sent < interval or (sending is not None and not sending.done()):
+            continue
+        if breaker.state != BreakerState.CLOSED:
+            continue
+
+        sequence += 1
+        event: dict[str, Any] = {"event_type": "typing", "chat_id": chat_id}
+        if channel.delivery_mode == DeliveryMode.PARTIAL:
+            event = {"event_type": "partial_message", "chat_id": chat_id, "text": "".join(parts), "sequence": sequence}
+        sending = asyncio.create_task(
+            send_to_channel(
+                channel.channel_url,
+                channel.channel_token,
+                event,
+                request_timeout=config.event_timeout,
+                use_breaker=False,
+            ),
+        )
+        last_sent = loop.time()
+
+    if sending is not None:
+        # Промежуточное событие не должно прийти в канал позже итогового сообщения
+        await sending
+    return "".join(parts)
@@ -0,0 +1,62 @@
+import asyncio
+import os
+import socket
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+from datetime import UTC, datetime, timedelta
+from uuid import uuid4
+
+from loguru import logger
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from core.database.models.chat_lease import ChatLease
+
+
+class ChatLock:
+    """
+    Межпроцессная блокировка чата на аренде в коллекции chat_leases.
+
+    Аренда продлевается, пока владелец работает с чатом, и истекает сама,
+    если процесс упал, поэтому чат не блокируется навсегда.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+    async def acquire(self, key: str) -> bool:
+        now = datetime.now(UTC)
+        try:
+            await ChatLease.get_motor_collection().find_one_and_update(
+                {"_id": key, "$or": [{"expires_at": {"$lt": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.ttl)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Документ есть, но аренда чужая и не истекла
+            return False
+        return True
+
+    async def release(self, key: str) -> None:
+        await ChatLease.get_motor_collection().delete_one({"_id": key, "owner": self.owner})
+
+    @asynccontextmanager
+    async def keep_alive(self, key: str) -> AsyncIterator[None]:
+        """Продлевать аренду, пока выполняется тело блока, и освободить её после."""
+
+        async def renew() -> None:
+            while True:
+                await asyncio.sleep(self.ttl / 3)
+                try:
+                    await self.acquire(key)
+                except PyMongoError as e:
+                    logger.warning(f"Failed to renew lease for chat {key}: {e!r}")
+
+        renewal = asyncio.create_task(renew())
+        try:
+            yield
+        finally:
+            renewal.cancel()
+            with suppress(asyncio.CancelledError):
+                await renewal
+            await self.release(key)
@@ -0,0 +1,136 @@
+import time
+from collections import deque
+
+from loguru import logger
+
+from app.schemas import BreakerState, ChannelHealth
+from core import settings
+from core.settings_model import CircuitBreakerSettings
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для одного URL канала.
+
+    После failure_threshold ошибок подряд (сетевых, таймаутов, 5xx, 408 и
+    429) запросы в канал не отправляются open_duration секунд, затем один
+    пробный запрос решает, замкнуть цепь или снова разомкнуть. Таймаут
+    подстраивается под канал: p99 последних ответов с запасом, но не
+    больше заданного в настройках канала или HTTP клиента. Запросы,
+    упавшие по таймауту, попадают в выборку со временем таймаута, иначе
+    p99 видел бы только уложившиеся ответы и таймаут не мог бы вырасти.
+    """
+
+    def __init__(self, url: str, config: CircuitBreakerSettings) -> None:
+        self.url = url
+        self.config = config
+        self.state = BreakerState.CLOSED
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._latencies: deque[float] = deque(maxlen=config.latency_window)
+        self._sorted: list[float] | None = None
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос; в half_open пропускается один пробный."""
+        if self.state == BreakerState.OPEN:
+            if time.monotonic() - self._opened_at < self.config.open_duration:
+                self.rejected += 1
+                return False
+            self.state = BreakerState.HALF_OPEN
+        if self.state == BreakerState.HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def record_success(self, latency: float) -> None:
+        self.successes += 1
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        self._latencies.append(latency)
+        self._sorted = None
+        if self.state != BreakerState.CLOSED:
+            logger.info(f"Channel {self.url} recovered, circuit closed")
+            self.state = BreakerState.CLOSED
+
+    def record_failure(self, latency: float | None = None) -> None:
+        """latency передаётся для таймаутов: ответ занял бы как минимум столько."""
+        self.failures += 1
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if latency is not None:
+            self._latencies.append(latency)
+            self._sorted = None
+        if self.state == BreakerState.HALF_OPEN or (
+            self.state == BreakerState.CLOSED and self.consecutive_failures >= self.config.failure_threshold
+        ):
+            logger.warning(f"Channel {self.url} failed {self.consecutive_failures} times in a row, circuit opened")
+            self.state = BreakerState.OPEN
+            self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Запрос отменён до результата: пробу можно повторить."""
+        self._probe_in_flight = False
+
+    def latency(self, q: float) -> float | None:
+        if not self._latencies:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self._latencies)
+        return percentile(self._sorted, q)
+
+    def timeout(self, upper: float) -> float:
+        """Таймаут следующего запроса, не больше upper; пробный запрос после размыкания ждёт upper целиком."""
+        p99 = self.latency(0.99)
+        if self.state != BreakerState.CLOSED or p99 is None or len(self._latencies) < self.config.min_samples:
+            return upper
+        return min(upper, max(self.config.min_timeout, p99 * self.config.timeout_multiplier))
+
+    def retry_after(self) -> float:
+        if self.state != BreakerState.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.config.open_duration - time.monotonic())
+
+    def health(self, channel_id: str, upper: float) -> ChannelHealth:
+        return ChannelHealth(
+            channel_id=channel_id,
+            channel_url=self.url,
+            state=self.state,
+            consecutive_failures=self.consecutive_failures,
+            successes=self.successes,
+            failures=self.failures,
+            rejected=self.rejected,
+            latency_p50=self.latency(0.5),
+            latency_p99=self.latency(0.99),
+            timeout=self.timeout(upper),
+            retry_after=self.retry_after(),
+        )
+
+
+class CircuitBreakerRegistry:
+    """Предохранители по URL каналов; URL ограничены числом каналов, поэтому словарь не чистится."""
+
+    def __init__(self, config: CircuitBreakerSettings) -> None:
+        self.config = config
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, url: str) -> CircuitBreaker:
+        breaker = self._breakers.get(url)
+        if breaker is None:
+            breaker = self._breakers[url] = CircuitBreaker(url, self.config)
+        return breaker
+
+    def clear(self) -> None:
+        self._breakers.clear()
+
+
+channel_breakers = CircuitBreakerRegistry(settings.circuit_breaker)
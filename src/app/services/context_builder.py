@@ -0,0 +1,115 @@
+from datetime import datetime
+from functools import partial
+from typing import TYPE_CHECKING
+
+from beanie.operators import Set
+
+from app.services.llm import llm
+from app.services.reply_worker import QueueFullError, reply_pool
+from core import settings
+from core.database.models.dialogue import ContextMessage, Dialogue, DialogueMessage, MessageRole
+from core.settings_model import ContextSettings
+from predict.summary import summarize
+
+if TYPE_CHECKING:
+    from beanie import PydanticObjectId
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка количества токенов: около 4 символов на токен."""
+    return len(text) // 4 + 1
+
+
+class ContextBuilder:
+    """
+    Собирает ограниченный контекст диалога для LLM.
+
+    В контекст попадают только последние сообщения в пределах
+    max_messages и бюджета токенов, из БД читается только этот хвост и
+    только нужные поля. Всё, что старше, сворачивается в summary диалога:
+    как только сообщения выходят из окна, фоновая задача дописывает их в
+    summary целиком, пачками до summarize_batch сообщений на вызов, чтобы
+    между summary и хвостом не оставалось выпавших из контекста реплик.
+    """
+
+    def __init__(self, config: ContextSettings) -> None:
+        self.config = config
+        self._summarizing: set[PydanticObjectId] = set()
+
+    async def build(self, dialogue: Dialogue) -> list[ContextMessage]:
+        newest_first = (
+            await DialogueMessage.find(DialogueMessage.dialogue_id == dialogue.id)
+            .sort(-DialogueMessage.timestamp)
+            .limit(self.config.max_messages)
+            .project(ContextMessage)
+            .to_list()
+        )
+
+        budget = self.config.max_tokens - (estimate_tokens(dialogue.summary) if dialogue.summary else 0)
+        tail: list[ContextMessage] = []
+        for message in newest_first:
+            cost = estimate_tokens(message.text)
+            # Последнее сообщение попадает в контекст всегда, даже если не влезает в бюджет
+            if tail and cost > budget:
+                break
+            tail.append(message)
+            budget -= cost
+        tail.reverse()
+
+        truncated = len(tail) < len(newest_first) or len(newest_first) == self.config.max_messages
+        if truncated and tail:
+            self.schedule_summary(dialogue, window_start=tail[0].timestamp)
+
+        if dialogue.summary and dialogue.summary_until:
+            summary = ContextMessage(role=MessageRole.SYSTEM, text=dialogue.summary, timestamp=dialogue.summary_until)
+            return [summary, *tail]
+        return tail
+
+    def schedule_summary(self, dialogue: Dialogue, window_start: datetime) -> None:
+        if dialogue.id is None or dialogue.id in self._summarizing:
+            return
+        try:
+            with reply_pool.reserve() as slot:
+                self._summarizing.add(dialogue.id)
+                slot.submit(partial(self.update_summary, dialogue, window_start))
+        except QueueFullError:
+            # Summary не срочное, догоним на следующих сообщениях
+            return
+
+    async def update_summary(self, dialogue: Dialogue, window_start: datetime) -> None:
+        """Свернуть в summary все сообщения, вышедшие из окна контекста."""
+        try:
+            summary, summary_until = dialogue.summary, dialogue.summary_until
+            while True:
+                query = DialogueMessage.find(
+                    DialogueMessage.dialogue_id == dialogue.id,
+                    DialogueMessage.timestamp < window_start,
+                )
+                if summary_until:
+                    query = query.find(DialogueMessage.timestamp > summary_until)
+                pending = (
+                    await query.sort(+DialogueMessage.timestamp)
+                    .limit(self.config.summarize_batch)
+                    .project(ContextMessage)
+                    .to_list()
+                )
+                if not pending:
+                    break
+                summary = await summarize(llm, dialogue.chat_bot_id, summary, pending)
+                summary_until = pending[-1].timestamp
+                if len(pending) < self.config.summarize_batch:
+                    break
+
+            if summary_until == dialogue.summary_until:
+                return
+            # Условие на summary_until отбрасывает результат, если summary уже обновили параллельно
+            await Dialogue.find_one(
+                Dialogue.id == dialogue.id,
+                Dialogue.summary_until == dialogue.summary_until,
+            ).update(Set({Dialogue.summary: summary, Dialogue.summary_until: summary_until}))
+        finally:
+            if dialogue.id is not None:
+                self._summarizing.discard(dialogue.id)
+
+
+context_builder = ContextBuilder(settings.context)
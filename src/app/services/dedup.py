@@ -0,0 +1,35 @@
+from beanie import PydanticObjectId
+
+from core import settings
+from core.cache import CacheStats, TTLCache
+from core.settings_model import DedupSettings
+
+
+class MessageDeduplicator:
+    """
+    Отсечение повторно присланных каналом сообщений.
+
+    Источник истины - уникальный индекс (chat_bot_id, message_id) в
+    dialogue_messages. Кэш перед ним отвечает на горячие ретраи канала без
+    обращения к БД; промах кэша ничего не пропускает, дубль всё равно
+    упрётся в индекс.
+    """
+
+    def __init__(self, config: DedupSettings) -> None:
+        self._seen: TTLCache[tuple[PydanticObjectId, str], bool] = TTLCache(config.cache_size, config.ttl)
+
+    def is_duplicate(self, bot_id: PydanticObjectId, message_id: str) -> bool:
+        return (bot_id, message_id) in self._seen
+
+    def remember(self, bot_id: PydanticObjectId, message_id: str) -> None:
+        self._seen.set((bot_id, message_id), True)
+
+    def forget(self, bot_id: PydanticObjectId, message_id: str) -> None:
+        """Снять отметку, чтобы повтор сообщения снова дошёл до БД."""
+        self._seen.pop((bot_id, message_id))
+
+    def stats(self) -> CacheStats:
+        return self._seen.stats()
+
+
+deduplicator = MessageDeduplicator(settings.dedup)
@@ -0,0 +1,101 @@
+from collections.abc import AsyncIterator
+from datetime import datetime
+from typing import Any, Literal
+
+from beanie import PydanticObjectId
+from motor.motor_asyncio import AsyncIOMotorCursor
+from pymongo import ASCENDING, DESCENDING
+
+from app.schemas import DialogueMessageRead
+from app.services.pagination import STREAM_BATCH_SIZE, decode_cursor, encode_cursor, to_public
+from core.database.models.dialogue import DialogueMessage
+
+# dialogue_id и chat_bot_id одинаковы у всех сообщений диалога, их не читаем
+MESSAGE_PROJECTION = {"message_id": 1, "chat_id": 1, "text": 1, "role": 1, "timestamp": 1}
+
+type SortOrder = Literal["asc", "desc"]
+
+
+def messages_query(
+    dialogue_id: PydanticObjectId,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: str | None = None,
+    order: SortOrder = "asc",
+) -> dict[str, Any]:
+    """
+    Условие на окно сообщений диалога: [since, until) и после курсора в порядке order.
+
+    Курсор - ключ (timestamp, _id) последнего отданного сообщения, поэтому
+    сообщения с одинаковым временем не теряются и не повторяются между страницами.
+    Ошибка в курсоре всплывает здесь, до начала ответа.
+    """
+    query: dict[str, Any] = {"dialogue_id": dialogue_id}
+    time_range: dict[str, datetime] = {}
+    if since is not None:
+        time_range["$gte"] = since
+    if until is not None:
+        time_range["$lt"] = until
+    if time_range:
+        query["timestamp"] = time_range
+    if cursor is not None:
+        last_timestamp, last_id = decode_cursor(cursor, size=2)
+        op = "$gt" if order == "asc" else "$lt"
+        query["$or"] = [
+            {"timestamp": {op: last_timestamp}},
+            {"timestamp": last_timestamp, "_id": {op: last_id}},
+        ]
+    return query
+
+
+def find_messages(query: dict[str, Any], order: SortOrder) -> AsyncIOMotorCursor:
+    direction = ASCENDING if order == "asc" else DESCENDING
+    return (
+        DialogueMessage.get_motor_collection()
+        .find(query, MESSAGE_PROJECTION)
+        .sort([("timestamp", direction), ("_id", direction)])
+    )
+
+
+def message_cursor(document: dict[str, Any]) -> str:
+    return encode_cursor(document["timestamp"], document["_id"])
+
+
+async def find_messages_page(
+    query: dict[str, Any],
+    limit: int,
+    order: SortOrder = "asc",
+) -> tuple[list[DialogueMessageRead], str | None]:
+    """
+    Прочитать страницу сообщений по индексу (dialogue_id, timestamp, _id).
+
+    Returns:
+        Сообщения страницы и курсор следующей страницы (None, если страница последняя)
+    """
+    documents = await find_messages(query, order).limit(limit + 1).to_list(limit + 1)
+    next_cursor = message_cursor(documents[limit - 1]) if len(documents) > limit else None
+    return [DialogueMessageRead.model_validate(to_public(document)) for document in documents[:limit]], next_cursor
+
+
+async def stream_messages(
+    query: dict[str, Any],
+    order: SortOrder = "asc",
+    output_format: Literal["ndjson", "sse"] = "ndjson",
+) -> AsyncIterator[bytes]:
+    """
+    Отдавать все сообщения окна прямо из курсора Motor, не собирая их в список.
+
+    В SSE id события - курсор после этого сообщения: клиент, переподключившись
+    с заголовком Last-Event-ID, продолжит выгрузку с того же места.
+    """
+    documents = find_messages(query, order).batch_size(STREAM_BATCH_SIZE)
+    async for document in documents:
+        cursor = message_cursor(document)
+        data = DialogueMessageRead.model_validate(to_public(document)).model_dump_json(by_alias=True).encode()
+        if output_format == "sse":
+            yield b"id: " + cursor.encode() + b"\nevent: message\ndata: " + data + b"\n\n"
+        else:
+            yield data + b"\n"
+    if output_format == "sse":
+        # Без явного конца клиент EventSource переподключится и начнёт заново
+        yield b"event: end\ndata: {}\n\n"
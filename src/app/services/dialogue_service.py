@@ -1,101 +1,413 @@
+from collections.abc import Iterable
+from datetime import UTC, datetime, timedelta
+from functools import partial
 from typing import cast
 
+from beanie import PydanticObjectId, UpdateResponse
+from beanie.operators import Set
 from fastapi import HTTPException, Request, status
 from fastapi.responses import JSONResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
-from app.schemas import IncomingMessage
-from app.services.channel_service import post_to_channel
-from core.database.models.channel import Channel
+from app.schemas import IncomingMessage, MessageBatchResult, MessageResult
+from app.services import metrics
+from app.services.channel_service import stream_to_channel
+from app.services.context_builder import context_builder
+from app.services.dedup import deduplicator
+from app.services.live_push import live_hub
+from app.services.llm import llm
+from app.services.lookup_cache import lookup_cache
+from app.services.outbox import outbox_dispatcher
+from app.services.reply_worker import QueueFullError, reply_pool
+from app.services.response_cache import response_cache
+from core import settings
+from core.database.models.channel import Channel, DeliveryMode
 from core.database.models.chat_bot import ChatBot
 from core.database.models.dialogue import Dialogue, DialogueMessage, MessageRole
-from predict.mock_llm_call import mock_llm_call
 
 bearer_scheme = HTTPBearer()
 
+DUPLICATE_KEY_ERROR = 11000
+
+
+def reply_message_id(message_id: str) -> str:
+    return f"{message_id}-bot"
+
 
 class DialogueService:
-    def __init__(self, request: Request):
+    def __init__(self, request: Request, channel_id: str | None = None):
         self.request = request
+        self.channel_id = channel_id
 
     async def validate_bot(self) -> ChatBot:
         credentials: HTTPAuthorizationCredentials | None = await bearer_scheme(self.request)
         if not credentials:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid bot token")
-        bot = await ChatBot.find_one(ChatBot.secret_token == credentials.credentials)
+        with metrics.bot_lookup_seconds.time():
+            bot = await lookup_cache.get_bot(credentials.credentials)
         if not bot:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid bot token")
         return bot
 
-    async def get_channel(self, bot: ChatBot) -> Channel:
-        channel = await Channel.find_one(Channel.bot_id == bot.id)
-        if not channel:
+    async def get_channels(self, bot: ChatBot) -> list[Channel]:
+        """
+        Каналы для ответа: первый - канал, из которого пришло сообщение, за ним каналы с fanout.
+
+        Канал сообщения задаётся параметром channel_id или заголовком
+        X-Channel-ID. Без него берётся первый канал бота без fanout - так
+        продолжают работать интеграции, у которых один канал на бота.
+        """
+        with metrics.channel_lookup_seconds.time():
+            channels = await lookup_cache.get_channels(str(bot.id))
+        if self.channel_id is not None:
+            source = next((channel for channel in channels if str(channel.id) == self.channel_id), None)
+        else:
+            source = next((channel for channel in channels if not channel.fanout), channels[0] if channels else None)
+        if source is None:
             raise HTTPException(status_code=404, detail="Channel not found")
-        return channel
+        return [source, *(channel for channel in channels if channel.fanout and channel.id != source.id)]
 
     async def get_or_create_dialogue(self, bot: ChatBot, msg: IncomingMessage) -> Dialogue:
-        dialogue = await Dialogue.find_one(
-            Dialogue.chat_bot_id == bot.id,
-            Dialogue.chat_id == msg.chat_id,
-        )
-        if dialogue:
-            return dialogue
+        """
+        Найти или создать диалог одной атомарной операцией.
 
+        Уникальный индекс (chat_bot_id, chat_id) не даёт параллельным первым
+        сообщениям чата создать два диалога: проигравший upsert получает
+        DuplicateKeyError и повторяется уже как обновление.
+        """
         if not bot.id:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Bot ID is None")
 
-        dialogue = cast(
-            "Dialogue",
-            Dialogue.model_validate(
+        now = datetime.now(UTC)
+        for _ in range(2):
+            try:
+                with metrics.dialogue_load_seconds.time():
+                    dialogue = await Dialogue.find_one(
+                        Dialogue.chat_bot_id == bot.id,
+                        Dialogue.chat_id == msg.chat_id,
+                    ).update(
+                        {
+                            "$set": {"updated_at": now},
+                            # Новое сообщение отменяет начатую архивацию, см. RetentionJob.archive_dialogue
+                            "$unset": {"archived_at": ""},
+                            "$setOnInsert": {"chat_bot_id": bot.id, "chat_id": msg.chat_id, "created_at": now},
+                        },
+                        upsert=True,
+                        response_type=UpdateResponse.NEW_DOCUMENT,
+                    )
+            except DuplicateKeyError:
+                continue
+            return cast("Dialogue", dialogue)
+
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Dialogue is being created, retry later")
+
+    async def get_or_create_dialogues(self, bot: ChatBot, chat_ids: Iterable[str]) -> dict[str, Dialogue]:
+        """Найти или создать диалоги нескольких чатов одним bulk_write и одним find."""
+        chat_ids = list(chat_ids)
+        now = datetime.now(UTC)
+        operations = [
+            UpdateOne(
+                {"chat_bot_id": bot.id, "chat_id": chat_id},
                 {
-                    "chat_bot_id": bot.id,
-                    "chat_id": msg.chat_id,
+                    "$set": {"updated_at": now},
+                    "$unset": {"archived_at": ""},
+                    "$setOnInsert": {"chat_bot_id": bot.id, "chat_id": chat_id, "created_at": now},
                 },
-            ),
+                upsert=True,
+            )
+            for chat_id in chat_ids
+        ]
+        with metrics.dialogue_load_seconds.time():
+            try:
+                await Dialogue.get_motor_collection().bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                # Параллельный upsert уже создал диалог, он найдётся ниже
+                if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details["writeErrors"]):
+                    raise
+
+            dialogues = await Dialogue.find({"chat_bot_id": bot.id, "chat_id": {"$in": chat_ids}}).to_list()
+        if len(dialogues) < len(chat_ids):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Dialogue is being created, retry later")
+        return {dialogue.chat_id: dialogue for dialogue in dialogues}
+
+    def build_message(
+        self,
+        bot: ChatBot,
+        dialogue: Dialogue,
+        msg: IncomingMessage,
+        timestamp: datetime | None = None,
+    ) -> DialogueMessage:
+        role = MessageRole.USER if msg.message_sender == "customer" else MessageRole.ASSISTANT
+        message = DialogueMessage(
+            dialogue_id=dialogue.id,
+            chat_bot_id=bot.id,
+            message_id=msg.message_id,
+            chat_id=msg.chat_id,
+            text=msg.text,
+            role=role,
+        )
+        if timestamp is not None:
+            message.timestamp = timestamp
+        return message
+
+    async def find_saved_message_ids(self, bot: ChatBot, message_ids: list[str]) -> set[str]:
+        """message_id, уже сохранённые для бота, одним запросом по уникальному индексу."""
+        cursor = DialogueMessage.get_motor_collection().find(
+            {"chat_bot_id": bot.id, "message_id": {"$in": message_ids}},
+            {"message_id": 1, "_id": 0},
         )
-        await dialogue.insert()
-        return dialogue
+        return {document["message_id"] async for document in cursor}
+
+    async def save_messages(self, messages: list[DialogueMessage]) -> set[str]:
+        """Сохранить сообщения одним insert_many. Возвращает message_id, которые уже были сохранены."""
+        # insert_many не проставляет _id в документы Beanie, а он нужен событию live
+        for message in messages:
+            message.id = message.id or PydanticObjectId()
+        try:
+            with metrics.save_seconds.time():
+                await DialogueMessage.insert_many(messages, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details["writeErrors"]
+            if any(error["code"] != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            duplicates = {messages[error["index"]].message_id for error in errors}
+        else:
+            duplicates = set()
+        for message in messages:
+            if message.message_id not in duplicates:
+                live_hub.publish(message)
+        return duplicates
+
+    async def save_message(self, message: DialogueMessage) -> bool:
+        """Сохранить сообщение. Возвращает False, если сообщение уже было сохранено."""
+        try:
+            with metrics.save_seconds.time():
+                await message.insert()
+        except DuplicateKeyError:
+            return False
+        live_hub.publish(message)
+        return True
+
+    async def find_unanswered(self, bot: ChatBot, message_id: str) -> DialogueMessage | None:
+        """Сохранённое сообщение клиента, ответ на которое ещё не записан."""
+        stored = await DialogueMessage.find(
+            {"chat_bot_id": bot.id, "message_id": {"$in": [message_id, reply_message_id(message_id)]}},
+        ).to_list()
+        if len(stored) != 1 or stored[0].role != MessageRole.USER:
+            return None
+        return stored[0]
 
     async def process_message(self, msg: IncomingMessage) -> JSONResponse:
-        bot = await self.validate_bot()
-        channel = await self.get_channel(bot)
-        dialogue = await self.get_or_create_dialogue(bot, msg)
+        """
+        Сохранить сообщение и поставить генерацию ответа в очередь.
 
-        if any(m.message_id == msg.message_id for m in dialogue.message_list):
+        Повтор сообщения, на которое ответ так и не был записан (генерация
+        упала или процесс перезапустился), не отклоняется как дубль, а
+        снова ставит генерацию в очередь: иначе ответ был бы потерян.
+        """
+        bot = await self.validate_bot()
+        if deduplicator.is_duplicate(bot.id, msg.message_id):
+            metrics.duplicate_messages.inc()
             return JSONResponse(status_code=409, content={"detail": "Duplicate message"})
 
-        role = MessageRole.USER if msg.message_sender == "customer" else MessageRole.ASSISTANT
-        dialogue.message_list.append(
-            DialogueMessage(message_id=msg.message_id, chat_id=msg.chat_id, text=msg.text, role=role),
+        channels = await self.get_channels(bot)
+
+        try:
+            with reply_pool.reserve() as slot:
+                dialogue = await self.get_or_create_dialogue(bot, msg)
+
+                message = self.build_message(bot, dialogue, msg)
+                saved = await self.save_message(message)
+                deduplicator.remember(bot.id, msg.message_id)
+                if not saved:
+                    unanswered = await self.find_unanswered(bot, msg.message_id)
+                    if unanswered is None:
+                        metrics.duplicate_messages.inc()
+                        return JSONResponse(status_code=409, content={"detail": "Duplicate message"})
+                    message = unanswered
+
+                if msg.message_sender == "employee":
+                    metrics.employee_messages.inc()
+                    return JSONResponse(status_code=200, content={"detail": "Employee message saved"})
+
+                slot.submit(
+                    partial(self.generate_reply, bot, channels, dialogue, message),
+                    lane=f"{bot.id}:{msg.chat_id}",
+                    coalesce=True,
+                )
+        except QueueFullError:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many messages, retry later",
+                headers={"Retry-After": "1"},
+            )
+
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"detail": "Accepted"})
+
+    async def process_messages(self, messages: list[IncomingMessage]) -> MessageBatchResult:
+        """
+        Принять пачку сообщений одним запросом.
+
+        Токен проверяется один раз, дубли отсекаются одним запросом, диалоги
+        создаются одним bulk_write, сообщения сохраняются одним insert_many,
+        а ответ генерируется по одному на чат - на последнее сообщение клиента.
+        """
+        bot = await self.validate_bot()
+        channels = await self.get_channels(bot)
+
+        # Повторы внутри пачки и недавно полученные сообщения в БД не идут
+        fresh: dict[str, IncomingMessage] = {}
+        for msg in messages:
+            if msg.message_id not in fresh and not deduplicator.is_duplicate(bot.id, msg.message_id):
+                fresh[msg.message_id] = msg
+        if fresh:
+            for message_id in await self.find_saved_message_ids(bot, list(fresh)):
+                del fresh[message_id]
+
+        by_chat: dict[str, list[IncomingMessage]] = {}
+        for msg in fresh.values():
+            by_chat.setdefault(msg.chat_id, []).append(msg)
+        reply_chats = [
+            chat_id
+            for chat_id, chat_messages in by_chat.items()
+            if any(m.message_sender == "customer" for m in chat_messages)
+        ]
+
+        saved: set[str] = set()
+        try:
+            with reply_pool.reserve_many(len(reply_chats)) as slots:
+                if not by_chat:
+                    return self.batch_result(bot, messages, saved)
+
+                dialogues = await self.get_or_create_dialogues(bot, by_chat)
+                # Mongo хранит время с точностью до миллисекунды, шаг в 1 мс сохраняет порядок пачки.
+                # Шаги отсчитываются назад от момента приёма: последнее сообщение получает текущее время,
+                # и большая пачка не уходит в будущее, обгоняя сообщения следующих запросов.
+                received = datetime.now(UTC)
+                newest = len(fresh) - 1
+                stored = [
+                    self.build_message(bot, dialogues[msg.chat_id], msg, received - timedelta(milliseconds=newest - i))
+                    for i, msg in enumerate(fresh.values())
+                ]
+                saved = {message.message_id for message in stored} - await self.save_messages(stored)
+
+                last_customer_message = {
+                    message.chat_id: message
+                    for message in stored
+                    if message.role == MessageRole.USER and message.message_id in saved
+                }
+                for slot, chat_id in zip(slots, reply_chats, strict=True):
+                    if last := last_customer_message.get(chat_id):
+                        slot.submit(
+                            partial(self.generate_reply, bot, channels, dialogues[chat_id], last),
+                            lane=f"{bot.id}:{chat_id}",
+                            coalesce=True,
+                        )
+        except QueueFullError:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many messages, retry later",
+                headers={"Retry-After": "1"},
+            )
+
+        return self.batch_result(bot, messages, saved)
+
+    def batch_result(self, bot: ChatBot, messages: list[IncomingMessage], saved: set[str]) -> MessageBatchResult:
+        results = []
+        accepted = set()
+        for msg in messages:
+            deduplicator.remember(bot.id, msg.message_id)
+            # Повтор того же message_id дальше в пачке - дубль
+            if msg.message_id not in saved or msg.message_id in accepted:
+                results.append(MessageResult(message_id=msg.message_id, status="duplicate"))
+                continue
+            accepted.add(msg.message_id)
+            result_status = "accepted" if msg.message_sender == "customer" else "saved"
+            results.append(MessageResult(message_id=msg.message_id, status=result_status))
+
+        duplicates = len(results) - len(accepted)
+        metrics.duplicate_messages.inc(duplicates)
+        metrics.employee_messages.inc(
+            sum(1 for msg in messages if msg.message_sender == "employee" and msg.message_id in accepted),
+        )
+        return MessageBatchResult(saved=len(accepted), duplicates=duplicates, results=results)
+
+    async def generate_reply(
+        self,
+        bot: ChatBot,
+        channels: list[Channel],
+        dialogue: Dialogue,
+        msg: DialogueMessage,
+    ) -> None:
+        """
+        Сгенерировать и отправить ответ на сообщение клиента.
+
+        Сообщения одного чата обрабатываются по очереди, а серия сообщений
+        получает один ответ на последнее: если в чате уже есть более новое
+        сообщение клиента, ответ сформирует задача для него.
+
+        Промежуточные события получает только канал сообщения (первый в
+        channels), итоговый ответ ставится в outbox для каждого канала
+        отдельно, и каждый доставляется со своим таймаутом и повторами.
+
+        Если генерация упала, отметка дедупликатора снимается, и повтор
+        вебхука поставит ответ заново.
+        """
+        try:
+            await self._generate_reply(bot, channels, dialogue, msg)
+        except Exception:
+            # Повтор вебхука должен дойти до БД и заново поставить генерацию, см. process_message
+            deduplicator.forget(bot.id, msg.message_id)
+            raise
+
+    async def _generate_reply(
+        self,
+        bot: ChatBot,
+        channels: list[Channel],
+        dialogue: Dialogue,
+        msg: DialogueMessage,
+    ) -> None:
+        channel = channels[0]
+        newer = await DialogueMessage.find_one(
+            DialogueMessage.dialogue_id == dialogue.id,
+            DialogueMessage.role == MessageRole.USER,
+            DialogueMessage.timestamp > msg.timestamp,
         )
-        await dialogue.save()
+        if newer:
+            return
+
+        with metrics.context_seconds.time():
+            context = await context_builder.build(dialogue)
 
-        if msg.message_sender == MessageRole.ASSISTANT:
-            return JSONResponse(status_code=200, content={"detail": "Employee message saved"})
+        async def generate() -> str:
+            if channel.delivery_mode == DeliveryMode.MESSAGE:
+                # Без промежуточных событий стриминг не нужен, запрос может уйти в пачке с другими
+                return await llm.complete(dialogue.chat_bot_id, context)
+            chunks = llm.stream(dialogue.chat_bot_id, context)
+            return await stream_to_channel(channel, msg.chat_id, chunks, settings.streaming)
 
-        llm_response = await mock_llm_call(dialogue.message_list)
+        with metrics.llm_seconds.time():
+            llm_response = await response_cache.get_or_generate(bot, context, generate)
 
-        success = await post_to_channel(
-            str(channel.channel_url),
-            channel.channel_token,
+        await outbox_dispatcher.enqueue_many(
+            channels,
             {
                 "event_type": "new_message",
                 "chat_id": msg.chat_id,
                 "text": llm_response,
             },
+            message_key=msg.message_id,
         )
-        if not success:
-            # todo: add logger
-            pass
-
-        dialogue.message_list.append(
-            DialogueMessage(
-                message_id=f"{msg.message_id}-bot",
-                chat_id=msg.chat_id,
-                text=llm_response,
-                role=MessageRole.ASSISTANT,
-            ),
-        )
-        await dialogue.save()
 
-        return JSONResponse(status_code=200, content={"detail": "OK"})
+        reply = DialogueMessage(
+            dialogue_id=dialogue.id,
+            chat_bot_id=dialogue.chat_bot_id,
+            message_id=reply_message_id(msg.message_id),
+            chat_id=msg.chat_id,
+            text=llm_response,
+            role=MessageRole.ASSISTANT,
+        )
+        if await self.save_message(reply):
+            await Dialogue.find_one(Dialogue.id == dialogue.id).update(Set({Dialogue.updated_at: reply.timestamp}))
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from importlib.util import find_spec
+from typing import Any
+
+import httpx
+
+from app.schemas import HttpPoolStats
+from core import settings
+from core.settings_model import HttpClientSettings
+
+HTTP2_AVAILABLE = find_spec("h2") is not None
+
+
+class HostPool:
+    """Пул соединений к одному хосту со счётчиками для подбора лимитов."""
+
+    def __init__(self, host: str, config: HttpClientSettings) -> None:
+        self.host = host
+        self.max_connections = config.max_connections_per_host
+        self.pool_timeout = config.pool_timeout
+        self._transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=config.max_connections_per_host,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry,
+            ),
+            http2=config.http2 and HTTP2_AVAILABLE,
+        )
+        self.client = httpx.AsyncClient(
+            transport=self._transport,
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout, pool=config.pool_timeout),
+        )
+        # Ограничиваем запросы сами, чтобы видеть очередь на соединение и время ожидания в ней.
+        self._slots = asyncio.Semaphore(config.max_connections_per_host)
+        self.in_use = 0
+        self.waiting = 0
+        self.requests = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            # Семафор стоит перед пулом httpx, поэтому его pool-таймаут сюда не доходит: ждём слот сами.
+            async with asyncio.timeout(self.pool_timeout):
+                await self._slots.acquire()
+        except TimeoutError:
+            raise httpx.PoolTimeout(f"No free connection to {self.host} within {self.pool_timeout}s") from None
+        finally:
+            self.waiting -= 1
+
+        waited = time.perf_counter() - started
+        self.requests += 1
+        self.wait_time_total += waited
+        self.wait_time_max = max(self.wait_time_max, waited)
+        self.in_use += 1
+        try:
+            yield
+        finally:
+            self.in_use -= 1
+            self._slots.release()
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        async with self._slot():
+            return await self.client.request(method, url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs: Any) -> AsyncIterator[httpx.Response]:
+        """Потоковый запрос: соединение занято, пока не прочитан ответ."""
+        async with self._slot(), self.client.stream(method, url, **kwargs) as response:
+            yield response
+
+    def stats(self) -> HttpPoolStats:
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        return HttpPoolStats(
+            host=self.host,
+            max_connections=self.max_connections,
+            connections=len(connections),
+            idle=sum(1 for connection in connections if connection.is_idle()),
+            in_use=self.in_use,
+            waiting=self.waiting,
+            requests=self.requests,
+            wait_time_avg=self.wait_time_total / self.requests if self.requests else 0.0,
+            wait_time_max=self.wait_time_max,
+        )
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class HttpClientRegistry:
+    """
+    Общие исходящие HTTP клиенты приложения.
+
+    На каждый хост заводится свой пул соединений с keep-alive, поэтому
+    ответы в один и тот же канал переиспользуют соединения, а медленный
+    хост не занимает соединения остальных.
+    """
+
+    def __init__(self, config: HttpClientSettings) -> None:
+        self.config = config
+        self._pools: dict[str, HostPool] = {}
+
+    def get_pool(self, url: str) -> HostPool:
+        parsed = httpx.URL(url)
+        host = f"{parsed.scheme}://{parsed.netloc.decode()}"
+        pool = self._pools.get(host)
+        if pool is None:
+            pool = self._pools[host] = HostPool(host, self.config)
+        return pool
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.get_pool(url).request("POST", url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs: Any) -> AsyncIterator[httpx.Response]:
+        async with self.get_pool(url).stream(method, url, **kwargs) as response:
+            yield response
+
+    def stats(self) -> list[HttpPoolStats]:
+        return [pool.stats() for pool in self._pools.values()]
+
+    async def aclose(self) -> None:
+        pools, self._pools = list(self._pools.values()), {}
+        await asyncio.gather(*(pool.aclose() for pool in pools))
+
+
+http_clients = HttpClientRegistry(settings.http_client)
@@ -0,0 +1,178 @@
+import asyncio
+from collections.abc import Iterator
+from contextlib import contextmanager, suppress
+from typing import Any, NamedTuple
+
+from loguru import logger
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.schemas import DialogueMessageEvent
+from app.services import metrics
+from app.services.pagination import to_public
+from core import settings
+from core.database.models.dialogue import DialogueMessage
+from core.settings_model import LivePushSettings
+
+
+class TooManySubscribersError(Exception):
+    """Достигнут лимит подписчиков процесса."""
+
+
+class SubscriptionClosedError(Exception):
+    """Подписка закрыта: подписчик не успевал забирать события или сервер останавливается."""
+
+
+class LiveEvent(NamedTuple):
+    message_id: str
+    chat_id: str
+    # JSON сериализуется один раз на событие, а не на каждого подписчика
+    data: str
+
+
+class Subscription:
+    """Подписка на новые сообщения бота или одного его чата с ограниченным буфером."""
+
+    def __init__(self, bot_id: str, chat_id: str | None, queue_size: int) -> None:
+        self.bot_id = bot_id
+        self.chat_id = chat_id
+        self.closed = False
+        self.reason: str | None = None
+        self._queue: asyncio.Queue[LiveEvent | None] = asyncio.Queue(queue_size)
+
+    def offer(self, event: LiveEvent) -> bool:
+        """Положить событие в буфер, False - буфер полон."""
+        if self.chat_id is not None and event.chat_id != self.chat_id:
+            return True
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def close(self, reason: str) -> None:
+        """Закрыть подписку: подписчик получит уже буферизованные события и затем SubscriptionClosedError."""
+        self.closed = True
+        self.reason = reason
+        with suppress(asyncio.QueueFull):
+            # Будит подписчика, который ждёт событие; при полном буфере он и так не ждёт
+            self._queue.put_nowait(None)
+
+    async def next(self, wait: float) -> LiveEvent | None:
+        """Следующее событие или None, если за wait секунд событий не было."""
+        if self.closed and self._queue.empty():
+            raise SubscriptionClosedError(self.reason)
+        try:
+            event = await asyncio.wait_for(self._queue.get(), wait)
+        except TimeoutError:
+            return None
+        if event is None:
+            raise SubscriptionClosedError(self.reason)
+        return event
+
+
+class LiveHub:
+    """
+    Pub/sub новых сообщений диалогов внутри процесса для консолей операторов.
+
+    DialogueService публикует сохранённые сообщения, подписчики получают их
+    через SSE или WebSocket. Публикация не ждёт подписчиков: у каждого свой
+    буфер, и подписчик, который не успевает его разбирать, отключается.
+    После переподключения пропущенное дочитывается через API истории.
+
+    С несколькими воркерами uvicorn сообщения сохраняются в разных процессах.
+    Тогда включается чтение change stream коллекции dialogue_messages
+    (требует replica set), и все события приходят из него, а не из
+    DialogueService.
+    """
+
+    def __init__(self, config: LivePushSettings) -> None:
+        self.config = config
+        self._subscriptions: dict[str, set[Subscription]] = {}
+        self._count = 0
+        self._watcher: asyncio.Task[None] | None = None
+
+    @property
+    def subscribers(self) -> int:
+        return self._count
+
+    def add(self, bot_id: str, chat_id: str | None = None) -> Subscription:
+        if self._count >= self.config.max_subscribers:
+            raise TooManySubscribersError
+        subscription = Subscription(bot_id, chat_id, self.config.subscriber_queue_size)
+        self._subscriptions.setdefault(bot_id, set()).add(subscription)
+        self._count += 1
+        metrics.live_subscribers.set(self._count)
+        return subscription
+
+    def discard(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.bot_id)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.bot_id]
+        self._count -= 1
+        metrics.live_subscribers.set(self._count)
+
+    @contextmanager
+    def subscribe(self, bot_id: str, chat_id: str | None = None) -> Iterator[Subscription]:
+        subscription = self.add(bot_id, chat_id)
+        try:
+            yield subscription
+        finally:
+            self.discard(subscription)
+
+    def publish(self, message: DialogueMessage) -> None:
+        """Опубликовать сообщение, сохранённое в этом процессе; при чтении change stream оно придёт оттуда."""
+        if self.config.watch_changes or str(message.chat_bot_id) not in self._subscriptions:
+            return
+        self._publish(DialogueMessageEvent.model_validate(message, from_attributes=True))
+
+    def _publish(self, message: DialogueMessageEvent) -> None:
+        subscriptions = self._subscriptions.get(str(message.chat_bot_id))
+        if not subscriptions:
+            return
+        event = LiveEvent(message.message_id, message.chat_id, message.model_dump_json(by_alias=True))
+        for subscription in list(subscriptions):
+            if not subscription.offer(event):
+                logger.warning(f"Live subscriber of bot {subscription.bot_id} is too slow, disconnecting")
+                metrics.live_dropped_subscribers.inc()
+                self.discard(subscription)
+                subscription.close("slow consumer")
+
+    def start(self) -> None:
+        if self.config.watch_changes and self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch(), name="live-push-messages")
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._watcher
+            self._watcher = None
+        for subscriptions in list(self._subscriptions.values()):
+            for subscription in list(subscriptions):
+                self.discard(subscription)
+                subscription.close("shutdown")
+
+    async def _watch(self) -> None:
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        resume_token: Any = None
+        while True:
+            try:
+                collection = DialogueMessage.get_motor_collection()
+                async with collection.watch(pipeline, resume_after=resume_token) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        if str(change["fullDocument"]["chat_bot_id"]) in self._subscriptions:
+                            self._publish(DialogueMessageEvent.model_validate(to_public(change["fullDocument"])))
+            except PyMongoError as e:
+                # С resume token поток продолжится с последнего события; если сервер его отверг
+                # (например, oplog уже перезаписан), открываем поток заново, события за паузу теряются
+                logger.warning(f"Change stream for live messages failed: {e!r}")
+                if isinstance(e, OperationFailure):
+                    resume_token = None
+                await asyncio.sleep(self.config.watch_retry_interval)
+
+
+live_hub = LiveHub(settings.live)
@@ -0,0 +1,20 @@
+from app.services.http_client import http_clients
+from core import settings
+from core.settings_model import LLMSettings
+from predict.backends import LLMBackend, MockBackend, OpenAICompatibleBackend
+from predict.scheduler import LLMScheduler
+
+
+def create_backend(config: LLMSettings) -> LLMBackend:
+    if config.backend == "openai":
+        return OpenAICompatibleBackend(
+            http_clients,
+            base_url=config.base_url,
+            model=config.model,
+            api_key=config.api_key,
+            request_timeout=config.request_timeout,
+        )
+    return MockBackend(config.mock_min_delay, config.mock_max_delay)
+
+
+llm = LLMScheduler(create_backend(settings.llm), settings.llm)
@@ -0,0 +1,167 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable, Iterable
+from contextlib import suppress
+from typing import Any
+
+from loguru import logger
+from pymongo.errors import PyMongoError
+
+from core import settings
+from core.cache import CacheStats, TTLCache
+from core.database.models.channel import Channel
+from core.database.models.chat_bot import ChatBot
+from core.settings_model import LookupCacheSettings
+
+
+class AsyncLoadingCache[K: Hashable, V]:
+    """
+    TTL кэш, загружающий отсутствующие значения не более одного раза.
+
+    Параллельные запросы одного ключа ждут одну загрузку (single-flight),
+    поэтому истечение популярной записи не вызывает лавину запросов в БД.
+    Пустые результаты не кэшируются.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self._cache: TTLCache[K, V] = TTLCache(max_size, ttl)
+        self._inflight: dict[K, asyncio.Task[V | None]] = {}
+
+    async def get(self, key: K, loader: Callable[[], Awaitable[V | None]]) -> V | None:
+        value = self._cache.get(key)
+        if value is not None:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, loader))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key: K, loader: Callable[[], Awaitable[V | None]]) -> V | None:
+        try:
+            value = await loader()
+            # Если ключ инвалидировали во время загрузки, значение могло уже устареть
+            if value is not None and self._inflight.get(key) is asyncio.current_task():
+                self._cache.set(key, value)
+            return value
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    def invalidate(self, key: K) -> None:
+        self._cache.pop(key)
+        self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._inflight.clear()
+
+    def stats(self) -> CacheStats:
+        return self._cache.stats()
+
+
+class LookupCache:
+    """
+    Кэш поиска бота по токену и его каналов для вебхука.
+
+    Локально инвалидируется обработчиками API каналов. Для нескольких
+    воркеров uvicorn можно включить слежение за change stream Mongo
+    (требует replica set), тогда изменения из других процессов тоже
+    сбрасывают кэш.
+    """
+
+    def __init__(self, config: LookupCacheSettings) -> None:
+        self.config = config
+        self.bots: AsyncLoadingCache[str, ChatBot] = AsyncLoadingCache(config.max_size, config.ttl)
+        self.channels: AsyncLoadingCache[str, list[Channel]] = AsyncLoadingCache(config.max_size, config.ttl)
+        # Обратные ссылки для инвалидации по событиям change stream, где известен только _id документа.
+        # Живут столько же, сколько записи кэша, на которые ссылаются; без ссылки запись устареет не дольше ttl.
+        self._bot_tokens: TTLCache[str, str] = TTLCache(config.max_size, config.ttl)
+        self._channel_bots: TTLCache[str, str] = TTLCache(config.max_size, config.ttl)
+        self._watchers: list[asyncio.Task[None]] = []
+
+    async def get_bot(self, secret_token: str) -> ChatBot | None:
+        async def load() -> ChatBot | None:
+            bot = await ChatBot.find_one(ChatBot.secret_token == secret_token)
+            if bot:
+                self._bot_tokens.set(str(bot.id), secret_token)
+            return bot
+
+        return await self.bots.get(secret_token, load)
+
+    async def get_channels(self, bot_id: str) -> list[Channel]:
+        """Каналы бота в порядке создания, пустой список не кэшируется."""
+
+        async def load() -> list[Channel] | None:
+            channels = await Channel.find(Channel.bot_id == bot_id).sort("+_id").to_list()
+            for channel in channels:
+                self._channel_bots.set(str(channel.id), bot_id)
+            return channels or None
+
+        return await self.channels.get(bot_id, load) or []
+
+    def invalidate_bot(self, bot_id: str) -> None:
+        token = self._bot_tokens.pop(bot_id)
+        if token is not None:
+            self.bots.invalidate(token)
+
+    def invalidate_channel(self, channel: Channel) -> None:
+        self.invalidate_channels([str(channel.id)], [channel.bot_id])
+
+    def invalidate_channels(self, channel_ids: Iterable[str], bot_ids: Iterable[str]) -> None:
+        """Сбросить кэш после изменения каналов и ботов, к которым они относились или теперь относятся."""
+        for bot_id in bot_ids:
+            self.channels.invalidate(bot_id)
+        for channel_id in channel_ids:
+            previous_bot_id = self._channel_bots.pop(channel_id)
+            if previous_bot_id is not None:
+                self.channels.invalidate(previous_bot_id)
+
+    def clear(self) -> None:
+        self.bots.clear()
+        self.channels.clear()
+        self._bot_tokens.clear()
+        self._channel_bots.clear()
+
+    def start(self) -> None:
+        if not self.config.watch_changes or self._watchers:
+            return
+        self._watchers = [
+            asyncio.create_task(self._watch(ChatBot, self._on_bot_change), name="lookup-cache-bots"),
+            asyncio.create_task(self._watch(Channel, self._on_channel_change), name="lookup-cache-channels"),
+        ]
+
+    async def stop(self) -> None:
+        for watcher in self._watchers:
+            watcher.cancel()
+        for watcher in self._watchers:
+            with suppress(asyncio.CancelledError):
+                await watcher
+        self._watchers = []
+
+    def _on_bot_change(self, event: dict[str, Any]) -> None:
+        self.invalidate_bot(str(event["documentKey"]["_id"]))
+
+    def _on_channel_change(self, event: dict[str, Any]) -> None:
+        channel_id = str(event["documentKey"]["_id"])
+        previous_bot_id = self._channel_bots.pop(channel_id)
+        if previous_bot_id is not None:
+            self.channels.invalidate(previous_bot_id)
+        if bot_id := (event.get("fullDocument") or {}).get("bot_id"):
+            self.channels.invalidate(bot_id)
+
+    async def _watch(self, model: type[ChatBot | Channel], on_change: Callable[[dict[str, Any]], None]) -> None:
+        while True:
+            try:
+                async with model.get_motor_collection().watch(full_document="updateLookup") as stream:
+                    # Пока поток не был открыт, изменения могли быть пропущены
+                    self.clear()
+                    async for event in stream:
+                        on_change(event)
+            except PyMongoError as e:
+                logger.warning(f"Change stream for {model.__name__} failed, cache is reset: {e!r}")
+                self.clear()
+                await asyncio.sleep(self.config.watch_retry_interval)
+
+
+lookup_cache = LookupCache(settings.lookup_cache)
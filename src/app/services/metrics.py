@@ -0,0 +1,42 @@
+"""Метрики обработки вебхука, отдаются на /metrics."""
+
+from app.services.reply_worker import reply_pool
+from core import metrics
+
+stage_seconds = metrics.histogram(
+    "webhook_stage_seconds",
+    "Duration of webhook processing stages",
+    ("stage",),
+)
+# Дочерние метрики заранее, чтобы на горячем пути не искать их по меткам
+bot_lookup_seconds = stage_seconds.labels("bot_lookup")
+channel_lookup_seconds = stage_seconds.labels("channel_lookup")
+dialogue_load_seconds = stage_seconds.labels("dialogue_load")
+context_seconds = stage_seconds.labels("context")
+save_seconds = stage_seconds.labels("save")
+llm_seconds = stage_seconds.labels("llm")
+delivery_seconds = stage_seconds.labels("delivery")
+
+duplicate_messages = metrics.counter("webhook_duplicate_messages", "Incoming messages rejected as duplicates")
+employee_messages = metrics.counter("webhook_employee_messages", "Employee messages saved without a reply")
+
+channel_deliveries = metrics.counter("channel_deliveries", "Requests sent to channels", ("result",))
+delivery_successes = channel_deliveries.labels("success")
+delivery_failures = channel_deliveries.labels("failure")
+delivery_rejections = channel_deliveries.labels("rejected")
+
+retention_archived_dialogues = metrics.counter("retention_archived_dialogues", "Dialogues moved to the archive")
+retention_trimmed_messages = metrics.counter("retention_trimmed_messages", "Summarized messages deleted by retention")
+retention_bytes_reclaimed = metrics.counter(
+    "retention_bytes_reclaimed",
+    "Bytes freed in working collections, archive size subtracted",
+)
+
+live_subscribers = metrics.gauge("live_subscribers", "Open live message subscriptions")
+live_dropped_subscribers = metrics.counter(
+    "live_dropped_subscribers",
+    "Live subscribers disconnected because their buffer was full",
+)
+
+reply_queue_depth = metrics.gauge("reply_queue_depth", "Reply jobs waiting for a worker, including reserved slots")
+reply_queue_depth.set_function(lambda: reply_pool.depth)
@@ -0,0 +1,231 @@
+import asyncio
+import random
+from asyncio import FIRST_COMPLETED
+from datetime import UTC, datetime, timedelta
+from typing import Any
+from uuid import uuid4
+
+from beanie.operators import In, Set
+from loguru import logger
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.services import metrics
+from app.services.channel_service import DeliveryResult, send_to_channel
+from core import settings
+from core.database.models.channel import Channel
+from core.database.models.outbox import DeadLetterMessage, OutboxMessage
+from core.settings_model import OutboxSettings
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def backoff_delay(attempts: int, config: OutboxSettings) -> float:
+    """Экспоненциальная задержка перед следующей попыткой со случайной составляющей."""
+    delay = min(config.max_delay, config.base_delay * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class OutboxDispatcher:
+    """
+    Доставляет сообщения из коллекции outbox в каналы.
+
+    Сообщения забираются пачками с арендой на `lease` секунд, поэтому
+    несколько воркеров не отправят одно сообщение одновременно, а
+    сообщения упавшего воркера будут подобраны после истечения аренды.
+    Доставка "хотя бы один раз": канал отбрасывает повторы по Idempotency-Key.
+
+    Результат каждого сообщения записывается сразу после его доставки, а
+    новые сообщения забираются, пока медленные каналы ещё отвечают: канал
+    с долгим таймаутом не задерживает доставку в остальные.
+    """
+
+    def __init__(self, config: OutboxSettings) -> None:
+        self.config = config
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._inflight: set[asyncio.Task[None]] = set()
+        self._stopping = False
+
+    def build_message(self, channel: Channel, payload: dict[str, Any], idempotency_key: str) -> OutboxMessage:
+        return OutboxMessage(
+            idempotency_key=idempotency_key,
+            channel_id=str(channel.id),
+            channel_url=str(channel.channel_url),
+            channel_token=channel.channel_token,
+            request_timeout=channel.delivery_timeout,
+            payload=payload,
+        )
+
+    async def enqueue(self, channel: Channel, payload: dict[str, Any], idempotency_key: str) -> None:
+        try:
+            await self.build_message(channel, payload, idempotency_key).insert()
+        except DuplicateKeyError:
+            logger.info(f"Outbox message {idempotency_key} is already enqueued")
+        self._wakeup.set()
+
+    async def enqueue_many(self, channels: list[Channel], payload: dict[str, Any], message_key: str) -> None:
+        """Поставить одно сообщение в несколько каналов одной вставкой, ключ - channel_id:message_key."""
+        messages = [self.build_message(channel, payload, f"{channel.id}:{message_key}") for channel in channels]
+        try:
+            await OutboxMessage.insert_many(messages, ordered=False)
+        except BulkWriteError as e:
+            if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details["writeErrors"]):
+                raise
+            logger.info(f"Outbox messages for {message_key} are already enqueued")
+        self._wakeup.set()
+
+    async def claim_batch(self, limit: int | None = None) -> list[OutboxMessage]:
+        now = datetime.now(UTC)
+        due = {
+            "next_attempt_at": {"$lte": now},
+            "$or": [{"locked_until": None}, {"locked_until": {"$lt": now}}],
+        }
+        candidates = (
+            await OutboxMessage.find(due).sort("next_attempt_at").limit(limit or self.config.batch_size).to_list()
+        )
+        if not candidates:
+            return []
+
+        lock_id = uuid4().hex
+        await OutboxMessage.find(In(OutboxMessage.id, [m.id for m in candidates]), due).update(
+            Set(
+                {
+                    OutboxMessage.lock_id: lock_id,
+                    OutboxMessage.locked_until: now + timedelta(seconds=self.config.lease),
+                },
+            ),
+        )
+        return await OutboxMessage.find(OutboxMessage.lock_id == lock_id).to_list()
+
+    async def run_once(self) -> int:
+        """Забрать и доставить одну пачку сообщений, вернуть её размер."""
+        batch = await self.claim_batch()
+        await asyncio.gather(*(self.process(message) for message in batch))
+        return len(batch)
+
+    async def process(self, message: OutboxMessage) -> None:
+        """Доставить сообщение и записать результат, не дожидаясь остальных сообщений пачки."""
+        try:
+            result = await self.deliver(message)
+            if result.success:
+                await self.delete_owned(message)
+            else:
+                await self.handle_failure(message, result)
+        except Exception:
+            # Сообщение останется в outbox и будет подобрано после истечения аренды
+            logger.exception(f"Outbox message {message.idempotency_key} processing failed")
+
+    async def delete_owned(self, message: OutboxMessage) -> bool:
+        """Удалить сообщение, если аренда ещё за нами: иначе его уже взял другой воркер."""
+        deleted = await OutboxMessage.get_motor_collection().delete_one(
+            {"_id": message.id, "lock_id": message.lock_id},
+        )
+        if not deleted.deleted_count:
+            logger.warning(f"Outbox message {message.idempotency_key} lease expired before delivery finished")
+        return bool(deleted.deleted_count)
+
+    async def deliver(self, message: OutboxMessage) -> DeliveryResult:
+        with metrics.delivery_seconds.time():
+            return await send_to_channel(
+                message.channel_url,
+                message.channel_token,
+                message.payload,
+                request_timeout=message.request_timeout,
+                idempotency_key=message.idempotency_key,
+            )
+
+    def dead_letter_expiry(self) -> datetime | None:
+        if self.config.dead_letter_ttl_days is None:
+            return None
+        return datetime.now(UTC) + timedelta(days=self.config.dead_letter_ttl_days)
+
+    async def handle_failure(self, message: OutboxMessage, result: DeliveryResult) -> None:
+        attempts = message.attempts + 1
+        if attempts >= self.config.max_attempts:
+            logger.error(f"Outbox message {message.idempotency_key} moved to dead letters after {attempts} attempts")
+            dead_letter = DeadLetterMessage(
+                idempotency_key=message.idempotency_key,
+                channel_id=message.channel_id,
+                channel_url=message.channel_url,
+                payload=message.payload,
+                attempts=attempts,
+                last_error=result.error,
+                created_at=message.created_at,
+                expires_at=self.dead_letter_expiry(),
+            )
+            # Сначала копия, потом удаление: при падении между ними сообщение не теряется
+            await dead_letter.insert()
+            if not await self.delete_owned(message):
+                await dead_letter.delete()
+            return
+
+        delay = max(backoff_delay(attempts, self.config), result.retry_after or 0.0)
+        # Аренду мог перехватить другой воркер, его попытку не перезаписываем
+        await OutboxMessage.find(OutboxMessage.id == message.id, OutboxMessage.lock_id == message.lock_id).update(
+            Set(
+                {
+                    OutboxMessage.attempts: attempts,
+                    OutboxMessage.last_error: result.error,
+                    OutboxMessage.next_attempt_at: datetime.now(UTC) + timedelta(seconds=delay),
+                    OutboxMessage.lock_id: None,
+                    OutboxMessage.locked_until: None,
+                },
+            ),
+        )
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="outbox-dispatcher")
+
+    async def stop(self, drain_timeout: float) -> None:
+        """Дождаться начатых доставок и остановиться, остальное останется в outbox."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, drain_timeout)
+        except TimeoutError:
+            logger.warning(f"Outbox dispatcher did not stop in {drain_timeout}s")
+        self._task = None
+
+    async def _run(self) -> None:
+        try:
+            while not self._stopping:
+                self._wakeup.clear()
+                free = self.config.batch_size - len(self._inflight)
+                claimed = 0
+                if free > 0:
+                    try:
+                        batch = await self.claim_batch(free)
+                    except Exception:
+                        logger.exception("Outbox dispatch failed")
+                        batch = []
+                    for message in batch:
+                        task = asyncio.create_task(self.process(message))
+                        self._inflight.add(task)
+                        task.add_done_callback(self._inflight.discard)
+                    claimed = len(batch)
+
+                if self._stopping or (free > 0 and claimed == free):
+                    continue
+                # Все места заняты - ждём первую завершённую доставку, иначе новых сообщений
+                waiters = set(self._inflight) if free <= 0 else set()
+                wakeup = asyncio.create_task(self._wakeup.wait())
+                try:
+                    await asyncio.wait(
+                        {wakeup, *waiters},
+                        timeout=self.config.poll_interval,
+                        return_when=FIRST_COMPLETED,
+                    )
+                finally:
+                    wakeup.cancel()
+            if self._inflight:
+                await asyncio.wait(self._inflight)
+        finally:
+            for task in self._inflight:
+                task.cancel()
+
+
+outbox_dispatcher = OutboxDispatcher(settings.outbox)
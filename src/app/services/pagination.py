@@ -0,0 +1,99 @@
+import base64
+import binascii
+import json
+from collections.abc import AsyncIterator, Mapping
+from typing import Any
+
+import bson
+from bson.errors import BSONError
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+
+
+class InvalidCursorError(ValueError):
+    """Курсор страницы повреждён или выдан для другого запроса."""
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Упаковать ключ последнего документа страницы в непрозрачный курсор.
+
+    Значения кодируются в BSON, поэтому в курсор можно положить ObjectId и datetime.
+    """
+    return base64.urlsafe_b64encode(bson.encode({"k": list(values)})).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int = 1) -> list[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = bson.decode(raw)["k"]
+    except (binascii.Error, BSONError, KeyError, TypeError, ValueError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError("Invalid cursor")
+    return values
+
+
+def projection(fields: list[str] | None) -> dict[str, int] | None:
+    """Проекция Mongo, _id возвращается всегда: по нему строится курсор."""
+    if not fields:
+        return None
+    return dict.fromkeys(fields, 1)
+
+
+def after_cursor(query: Mapping[str, Any], cursor: str | None) -> dict[str, Any]:
+    """Добавить к запросу условие "после курсора" для пагинации по _id."""
+    query = dict(query)
+    if cursor is not None:
+        (last_id,) = decode_cursor(cursor)
+        query["_id"] = {"$gt": last_id}
+    return query
+
+
+def to_public(document: dict[str, Any]) -> dict[str, Any]:
+    """Переименовать _id в id, как в схемах ответа."""
+    document["id"] = str(document.pop("_id"))
+    return document
+
+
+async def find_page(
+    collection: AsyncIOMotorCollection,
+    query: Mapping[str, Any],
+    limit: int,
+    fields: list[str] | None = None,
+) -> tuple[list[dict[str, Any]], str | None]:
+    """
+    Прочитать страницу документов по возрастанию _id.
+
+    Условие курсора добавляется заранее через after_cursor, чтобы ошибка
+    в курсоре всплывала до начала ответа.
+
+    Keyset пагинация не пропускает документы через skip, поэтому любая страница
+    читается за одно обращение к индексу.
+
+    Returns:
+        Документы страницы и курсор следующей страницы (None, если страница последняя)
+    """
+    # Лишний документ показывает, есть ли следующая страница, без count
+    documents = (
+        await collection.find(query, projection(fields)).sort("_id", ASCENDING).limit(limit + 1).to_list(limit + 1)
+    )
+    if len(documents) <= limit:
+        return documents, None
+    documents = documents[:limit]
+    return documents, encode_cursor(documents[-1]["_id"])
+
+
+async def stream_ndjson(
+    collection: AsyncIOMotorCollection,
+    query: Mapping[str, Any],
+    fields: list[str] | None = None,
+) -> AsyncIterator[bytes]:
+    """Отдавать документы построчно прямо из курсора Motor, не собирая их в список."""
+    documents = collection.find(query, projection(fields)).sort("_id", ASCENDING).batch_size(STREAM_BATCH_SIZE)
+    async for document in documents:
+        yield json.dumps(to_public(document), default=str).encode() + b"\n"
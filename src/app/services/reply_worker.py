@@ -0,0 +1,201 @@
+import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable, Hashable, Iterator
+from contextlib import contextmanager, suppress
+from typing import NamedTuple
+
+from loguru import logger
+from pymongo.errors import PyMongoError
+
+from app.services.chat_lock import ChatLock
+from core import settings
+
+type ReplyJob = Callable[[], Awaitable[None]]
+
+
+class QueueFullError(Exception):
+    """Очередь генерации ответов переполнена."""
+
+
+class QueuedJob(NamedTuple):
+    job: ReplyJob
+    coalesce: bool
+
+
+class ReplySlot:
+    """Зарезервированное место в очереди под одну задачу."""
+
+    def __init__(self, pool: "ReplyWorkerPool") -> None:
+        self._pool = pool
+        self.submitted = False
+
+    def submit(self, job: ReplyJob, lane: str | None = None, coalesce: bool = False) -> None:
+        """
+        Поставить задачу в очередь.
+
+        Args:
+            job: Задача
+            lane: Ключ полосы, задачи одной полосы выполняются строго по очереди
+            coalesce: Заменить ещё не начатую задачу той же полосы, а не вставать за ней
+        """
+        if self.submitted:
+            raise RuntimeError("Slot is already used")
+        self.submitted = True
+        self._pool._enqueue(job, lane, coalesce)
+
+
+class ReplyWorkerPool:
+    """
+    Пул фоновых воркеров, генерирующих ответы бота вне HTTP запроса.
+
+    Очередь ограничена: место резервируется до сохранения сообщения,
+    поэтому при переполнении вебхук отвечает 429 и канал повторит запрос,
+    а не получит 202 для сообщения, которое никто не обработает.
+
+    Задачи разбиты на полосы (обычно одна полоса на чат): внутри полосы
+    задачи выполняются по одной и по порядку, разные полосы - параллельно.
+    С chat_lock полоса дополнительно захватывается в Mongo, чтобы чат
+    обрабатывал только один воркер uvicorn.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        queue_size: int,
+        chat_lock: ChatLock | None = None,
+        lock_retry_interval: float = 0.5,
+    ) -> None:
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.chat_lock = chat_lock
+        self.lock_retry_interval = lock_retry_interval
+        self.coalesced = 0
+        self._lanes: dict[Hashable, deque[QueuedJob]] = {}
+        self._ready: asyncio.Queue[Hashable] = asyncio.Queue()
+        self._pending = 0
+        self._reserved = 0
+        self._unfinished = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._workers: list[asyncio.Task[None]] = []
+        self._closing = False
+
+    @property
+    def depth(self) -> int:
+        """Количество задач, ожидающих воркера (включая зарезервированные)."""
+        return self._pending + self._reserved
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._closing = False
+        self._workers = [asyncio.create_task(self._worker(), name=f"reply-worker-{i}") for i in range(self.concurrency)]
+
+    @contextmanager
+    def reserve(self) -> Iterator[ReplySlot]:
+        with self.reserve_many(1) as slots:
+            yield slots[0]
+
+    @contextmanager
+    def reserve_many(self, count: int) -> Iterator[list[ReplySlot]]:
+        """Зарезервировать сразу count мест: либо все, либо QueueFullError."""
+        if self._closing:
+            raise QueueFullError("Reply worker pool is shutting down")
+        if self.depth + count > self.queue_size:
+            raise QueueFullError("Reply queue is full")
+
+        self._reserved += count
+        slots = [ReplySlot(self) for _ in range(count)]
+        try:
+            yield slots
+        finally:
+            self._reserved -= sum(not slot.submitted for slot in slots)
+
+    def _enqueue(self, job: ReplyJob, lane: str | None, coalesce: bool) -> None:
+        self._reserved -= 1
+        self.start()
+
+        key: Hashable = lane if lane is not None else object()
+        jobs = self._lanes.get(key)
+        if jobs is None:
+            jobs = self._lanes[key] = deque()
+            self._ready.put_nowait(key)
+        elif coalesce and jobs and jobs[-1].coalesce:
+            # Ещё не начатая задача увидит те же данные, что и новая, достаточно одной
+            jobs[-1] = QueuedJob(job, coalesce)
+            self.coalesced += 1
+            return
+
+        jobs.append(QueuedJob(job, coalesce))
+        self._pending += 1
+        self._unfinished += 1
+        self._idle.clear()
+
+    async def _acquire_lane(self, key: Hashable) -> bool:
+        if self.chat_lock is None or not isinstance(key, str):
+            return True
+        try:
+            if await self.chat_lock.acquire(key):
+                return True
+        except PyMongoError as e:
+            logger.warning(f"Failed to lock chat {key}: {e!r}")
+
+        asyncio.get_running_loop().call_later(self.lock_retry_interval, self._ready.put_nowait, key)
+        return False
+
+    async def _run_job(self, key: Hashable, job: ReplyJob) -> None:
+        if self.chat_lock is None or not isinstance(key, str):
+            await job()
+            return
+        async with self.chat_lock.keep_alive(key):
+            await job()
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._ready.get()
+            if not await self._acquire_lane(key):
+                continue
+
+            jobs = self._lanes[key]
+            queued = jobs.popleft()
+            self._pending -= 1
+            try:
+                await self._run_job(key, queued.job)
+            except Exception:
+                logger.exception("Reply job failed")
+            finally:
+                if jobs:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._lanes[key]
+                self._unfinished -= 1
+                if not self._unfinished:
+                    self._idle.set()
+
+    async def join(self) -> None:
+        """Дождаться обработки всех поставленных задач."""
+        await self._idle.wait()
+
+    async def stop(self, drain_timeout: float) -> None:
+        """Перестать принимать задачи, дообработать очередь и остановить воркеров."""
+        self._closing = True
+        if self._workers:
+            try:
+                await asyncio.wait_for(self.join(), drain_timeout)
+            except TimeoutError:
+                logger.warning(f"Reply queue was not drained in {drain_timeout}s, {self._pending} jobs dropped")
+
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            with suppress(asyncio.CancelledError):
+                await worker
+        self._workers = []
+
+
+reply_pool = ReplyWorkerPool(
+    concurrency=settings.reply_worker.concurrency,
+    queue_size=settings.reply_worker.queue_size,
+    chat_lock=ChatLock(settings.reply_worker.chat_lock_ttl) if settings.reply_worker.chat_lock else None,
+    lock_retry_interval=settings.reply_worker.chat_lock_retry_interval,
+)
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+
+from loguru import logger
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+
+from app.schemas import ResponseCacheStats
+from core import settings
+from core.cache import TTLCache
+from core.database.models.chat_bot import ChatBot
+from core.database.models.dialogue import ContextMessage, MessageRole
+from core.database.models.response_cache import CachedResponse
+from core.settings_model import ResponseCacheSettings
+
+
+def normalize(text: str) -> str:
+    """Привести текст к виду, в котором "Hi!" и "  hi" совпадают."""
+    return " ".join(text.lower().split()).strip(" .,!?")
+
+
+def cache_key(bot: ChatBot, context: list[ContextMessage]) -> str:
+    """
+    Ключ из сообщений диалога в контексте, summary (SYSTEM) в него не входит.
+
+    Summary у каждого диалога своё и меняется по мере разговора, с ним
+    ключи длинных диалогов не совпадали бы никогда. Цена - ответ из кэша
+    может не учитывать то, что свёрнуто в summary.
+    """
+    messages = [message for message in context if message.role != MessageRole.SYSTEM]
+    if bot.response_cache.context_messages is not None:
+        messages = messages[-bot.response_cache.context_messages :]
+    normalized = [[str(message.role), normalize(message.text)] for message in messages]
+    return hashlib.sha256(json.dumps([str(bot.id), normalized]).encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Кэш ответов LLM перед слоем предсказаний, включается в настройках бота.
+
+    Ключ - хэш бота и нормализованных сообщений ограниченного контекста без
+    summary (или его последних сообщений). Сначала проверяется LRU в памяти процесса, затем
+    коллекция в Mongo с TTL индексом, общая для всех воркеров. Одновременные
+    запросы с одним ключом ждут одну генерацию. Ошибки Mongo не мешают
+    ответу: кэш просто пропускается.
+    """
+
+    def __init__(self, config: ResponseCacheSettings) -> None:
+        self.config = config
+        # Значение - время истечения по time.monotonic и ответ: TTL у ботов разный
+        self.memory: TTLCache[str, tuple[float, str]] = TTLCache(config.memory_size, config.memory_ttl)
+        self._inflight: dict[str, asyncio.Task[str]] = {}
+        self._writes = 0
+        self.mongo_hits = 0
+        self.mongo_misses = 0
+        self.mongo_evictions = 0
+        self.coalesced = 0
+        self.generated = 0
+
+    async def get_or_generate(
+        self,
+        bot: ChatBot,
+        context: list[ContextMessage],
+        generate: Callable[[], Awaitable[str]],
+    ) -> str:
+        if not bot.response_cache.enabled:
+            return await generate()
+
+        key = cache_key(bot, context)
+        cached = self.memory.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._load(bot, key, generate))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _load(self, bot: ChatBot, key: str, generate: Callable[[], Awaitable[str]]) -> str:
+        try:
+            response = await self._find(key)
+            if response is None:
+                response = await generate()
+                self.generated += 1
+                await self._store(bot, key, response)
+            self.memory.set(key, (time.monotonic() + bot.response_cache.ttl, response))
+            return response
+        finally:
+            del self._inflight[key]
+
+    async def _find(self, key: str) -> str | None:
+        try:
+            # TTL монитор Mongo удаляет записи раз в минуту, истёкшие ещё могут лежать
+            entry = await CachedResponse.find_one(
+                CachedResponse.id == key,
+                CachedResponse.expires_at > datetime.now(UTC),
+            )
+        except PyMongoError as e:
+            logger.warning(f"Response cache lookup failed: {e!r}")
+            return None
+        if entry is None:
+            self.mongo_misses += 1
+            return None
+        self.mongo_hits += 1
+        return entry.response
+
+    async def _store(self, bot: ChatBot, key: str, response: str) -> None:
+        if bot.id is None:
+            return
+        entry = CachedResponse(
+            id=key,
+            chat_bot_id=bot.id,
+            response=response,
+            expires_at=datetime.now(UTC) + timedelta(seconds=bot.response_cache.ttl),
+        )
+        try:
+            await entry.save()
+            self._writes += 1
+            if self._writes % self.config.trim_every == 0:
+                await self.trim()
+        except PyMongoError as e:
+            logger.warning(f"Response cache write failed: {e!r}")
+
+    async def trim(self) -> int:
+        """Удалить самые старые записи сверх max_entries."""
+        collection = CachedResponse.get_motor_collection()
+        excess = await collection.estimated_document_count() - self.config.max_entries
+        if excess <= 0:
+            return 0
+        oldest = collection.find({}, {"_id": 1}).sort("created_at", ASCENDING).limit(excess)
+        ids = [document["_id"] async for document in oldest]
+        result = await collection.delete_many({"_id": {"$in": ids}})
+        self.mongo_evictions += result.deleted_count
+        return result.deleted_count
+
+    def stats(self) -> ResponseCacheStats:
+        return ResponseCacheStats(
+            memory=self.memory.stats(),
+            mongo_hits=self.mongo_hits,
+            mongo_misses=self.mongo_misses,
+            mongo_evictions=self.mongo_evictions,
+            coalesced=self.coalesced,
+            generated=self.generated,
+        )
+
+    def clear(self) -> None:
+        self.memory.clear()
+
+
+response_cache = ResponseCache(settings.response_cache)
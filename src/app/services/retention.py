@@ -0,0 +1,304 @@
+import asyncio
+import zlib
+from contextlib import suppress
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import bson
+from beanie.operators import Set
+from loguru import logger
+from pymongo import ASCENDING, DeleteMany
+
+from app.schemas import RetentionReport
+from app.services import metrics
+from app.services.chat_lock import ChatLock
+from app.services.reply_worker import reply_pool
+from core import settings
+from core.database.models.archive import ArchivedDialogue
+from core.database.models.dialogue import Dialogue, DialogueMessage
+from core.settings_model import RetentionSettings
+
+LEASE_KEY = "retention"
+BUSY_POLL_INTERVAL = 0.1
+
+
+def as_utc(value: datetime) -> datetime:
+    """Mongo возвращает naive datetime в UTC."""
+    return value if value.tzinfo else value.replace(tzinfo=UTC)
+
+
+class ArchiveWriter:
+    """
+    Пишет сообщения диалога в архив частями не больше chunk_messages сообщений и chunk_bytes байт.
+
+    Части пишутся неподтверждёнными, начиная с first_part: архив, оставшийся
+    от прошлых проходов (диалог мог ожить после архивации), не трогается.
+    """
+
+    def __init__(self, dialogue: dict[str, Any], config: RetentionSettings, first_part: int = 0) -> None:
+        self.dialogue = dialogue
+        self.config = config
+        self.expires_at = (
+            datetime.now(UTC) + timedelta(days=config.archive_ttl_days) if config.archive_ttl_days is not None else None
+        )
+        self.first_part = first_part
+        self.part = first_part
+        self.messages = 0
+        self.raw_size = len(bson.encode(dialogue))
+        self.archive_size = 0
+        self._chunk: list[bytes] = []
+        self._chunk_size = 0
+        self._first: dict[str, Any] | None = None
+        self._last: dict[str, Any] | None = None
+
+    async def add(self, message: dict[str, Any]) -> None:
+        encoded = bson.encode(message)
+        self._chunk.append(encoded)
+        self._chunk_size += len(encoded)
+        self._first = self._first or message
+        self._last = message
+        if (
+            len(self._chunk) >= self.config.archive_chunk_messages
+            or self._chunk_size >= self.config.archive_chunk_bytes
+        ):
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Записать накопленную часть; первая часть с полями диалога пишется, даже если сообщений нет."""
+        if not self._chunk and self.part > self.first_part:
+            return
+        data = zlib.compress(b"".join(self._chunk), self.config.compression_level)
+        await ArchivedDialogue(
+            dialogue_id=self.dialogue["_id"],
+            part=self.part,
+            chat_bot_id=self.dialogue["chat_bot_id"],
+            chat_id=self.dialogue["chat_id"],
+            dialogue=self.dialogue if self.part == self.first_part else None,
+            messages=len(self._chunk),
+            first_timestamp=self._first["timestamp"] if self._first else None,
+            last_timestamp=self._last["timestamp"] if self._last else None,
+            last_message_id=self._last["_id"] if self._last else None,
+            raw_size=self._chunk_size,
+            data=data,
+            expires_at=self.expires_at,
+        ).insert()
+        self.part += 1
+        self.messages += len(self._chunk)
+        self.raw_size += self._chunk_size
+        self.archive_size += len(data)
+        self._chunk, self._chunk_size, self._first = [], 0, None
+
+
+class RetentionJob:
+    """
+    Фоновое хранение диалогов.
+
+    Диалоги без новых сообщений дольше archive_after_days переносятся в
+    dialogue_archive сжатыми частями и удаляются вместе с сообщениями. У
+    остальных удаляются сообщения старше trim_after_days, уже свёрнутые в
+    summary: в контекст LLM они больше не попадают.
+
+    Проход идёт пачками с паузами, не быстрее max_docs_per_second, и ждёт,
+    пока в очереди ответов есть задачи. Из нескольких воркеров проход
+    выполняет тот, кто взял аренду.
+    """
+
+    def __init__(self, config: RetentionSettings) -> None:
+        self.config = config
+        self.lock = ChatLock(config.lease)
+        self.last_report: RetentionReport | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    async def run_once(self) -> RetentionReport:
+        report = RetentionReport(started_at=datetime.now(UTC))
+        await self.archive_idle(report)
+        if self.config.trim_after_days is not None:
+            await self.trim_summarized(report)
+        report.finished_at = datetime.now(UTC)
+        self.last_report = report
+        logger.info(
+            f"Retention pass: archived {report.archived_dialogues} dialogues ({report.archived_messages} messages), "
+            f"trimmed {report.trimmed_messages} messages, reclaimed {report.bytes_reclaimed} bytes",
+        )
+        return report
+
+    async def archive_idle(self, report: RetentionReport) -> None:
+        cutoff = datetime.now(UTC) - timedelta(days=self.config.archive_after_days)
+        collection = Dialogue.get_motor_collection()
+        query: dict[str, Any] = {"updated_at": {"$lt": cutoff}}
+        while True:
+            batch = (
+                await collection.find(query)
+                .sort([("updated_at", ASCENDING), ("_id", ASCENDING)])
+                .limit(self.config.batch_size)
+                .to_list(self.config.batch_size)
+            )
+            if not batch:
+                return
+            processed = 0
+            for dialogue in batch:
+                processed += 1 + await self.archive_dialogue(dialogue, report)
+            # Пропущенные диалоги не выбираются снова в этом проходе
+            last = batch[-1]
+            query = {
+                "updated_at": {"$lt": cutoff},
+                "$or": [
+                    {"updated_at": {"$gt": last["updated_at"]}},
+                    {"updated_at": last["updated_at"], "_id": {"$gt": last["_id"]}},
+                ],
+            }
+            await self.throttle(processed, report)
+
+    async def archive_dialogue(self, dialogue: dict[str, Any], report: RetentionReport) -> int:
+        """
+        Перенести диалог в архив, вернуть количество прочитанных сообщений.
+
+        Части архива сначала пишутся неподтверждёнными, затем диалог помечается
+        archived_at при условии, что updated_at не изменился, части
+        подтверждаются, и только потом удаляются сообщения и сам диалог.
+        Прерванный проход продолжается со следующего шага. Если в диалог пришло
+        сообщение, пока писался архив, неподтверждённые части отбрасываются;
+        если после пометки - старые сообщения остаются в архиве, а диалог
+        продолжается с новых и при следующей архивации дописывается после них.
+        Приём сообщения снимает archived_at, поэтому диалог, оживший после
+        прерванного прохода, архивируется заново целиком, а не удаляется
+        вместе с новыми сообщениями.
+        """
+        dialogue_id = dialogue["_id"]
+        collection = Dialogue.get_motor_collection()
+        messages = DialogueMessage.get_motor_collection()
+        archive = ArchivedDialogue.find(ArchivedDialogue.dialogue_id == dialogue_id)
+        uncommitted = ArchivedDialogue.find({"dialogue_id": dialogue_id, "committed": False})
+        read = 0
+
+        if dialogue.get("archived_at") is None:
+            # Части прерванного прохода; подтверждённый архив прошлых проходов остаётся
+            await uncommitted.delete()
+            last_committed = await archive.sort(-ArchivedDialogue.part).first_or_none()
+            writer = ArchiveWriter(dialogue, self.config, last_committed.part + 1 if last_committed else 0)
+            cursor = (
+                messages.find({"dialogue_id": dialogue_id})
+                .sort([("timestamp", ASCENDING), ("_id", ASCENDING)])
+                .batch_size(self.config.archive_chunk_messages)
+            )
+            async for message in cursor:
+                await writer.add(message)
+            await writer.flush()
+            read = writer.messages
+
+            marked = await collection.update_one(
+                {"_id": dialogue_id, "updated_at": dialogue["updated_at"], "archived_at": None},
+                {"$set": {"archived_at": datetime.now(UTC)}},
+            )
+            if not marked.modified_count:
+                await uncommitted.delete()
+                return read
+            report.archived_messages += writer.messages
+            report.archive_bytes += writer.archive_size
+            report.bytes_reclaimed += writer.raw_size - writer.archive_size
+            metrics.retention_bytes_reclaimed.inc(writer.raw_size - writer.archive_size)
+        # После прерванного прохода архив уже записан и учтён, остаётся подтвердить его и удалить исходные документы
+        await uncommitted.update(Set({ArchivedDialogue.committed: True}))
+
+        last_part = (
+            await ArchivedDialogue.find({"dialogue_id": dialogue_id, "last_timestamp": {"$ne": None}})
+            .sort(-ArchivedDialogue.part)
+            .first_or_none()
+        )
+        if last_part is not None and last_part.last_timestamp is not None:
+            last_timestamp = last_part.last_timestamp
+            await messages.delete_many(
+                {
+                    "dialogue_id": dialogue_id,
+                    "$or": [
+                        {"timestamp": {"$lt": last_timestamp}},
+                        {"timestamp": last_timestamp, "_id": {"$lte": last_part.last_message_id}},
+                    ],
+                },
+            )
+        deleted = await collection.delete_one({"_id": dialogue_id, "updated_at": dialogue["updated_at"]})
+        if deleted.deleted_count:
+            report.archived_dialogues += 1
+            metrics.retention_archived_dialogues.inc()
+        else:
+            await collection.update_one({"_id": dialogue_id}, {"$set": {"archived_at": None}})
+        return read
+
+    async def trim_summarized(self, report: RetentionReport) -> None:
+        if self.config.trim_after_days is None:
+            return
+        cutoff = datetime.now(UTC) - timedelta(days=self.config.trim_after_days)
+        average_size = await self.average_message_size()
+        query: dict[str, Any] = {"summary_until": {"$ne": None}, "archived_at": None}
+        while True:
+            batch = (
+                await Dialogue.get_motor_collection()
+                .find(query, {"summary_until": 1})
+                .sort("_id", ASCENDING)
+                .limit(self.config.batch_size)
+                .to_list(self.config.batch_size)
+            )
+            if not batch:
+                return
+            operations = [
+                DeleteMany(
+                    {
+                        "dialogue_id": dialogue["_id"],
+                        "timestamp": {"$lt": min(as_utc(dialogue["summary_until"]), cutoff)},
+                    },
+                )
+                for dialogue in batch
+            ]
+            result = await DialogueMessage.get_motor_collection().bulk_write(operations, ordered=False)
+            report.trimmed_messages += result.deleted_count
+            report.bytes_reclaimed += result.deleted_count * average_size
+            metrics.retention_trimmed_messages.inc(result.deleted_count)
+            metrics.retention_bytes_reclaimed.inc(result.deleted_count * average_size)
+            query = {**query, "_id": {"$gt": batch[-1]["_id"]}}
+            await self.throttle(len(batch) + result.deleted_count, report)
+
+    async def average_message_size(self) -> int:
+        """Средний размер сообщения по статистике коллекции: удаляемые сообщения не читаются."""
+        collection = DialogueMessage.get_motor_collection()
+        try:
+            stats = await collection.database.command("collStats", collection.name)
+        except Exception as e:
+            # Без прав на collStats удаление работает, только не учитывается в отчёте
+            logger.warning(f"Failed to read {collection.name} stats, trimmed bytes are not counted: {e!r}")
+            return 0
+        return int(stats.get("avgObjSize", 0))
+
+    async def throttle(self, processed: int, report: RetentionReport) -> None:
+        """Пауза после пачки: не быстрее max_docs_per_second и не пока ответы ждут в очереди."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.sleep(max(self.config.batch_pause, processed / self.config.max_docs_per_second))
+        # У очереди ответов нет события об освобождении, опрашиваем её глубину
+        while reply_pool.depth >= self.config.busy_queue_depth:  # noqa: ASYNC110
+            await asyncio.sleep(max(self.config.batch_pause, BUSY_POLL_INTERVAL))
+        report.throttled_seconds += loop.time() - started
+
+    def start(self) -> None:
+        if self.config.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="retention")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await self.lock.acquire(LEASE_KEY):
+                    async with self.lock.keep_alive(LEASE_KEY):
+                        await self.run_once()
+            except Exception:
+                logger.exception("Retention pass failed")
+            await asyncio.sleep(self.config.interval)
+
+
+retention_job = RetentionJob(settings.retention)
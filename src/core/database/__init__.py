@@ -1,3 +1,4 @@
+from core.database.client import close_client, get_client, warm_up
 from core.database.registry import initialize_database
 
-__all__ = ["initialize_database"]
+__all__ = ["close_client", "get_client", "initialize_database", "warm_up"]
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from core import settings
+from core.database.monitoring import command_metrics
+from core.settings_model import MongoSettings
+
+_client: AsyncIOMotorClient | None = None
+
+
+def client_options(config: MongoSettings) -> dict[str, Any]:
+    """Параметры MongoClient из настроек; не заданные берутся из URL или по умолчанию драйвера."""
+    options: dict[str, Any] = {"event_listeners": [command_metrics]}
+    if config.max_pool_size is not None:
+        options["maxPoolSize"] = config.max_pool_size
+    if config.min_pool_size is not None:
+        options["minPoolSize"] = config.min_pool_size
+    if config.read_preference is not None:
+        options["readPreference"] = config.read_preference
+    if config.wait_queue_timeout is not None:
+        options["waitQueueTimeoutMS"] = int(config.wait_queue_timeout * 1000)
+    if config.compressors:
+        options["compressors"] = ",".join(config.compressors)
+    if config.write_concern is not None:
+        options["w"] = config.write_concern
+    if config.write_concern_journal is not None:
+        options["journal"] = config.write_concern_journal
+    return options
+
+
+def get_client() -> AsyncIOMotorClient:
+    """Общий клиент процесса: один пул соединений на все модели и сервисы."""
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(settings.mongo.url, **client_options(settings.mongo))
+    return _client
+
+
+async def warm_up(connections: int | None = None) -> None:
+    """
+    Открыть соединения пула заранее.
+
+    Одновременные ping занимают разные соединения, поэтому первые запросы
+    после старта не платят за TCP, TLS и аутентификацию.
+    """
+    client = get_client()
+    # minPoolSize мог прийти из настроек или из URL, итоговое значение знает драйвер
+    connections = max(client.delegate.options.pool_options.min_pool_size if connections is None else connections, 1)
+    started = asyncio.get_running_loop().time()
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(connections)))
+    elapsed = asyncio.get_running_loop().time() - started
+    logger.info(f"Mongo pool warmed up: {connections} connections in {elapsed:.3f}s")
+
+
+def close_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
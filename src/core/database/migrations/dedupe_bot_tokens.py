@@ -0,0 +1,63 @@
+"""
+Устранение повторяющихся secret_token ботов перед созданием уникального индекса.
+
+Запуск: python -m core.database.migrations.dedupe_bot_tokens
+
+С повторяющимися токенами init_beanie не построит уникальный индекс
+secret_token и приложение не стартует, поэтому миграция работает с
+коллекцией напрямую и запускается до выкладки версии с индексом.
+
+Вебхук с таким токеном находил самого раннего бота, поэтому токен остаётся
+у него, а остальные боты получают новый случайный токен; их id выводятся
+в лог, сами токены - нет, их нужно взять из БД и передать интеграциям.
+Повторный запуск ничего не меняет.
+"""
+
+import asyncio
+import secrets
+from typing import Any
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from core import settings
+from core.database.client import get_client
+from core.database.models.chat_bot import ChatBot
+from core.logs import configure_logger
+
+
+async def dedupe_bot_tokens(database: AsyncIOMotorDatabase[Any]) -> list[str]:
+    """Выдать новые токены ботам с чужим secret_token, вернуть их id."""
+    # Модели ещё не инициализированы; без Settings.name Beanie называет коллекцию по классу
+    bots = database[ChatBot.__name__]
+    rotated: list[str] = []
+
+    groups = bots.aggregate(
+        [
+            {"$sort": {"_id": 1}},
+            {"$group": {"_id": "$secret_token", "ids": {"$push": "$_id"}}},
+            {"$match": {"ids.1": {"$exists": True}}},
+        ],
+        allowDiskUse=True,
+    )
+    async for group in groups:
+        for bot_id in group["ids"][1:]:
+            await bots.update_one({"_id": bot_id}, {"$set": {"secret_token": secrets.token_urlsafe(32)}})
+            rotated.append(str(bot_id))
+    if rotated:
+        logger.warning(f"Secret tokens rotated for bots sharing a token: {rotated}")
+    return rotated
+
+
+async def run() -> None:
+    rotated = await dedupe_bot_tokens(get_client().get_database(settings.mongo.db_name))
+    logger.success(f"Rotated {len(rotated)} duplicate bot tokens")
+
+
+def main() -> None:
+    configure_logger()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
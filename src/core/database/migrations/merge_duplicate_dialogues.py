@@ -0,0 +1,85 @@
+"""
+Слияние диалогов с одинаковыми (chat_bot_id, chat_id) перед созданием уникального индекса.
+
+Запуск: python -m core.database.migrations.merge_duplicate_dialogues
+
+До атомарного upsert параллельные первые сообщения чата могли создать
+несколько диалогов. С такими дублями init_beanie не построит уникальный
+индекс (chat_bot_id, chat_id) и приложение не стартует, поэтому миграция
+работает с коллекциями напрямую, без инициализации моделей, и запускается
+до выкладки версии с индексом, после split_message_list.
+
+Остаётся самый ранний диалог, сообщения остальных переносятся в него, а
+summary сбрасывается: оно описывало только часть сообщений и будет
+собрано заново. Миграцию можно прерывать и запускать повторно: дубль
+удаляется только после переноса всех его сообщений.
+"""
+
+import asyncio
+from typing import Any
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from core import settings
+from core.database.client import get_client
+from core.database.models.dialogue import Dialogue, DialogueMessage
+from core.logs import configure_logger
+
+
+class UnmigratedMessageListError(RuntimeError):
+    """У дубля ещё есть встроенный message_list: сначала нужна миграция split_message_list."""
+
+
+async def merge_duplicate_dialogues(database: AsyncIOMotorDatabase[Any]) -> int:
+    """Слить дубли диалогов, вернуть количество удалённых дублей."""
+    dialogues = database[Dialogue.Settings.name]
+    messages = database[DialogueMessage.Settings.name]
+    merged = 0
+
+    groups = dialogues.aggregate(
+        [
+            {"$sort": {"created_at": 1, "_id": 1}},
+            {
+                "$group": {
+                    "_id": {"chat_bot_id": "$chat_bot_id", "chat_id": "$chat_id"},
+                    "ids": {"$push": "$_id"},
+                    "updated_at": {"$max": "$updated_at"},
+                    "unmigrated": {"$sum": {"$cond": [{"$ifNull": ["$message_list", False]}, 1, 0]}},
+                },
+            },
+            {"$match": {"ids.1": {"$exists": True}}},
+        ],
+        allowDiskUse=True,
+    )
+    async for group in groups:
+        keep, *duplicates = group["ids"]
+        if group["unmigrated"]:
+            raise UnmigratedMessageListError(f"Dialogues {group['ids']} still have message_list")
+
+        await messages.update_many({"dialogue_id": {"$in": duplicates}}, {"$set": {"dialogue_id": keep}})
+        await dialogues.update_one(
+            {"_id": keep},
+            {
+                "$set": {"updated_at": group["updated_at"]},
+                "$unset": {"summary": "", "summary_until": "", "archived_at": ""},
+            },
+        )
+        await dialogues.delete_many({"_id": {"$in": duplicates}})
+        merged += len(duplicates)
+        logger.info(f"Merged {len(duplicates)} duplicates into dialogue {keep}")
+    return merged
+
+
+async def run() -> None:
+    merged = await merge_duplicate_dialogues(get_client().get_database(settings.mongo.db_name))
+    logger.success(f"Merged {merged} duplicate dialogues")
+
+
+def main() -> None:
+    configure_logger()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
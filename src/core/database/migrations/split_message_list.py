@@ -0,0 +1,94 @@
+"""
+Перенос сообщений из встроенного Dialogue.message_list в коллекцию dialogue_messages.
+
+Запуск: python -m core.database.migrations.split_message_list
+
+Миграцию можно прерывать и запускать повторно: уже перенесённые сообщения
+отсекаются уникальным индексом (chat_bot_id, message_id), а поле message_list
+удаляется из диалога только после переноса всех его сообщений.
+"""
+
+import asyncio
+from typing import Any
+
+from loguru import logger
+from pymongo.errors import BulkWriteError
+
+from core.database import initialize_database
+from core.database.models.dialogue import Dialogue, DialogueMessage
+from core.logs import configure_logger
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class MessageIdConflictError(RuntimeError):
+    """message_id сообщения уже занят сообщением другого диалога того же бота."""
+
+
+async def find_conflicts(raw: dict[str, Any], message_ids: list[str]) -> list[str]:
+    """message_id, которые уникальный индекс отверг из-за сообщения другого диалога, а не повторного запуска."""
+    stored = DialogueMessage.get_motor_collection().find(
+        {"chat_bot_id": raw["chat_bot_id"], "message_id": {"$in": message_ids}},
+        {"dialogue_id": 1, "message_id": 1},
+    )
+    return [document["message_id"] async for document in stored if document["dialogue_id"] != raw["_id"]]
+
+
+async def split_message_list(batch_size: int = 100) -> int:
+    """
+    Перенести сообщения всех диалогов, вернуть количество обработанных диалогов.
+
+    Если message_id сообщения уже занят в другом чате того же бота, диалог
+    не трогается (message_list остаётся на месте), а после прохода
+    выбрасывается MessageIdConflictError со списком таких диалогов.
+    """
+    collection = Dialogue.get_motor_collection()
+    migrated = 0
+    conflicts: dict[str, list[str]] = {}
+
+    cursor = collection.find({"message_list": {"$exists": True}}, {"chat_bot_id": 1, "message_list": 1}).batch_size(
+        batch_size,
+    )
+    async for raw in cursor:
+        messages = [
+            DialogueMessage.model_validate({**message, "dialogue_id": raw["_id"], "chat_bot_id": raw["chat_bot_id"]})
+            for message in raw["message_list"]
+        ]
+        if messages:
+            try:
+                await DialogueMessage.insert_many(messages, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details["writeErrors"]
+                if any(error["code"] != DUPLICATE_KEY_ERROR for error in errors):
+                    raise
+                duplicates = [messages[error["index"]].message_id for error in errors]
+                if conflicting := await find_conflicts(raw, duplicates):
+                    logger.error(f"Dialogue {raw['_id']} is not migrated: message_id taken in another chat")
+                    conflicts[str(raw["_id"])] = conflicting
+                    continue
+
+        await collection.update_one({"_id": raw["_id"]}, {"$unset": {"message_list": ""}})
+        migrated += 1
+        if migrated % batch_size == 0:
+            logger.info(f"Migrated {migrated} dialogues...")
+
+    if conflicts:
+        raise MessageIdConflictError(
+            f"{len(conflicts)} dialogues are not migrated, conflicting message_id: {conflicts}",
+        )
+    return migrated
+
+
+async def run() -> None:
+    await initialize_database()
+    migrated = await split_message_list()
+    logger.success(f"Migrated {migrated} dialogues")
+
+
+def main() -> None:
+    configure_logger()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,21 @@
-from core.database.models.channel import Channel
-from core.database.models.chat_bot import ChatBot
-from core.database.models.dialogue import Dialogue, DialogueMessage, MessageRole
+from core.database.models.channel import Channel, DeliveryMode
+from core.database.models.chat_bot import ChatBot, ResponseCacheConfig
+from core.database.models.chat_lease import ChatLease
+from core.database.models.dialogue import ContextMessage, Dialogue, DialogueMessage, MessageRole
+from core.database.models.outbox import DeadLetterMessage, OutboxMessage
+from core.database.models.response_cache import CachedResponse
 
 __all__ = [
+    "CachedResponse",
     "Channel",
     "ChatBot",
+    "ChatLease",
+    "ContextMessage",
+    "DeadLetterMessage",
+    "DeliveryMode",
     "Dialogue",
     "DialogueMessage",
     "MessageRole",
+    "OutboxMessage",
+    "ResponseCacheConfig",
 ]
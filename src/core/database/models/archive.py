@@ -0,0 +1,46 @@
+import zlib
+from datetime import UTC, datetime
+from typing import Any
+
+import bson
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from pymongo import IndexModel
+
+
+class ArchivedDialogue(Document):
+    """
+    Часть архива диалога: пачка сообщений, сжатая zlib.
+
+    Сообщения хранятся подряд идущими BSON документами в порядке (timestamp, _id),
+    поля самого диалога - в первой части каждого прохода архивации. Диалог,
+    оживший после архивации, при следующей архивации дописывается новыми частями.
+    """
+
+    dialogue_id: PydanticObjectId = Field(..., description="ID диалога")
+    part: int = Field(..., description="Номер части архива, с 0")
+    chat_bot_id: PydanticObjectId = Field(..., description="ID чат-бота в БД")
+    chat_id: str = Field(..., description="ID чата")
+    dialogue: dict[str, Any] | None = Field(None, description="Документ диалога, в первой части прохода")
+    messages: int = Field(..., description="Количество сообщений в части")
+    first_timestamp: datetime | None = None
+    last_timestamp: datetime | None = None
+    last_message_id: PydanticObjectId | None = Field(None, description="_id последнего сообщения части")
+    raw_size: int = Field(..., description="Размер сообщений до сжатия, байт")
+    data: bytes = Field(..., description="Сжатые сообщения")
+    committed: bool = Field(False, description="Диалог помечен архивным; неподтверждённые части удаляются")
+    archived_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    expires_at: datetime | None = Field(None, description="Время удаления части, по умолчанию архив хранится всегда")
+
+    class Settings:
+        name = "dialogue_archive"
+        indexes = [
+            IndexModel([("dialogue_id", 1), ("part", 1)], unique=True),
+            [("chat_bot_id", 1), ("chat_id", 1)],
+            # Части с истёкшим сроком хранения удаляет сама Mongo
+            IndexModel("expires_at", expireAfterSeconds=0),
+        ]
+
+    def unpack(self) -> list[dict[str, Any]]:
+        """Распаковать сообщения части."""
+        return bson.decode_all(zlib.decompress(self.data))
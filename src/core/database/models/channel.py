@@ -1,5 +1,16 @@
+from enum import StrEnum, auto
+
 from beanie import Document
 from pydantic import Field
+from pymongo import IndexModel
+
+
+class DeliveryMode(StrEnum):
+    """Что канал получает, пока ответ генерируется. Итоговое сообщение приходит всегда."""
+
+    MESSAGE = auto()
+    TYPING = auto()
+    PARTIAL = auto()
 
 
 class Channel(Document):
@@ -8,7 +19,14 @@ class Channel(Document):
     bot_id: str = Field(..., description="ID бота, к которому подключен канал")
     channel_url: str = Field(..., description="URL канала для отправки сообщений")
     channel_token: str = Field(..., description="Токен авторизации канала")
+    delivery_mode: DeliveryMode = Field(DeliveryMode.MESSAGE, description="Режим доставки ответа во время генерации")
+    fanout: bool = Field(False, description="Получать ответы бота на сообщения из всех его каналов")
+    delivery_timeout: float | None = Field(
+        None,
+        description="Таймаут доставки в канал, с; по умолчанию из настроек HTTP клиента",
+    )
 
     class Settings:
         name = "channels"
-        indexes = [("bot_id",)]
+        # Фильтр по боту с пагинацией по _id читает один диапазон индекса
+        indexes = [IndexModel([("bot_id", 1), ("_id", 1)])]
@@ -1,6 +1,23 @@
 from beanie import Document
+from pydantic import BaseModel, Field
+from pymongo import IndexModel
+
+
+class ResponseCacheConfig(BaseModel):
+    """Настройки кэша ответов LLM для бота."""
+
+    enabled: bool = Field(default=False, description="Отвечать из кэша на повторяющиеся вопросы")
+    ttl: float = Field(default=3600.0, description="Сколько хранить ответ, с")
+    context_messages: int | None = Field(
+        default=None,
+        description="Сколько последних сообщений входит в ключ, None - весь ограниченный контекст; summary не входит",
+    )
 
 
 class ChatBot(Document):
     name: str
     secret_token: str
+    response_cache: ResponseCacheConfig = ResponseCacheConfig()
+
+    class Settings:
+        indexes = [IndexModel("secret_token", unique=True)]
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel
+
+
+class ChatLease(Document):
+    """Аренда чата воркером: пока она действует, ответы в чат генерирует только владелец."""
+
+    id: str = Field(..., description="Ключ чата: <bot_id>:<chat_id>")  # type: ignore[assignment]
+    owner: str = Field(..., description="ID воркера-владельца")
+    expires_at: datetime = Field(..., description="Время окончания аренды")
+
+    class Settings:
+        name = "chat_leases"
+        indexes = [
+            # Истёкшие аренды упавших воркеров удаляет сама Mongo
+            IndexModel("expires_at", expireAfterSeconds=0),
+        ]
@@ -3,6 +3,7 @@ from enum import StrEnum, auto
 
 from beanie import Document, PydanticObjectId, Replace, Save, before_event
 from pydantic import BaseModel, Field
+from pymongo import IndexModel
 
 
 class MessageRole(StrEnum):
@@ -11,29 +12,53 @@ class MessageRole(StrEnum):
     USER = auto()
 
 
-class DialogueMessage(BaseModel):
-    """Модель сообщения в диалоге."""
+class DialogueMessage(Document):
+    """Модель сообщения в диалоге. Сообщения хранятся отдельно и только добавляются."""
 
+    dialogue_id: PydanticObjectId = Field(..., description="ID диалога в БД")
+    chat_bot_id: PydanticObjectId = Field(..., description="ID чат-бота в БД")
     message_id: str = Field(..., description="Уникальный ID сообщения")
     chat_id: str = Field(..., description="ID чата")
     text: str = Field(..., description="Текст сообщения")
     role: MessageRole = Field(..., description="Роль отправителя")
     timestamp: datetime = Field(default_factory=lambda: datetime.now(UTC))
 
+    class Settings:
+        name = "dialogue_messages"
+        indexes = [
+            # _id в конце ключа: постраничное чтение истории по (timestamp, _id) идёт по индексу без сортировки
+            [("dialogue_id", 1), ("timestamp", 1), ("_id", 1)],
+            IndexModel([("chat_bot_id", 1), ("message_id", 1)], unique=True),
+        ]
+
+
+class ContextMessage(BaseModel):
+    """Проекция сообщения с полями, нужными для контекста LLM."""
+
+    role: MessageRole
+    text: str
+    timestamp: datetime
+
 
 class Dialogue(Document):
     """Модель диалога между пользователем и ботом."""
 
     chat_bot_id: PydanticObjectId = Field(..., description="ID чат-бота в БД")
     chat_id: str = Field(..., description="ID чата")
-    message_list: list[DialogueMessage] = Field(default_factory=list, description="Список сообщений")
+    summary: str | None = Field(None, description="Краткое содержание сообщений, не попадающих в контекст")
+    summary_until: datetime | None = Field(None, description="Время последнего сообщения, учтённого в summary")
     created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    archived_at: datetime | None = Field(None, description="Архив записан, диалог и сообщения удаляются")
 
     class Settings:
         name = "dialogues"
         indexes = [
-            [("chat_bot_id", 1), ("chat_id", 1)],
+            IndexModel([("chat_bot_id", 1), ("chat_id", 1)], unique=True),
+            # Список диалогов бота с пагинацией по _id читает один диапазон индекса
+            IndexModel([("chat_bot_id", 1), ("_id", 1)]),
+            # Поиск давно неактивных диалогов для архивации
+            IndexModel([("updated_at", 1), ("_id", 1)]),
         ]
 
     @before_event([Save, Replace])
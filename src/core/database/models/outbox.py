@@ -0,0 +1,53 @@
+from datetime import UTC, datetime
+from typing import Any
+
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+
+
+class OutboxMessage(Document):
+    """Сообщение в канал, ожидающее доставки."""
+
+    idempotency_key: str = Field(..., description="Ключ идемпотентности доставки")
+    channel_id: str = Field(..., description="ID канала")
+    channel_url: str = Field(..., description="URL канала для отправки сообщений")
+    channel_token: str = Field(..., description="Токен авторизации канала")
+    payload: dict[str, Any] = Field(..., description="Тело запроса в канал")
+    request_timeout: float | None = Field(None, description="Таймаут доставки в канал, с")
+    attempts: int = Field(0, description="Количество неудачных попыток доставки")
+    next_attempt_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    lock_id: str | None = Field(None, description="ID выборки диспетчера, взявшей сообщение")
+    locked_until: datetime | None = Field(None, description="До какого момента сообщение занято диспетчером")
+    last_error: str | None = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+
+    class Settings:
+        name = "outbox"
+        indexes = [
+            IndexModel([("idempotency_key", ASCENDING)], unique=True),
+            [("next_attempt_at", 1)],
+            [("lock_id", 1)],
+        ]
+
+
+class DeadLetterMessage(Document):
+    """Сообщение, которое не удалось доставить за допустимое число попыток."""
+
+    idempotency_key: str = Field(..., description="Ключ идемпотентности доставки")
+    channel_id: str = Field(..., description="ID канала")
+    channel_url: str = Field(..., description="URL канала для отправки сообщений")
+    payload: dict[str, Any] = Field(..., description="Тело запроса в канал")
+    attempts: int = Field(..., description="Количество попыток доставки")
+    last_error: str | None = None
+    created_at: datetime = Field(..., description="Время постановки в очередь")
+    failed_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    expires_at: datetime | None = Field(None, description="Время удаления, по умолчанию хранится всегда")
+
+    class Settings:
+        name = "outbox_dead_letters"
+        indexes = [
+            [("idempotency_key", 1)],
+            [("failed_at", 1)],
+            IndexModel("expires_at", expireAfterSeconds=0),
+        ]
@@ -0,0 +1,24 @@
+from datetime import UTC, datetime
+
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from pymongo import IndexModel
+
+
+class CachedResponse(Document):
+    """Ответ LLM, сохранённый по хэшу контекста."""
+
+    id: str = Field(..., description="Хэш бота и нормализованного контекста")  # type: ignore[assignment]
+    chat_bot_id: PydanticObjectId = Field(..., description="ID чат-бота в БД")
+    response: str = Field(..., description="Текст ответа")
+    expires_at: datetime = Field(..., description="Время истечения записи")
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+
+    class Settings:
+        name = "llm_response_cache"
+        indexes = [
+            # Истёкшие записи удаляет сама Mongo
+            IndexModel("expires_at", expireAfterSeconds=0),
+            # Для вытеснения самых старых записей при превышении лимита
+            [("created_at", 1)],
+        ]
@@ -0,0 +1,44 @@
+from pymongo import monitoring
+
+from core import metrics
+
+command_seconds = metrics.histogram(
+    "mongo_command_seconds",
+    "MongoDB command latency by collection",
+    ("collection", "command"),
+)
+command_failures = metrics.counter("mongo_command_failures", "Failed MongoDB commands", ("collection", "command"))
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Задержка команд Mongo по коллекциям.
+
+    Имя коллекции есть только в событии начала команды, поэтому оно
+    запоминается по request_id до завершения. Длительность берётся из
+    события драйвера, отдельные замеры не нужны.
+    """
+
+    def __init__(self) -> None:
+        self._started: dict[tuple[object, int], tuple[str, str]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        name = event.command_name
+        collection = event.command.get("collection") if name == "getMore" else event.command.get(name)
+        if not isinstance(collection, str):
+            collection = ""
+        self._started[event.connection_id, event.request_id] = (collection, name)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        labels = self._started.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            command_seconds.labels(*labels).observe(event.duration_micros / 1_000_000)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        labels = self._started.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            command_seconds.labels(*labels).observe(event.duration_micros / 1_000_000)
+            command_failures.labels(*labels).inc()
+
+
+command_metrics = CommandMetrics()
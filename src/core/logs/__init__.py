@@ -1,29 +1,77 @@
+import json
 import sys
+import traceback
+from typing import TYPE_CHECKING, Any, TextIO
 
 from loguru import logger
 
-from core.logs.handlers import UvicornHandler
+from core import settings
+from core.logs.handlers import ACCESS_LOGGER, UvicornHandler
+from core.logs.middleware import RequestIdMiddleware
+from core.logs.sinks import BackgroundWriter
+from core.settings_model import LogSettings
 
-__all__ = ["UvicornHandler", "configure_logger", "get_uvicorn_log_config"]
+if TYPE_CHECKING:
+    from loguru import Record
 
+__all__ = ["BackgroundWriter", "RequestIdMiddleware", "UvicornHandler", "configure_logger", "get_uvicorn_log_config"]
 
-def configure_logger() -> None:
-    log_format_all = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level> {exception}\n"
-    log_format_request = (
-        "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | {message} {exception}\n"
+
+def json_line(record: "Record") -> str:
+    data: dict[str, Any] = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+    }
+    if record["level"].name == "REQUEST":
+        # Место вызова для access-лога не ищется, см. UvicornHandler
+        data["logger"] = ACCESS_LOGGER
+    else:
+        data.update(logger=record["name"], function=record["function"], line=record["line"])
+    if request_id := record["extra"].get("request_id"):
+        data["request_id"] = request_id
+    if record["exception"] is not None:
+        data["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def configure_logger(config: LogSettings | None = None, sink: TextIO = sys.stdout) -> None:
+    """
+    Настроить loguru.
+
+    С enqueue запись в sink идёт из отдельного потока через BackgroundWriter,
+    и запрос ждёт только форматирования строки. await logger.complete()
+    дожидается записи очереди, logger.remove() при выходе дописывает её.
+    """
+    config = config or settings.log
+    prefix = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | "
+    log_format_all = (
+        "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level> {exception}\n"
     )
+    log_format_request = "{message} {exception}\n"
+    with_request_id = prefix + "<dim>{extra[request_id]}</dim> | "
+    # (уровень REQUEST, есть request_id) -> шаблон
+    templates = {
+        (False, False): prefix + log_format_all,
+        (True, False): prefix + log_format_request,
+        (False, True): with_request_id + log_format_all,
+        (True, True): with_request_id + log_format_request,
+    }
+
+    def log_format(record: "Record") -> str:
+        return templates[record["level"].name == "REQUEST", "request_id" in record["extra"]]
 
-    def log_format(record: "Record") -> str:  # type: ignore  # noqa: F821
-        if record["level"].name == "REQUEST":
-            return log_format_request
-        return log_format_all
+    def log_format_json(record: "Record") -> str:
+        record["extra"]["json"] = json_line(record)
+        return "{extra[json]}\n"
 
     logger.remove()
     logger.add(
-        sys.stdout,
-        colorize=True,
-        format=log_format,
-        diagnose=True,
+        BackgroundWriter(sink, config.queue_size) if config.enqueue else sink,
+        level=config.level,
+        colorize=False if config.format == "json" else config.colorize,
+        format=log_format_json if config.format == "json" else log_format,
+        diagnose=config.diagnose,
         backtrace=False,
     )
     logger.level("DEBUG", color="<fg #7f7f7f>")
@@ -32,10 +80,14 @@ def configure_logger() -> None:
     logger.level("WARNING", color="<yellow>")
     logger.level("ERROR", color="<red>")
     logger.level("CRITICAL", color="<bold><white><RED>")
-    logger.level("REQUEST", no=38, color="<magenta>")
+    try:
+        logger.level("REQUEST")
+    except ValueError:
+        logger.level("REQUEST", no=38, color="<magenta>")
 
 
-def get_uvicorn_log_config() -> dict:
+def get_uvicorn_log_config(config: LogSettings | None = None) -> dict:
+    config = config or settings.log
     return {
         "version": 1,
         "disable_existing_loggers": False,
@@ -54,6 +106,7 @@ def get_uvicorn_log_config() -> dict:
             },
             "uvicorn": {
                 "()": "core.logs.handlers.UvicornHandler",
+                "sample_rate": config.request_sample_rate,
             },
         },
         "loggers": {
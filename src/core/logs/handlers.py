@@ -1,17 +1,41 @@
 import inspect
 import logging
+import random
 
 from loguru import logger
 
+ACCESS_LOGGER = "uvicorn.access"
+
 
 class UvicornHandler(logging.Handler):
+    """
+    Перенаправляет логи uvicorn в loguru.
+
+    Для строк access-лога место вызова не ищется: формат REQUEST его не
+    выводит, а обход кадров на каждый запрос заметен в профиле. Из этих
+    строк пишется только доля sample_rate.
+    """
+
+    def __init__(self, level: int | str = logging.NOTSET, sample_rate: float = 1.0) -> None:
+        super().__init__(level)
+        self.sample_rate = sample_rate
+        self._levels: dict[str, str | int] = {}
+
     def emit(self, record: logging.LogRecord) -> None:
+        if record.name == ACCESS_LOGGER:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return
+            logger.opt(exception=record.exc_info).log("REQUEST", record.getMessage())
+            return
+
         # Get corresponding Loguru level if it exists.
-        level: str | int
-        try:
-            level = logger.level(record.levelname).name
-        except ValueError:
-            level = record.levelno
+        level = self._levels.get(record.levelname)
+        if level is None:
+            try:
+                level = logger.level(record.levelname).name
+            except ValueError:
+                level = record.levelno
+            self._levels[record.levelname] = level
 
         # Find caller from where originated the logged message.
         frame, depth = inspect.currentframe(), 0
@@ -19,7 +43,4 @@ class UvicornHandler(logging.Handler):
             frame = frame.f_back
             depth += 1
 
-        if record.name == "uvicorn.access":
-            level = "REQUEST"
-
         logger.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
@@ -0,0 +1,44 @@
+from uuid import uuid4
+
+from loguru import logger
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+MAX_REQUEST_ID_LENGTH = 128
+
+
+class RequestIdMiddleware:
+    """
+    Проставляет request_id во все логи запроса, включая строку access-лога.
+
+    Идентификатор берётся из заголовка запроса или генерируется и
+    возвращается в том же заголовке ответа. Чистое ASGI middleware, без
+    накладных расходов BaseHTTPMiddleware.
+    """
+
+    def __init__(self, app: ASGIApp, header: str = "X-Request-ID") -> None:
+        self.app = app
+        self.header = header
+        self._header_key = header.lower().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = ""
+        for key, value in scope["headers"]:
+            if key == self._header_key:
+                request_id = value.decode("latin-1")
+                break
+        # Чужой идентификатор попадает в логи, поэтому принимается только короткий и печатный
+        if not request_id or len(request_id) > MAX_REQUEST_ID_LENGTH or not request_id.isprintable():
+            request_id = uuid4().hex
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[self.header] = request_id
+            await send(message)
+
+        with logger.contextualize(request_id=request_id):
+            await self.app(scope, receive, send_with_request_id)
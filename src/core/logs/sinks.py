@@ -0,0 +1,90 @@
+import asyncio
+import os
+import queue
+import threading
+from typing import TextIO
+
+MAX_BATCH = 1000
+
+
+class BackgroundWriter:
+    """
+    Sink для loguru, который пишет в поток вывода из фонового потока.
+
+    Поток запроса только кладёт готовую строку в очередь. Фоновый поток
+    забирает всё накопившееся и пишет одним write с одним flush. При
+    переполнении очереди строки отбрасываются, а их число выводится
+    следующей строкой: логирование не должно тормозить обработку запросов.
+
+    В отличие от enqueue=True в loguru, очередь живёт в памяти процесса:
+    без pickle и записи в pipe на каждую строку.
+    """
+
+    def __init__(self, stream: TextIO, queue_size: int = 10_000) -> None:
+        self.stream = stream
+        self._queue: queue.Queue[str | None] = queue.Queue(queue_size)
+        self._thread: threading.Thread | None = None
+        self._pid = 0
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+
+    def isatty(self) -> bool:
+        # По нему loguru решает, раскрашивать ли вывод
+        return self.stream.isatty()
+
+    def write(self, message: str) -> None:
+        # После fork поток писателя остаётся в родительском процессе
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            lines = [line for line in batch if line is not None]
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                lines.append(f"{dropped} log records dropped: log queue is full\n")
+            try:
+                self.stream.write("".join(lines))
+                self.stream.flush()
+            except (OSError, ValueError):
+                # Закрытый stdout не должен ронять поток писателя
+                pass
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def join(self) -> None:
+        """Дождаться записи всех строк, уже поставленных в очередь."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    async def complete(self) -> None:
+        """Вызывается из await logger.complete()."""
+        await asyncio.to_thread(self.join)
+
+    def stop(self) -> None:
+        """Вызывается loguru в logger.remove(), в том числе при выходе из процесса."""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join()
@@ -1,16 +1,175 @@
-from typing import Annotated
+from typing import Annotated, Literal
 
-from pydantic import BaseModel, MongoDsn
+from pydantic import BaseModel, Field, MongoDsn
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class MongoSettings(BaseModel):
     url: Annotated[str, MongoDsn]
     db_name: str
+    # Параметры со значением None драйверу не передаются: действует значение из URL или драйвера
+    max_pool_size: int | None = None
+    # Соединения, которые драйвер держит открытыми и открывает при старте приложения
+    min_pool_size: int | None = None
+    # Сколько ждать свободного соединения при исчерпанном пуле, None - без ограничения
+    wait_queue_timeout: float | None = 5.0
+    # zstd и snappy требуют пакетов zstandard и python-snappy, без них драйвер их пропустит
+    compressors: list[Literal["zstd", "snappy", "zlib"]] = []
+    read_preference: Literal["primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"] | None = None
+    write_concern: int | Literal["majority"] | None = None
+    write_concern_journal: bool | None = None
 
 
 class ServerSettings(BaseModel):
-    workers: int = 1
+    host: str = "0.0.0.0"  # noqa: S104
+    port: int = 80
+    # 0 - по числу доступных процессу CPU
+    workers: int = Field(default=1, ge=0)
+    # auto - uvloop и httptools, если установлены
+    loop: Literal["auto", "asyncio", "uvloop"] = "auto"
+    http: Literal["auto", "h11", "httptools"] = "auto"
+    backlog: int = 2048
+    keepalive_timeout: int = 5
+    # Сверх этого числа соединений и задач uvicorn отвечает 503
+    limit_concurrency: int | None = None
+    # Сколько ждать завершения запросов при остановке, затем они обрываются
+    graceful_shutdown_timeout: int | None = 30
+    access_log: bool = True
+
+
+class ReplyWorkerSettings(BaseModel):
+    concurrency: int = 8
+    queue_size: int = 1000
+    drain_timeout: float = 30.0
+    chat_lock: bool = False
+    chat_lock_ttl: float = 60.0
+    chat_lock_retry_interval: float = 0.5
+
+
+class HttpClientSettings(BaseModel):
+    max_connections_per_host: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = True
+    connect_timeout: float = 5.0
+    pool_timeout: float = 5.0
+    timeout: float = 30.0
+
+
+class OutboxSettings(BaseModel):
+    batch_size: int = 100
+    poll_interval: float = 1.0
+    lease: float = 60.0
+    max_attempts: int = 8
+    base_delay: float = 1.0
+    max_delay: float = 300.0
+    drain_timeout: float = 10.0
+    # Срок хранения dead letters, по умолчанию хранятся всегда
+    dead_letter_ttl_days: float | None = None
+
+
+class CircuitBreakerSettings(BaseModel):
+    # Подряд идущих ошибок канала до размыкания
+    failure_threshold: int = 5
+    # Сколько разомкнутый канал не получает запросов до пробного
+    open_duration: float = 30.0
+    # Таймаут - p99 последних latency_window успешных запросов, умноженный на timeout_multiplier
+    latency_window: int = 200
+    min_samples: int = 20
+    timeout_multiplier: float = 3.0
+    min_timeout: float = 1.0
+
+
+class DedupSettings(BaseModel):
+    cache_size: int = 100_000
+    ttl: float = 600.0
+
+
+class LookupCacheSettings(BaseModel):
+    max_size: int = 10_000
+    ttl: float = 60.0
+    watch_changes: bool = False
+    watch_retry_interval: float = 5.0
+
+
+class ContextSettings(BaseModel):
+    max_messages: int = 20
+    max_tokens: int = 2000
+    summarize_batch: int = 20
+
+
+class StreamingSettings(BaseModel):
+    partial_interval: float = 0.5
+    typing_interval: float = 3.0
+    event_timeout: float = 5.0
+
+
+class LivePushSettings(BaseModel):
+    # Событий в буфере подписчика; кто не успевает их забирать, отключается
+    subscriber_queue_size: int = 100
+    max_subscribers: int = 1000
+    heartbeat_interval: float = 15.0
+    # Получать сообщения из change stream Mongo (нужен replica set), чтобы видеть сообщения всех воркеров
+    watch_changes: bool = False
+    watch_retry_interval: float = 5.0
+
+
+class RetentionSettings(BaseModel):
+    # Фоновая очистка удаляет данные из рабочих коллекций, поэтому включается явно
+    enabled: bool = False
+    interval: float = 3600.0
+    # Диалоги без новых сообщений дольше archive_after_days переносятся в архив
+    archive_after_days: float = 90.0
+    archive_ttl_days: float | None = None
+    # Сообщения старше trim_after_days, уже свёрнутые в summary, удаляются; None - не удалять
+    trim_after_days: float | None = 30.0
+    compression_level: int = Field(default=6, ge=1, le=9)
+    archive_chunk_messages: int = 1000
+    archive_chunk_bytes: int = 4 * 1024 * 1024
+    # Троттлинг: пауза после каждой пачки, не быстрее max_docs_per_second и не при очереди ответов
+    batch_size: int = 100
+    batch_pause: float = 0.5
+    max_docs_per_second: float = 2000.0
+    busy_queue_depth: int = 1
+    lease: float = 300.0
+
+
+class LLMSettings(BaseModel):
+    backend: Literal["mock", "openai"] = "mock"
+    base_url: str = "http://127.0.0.1:8001/v1"
+    api_key: str | None = None
+    model: str = "gpt-4o-mini"
+    request_timeout: float = 60.0
+    max_batch_size: int = 16
+    batch_wait: float = 0.01
+    max_concurrency: int = 16
+    per_bot_concurrency: int = 4
+    rate_limit: float = 0.0
+    rate_burst: int = 10
+    mock_min_delay: float = 1.0
+    mock_max_delay: float = 5.0
+
+
+class ResponseCacheSettings(BaseModel):
+    memory_size: int = 10_000
+    memory_ttl: float = 300.0
+    max_entries: int = 100_000
+    trim_every: int = 1000
+
+
+class LogSettings(BaseModel):
+    level: str = "INFO"
+    format: Literal["text", "json"] = "text"
+    # Запись в stdout из отдельного потока, запрос не ждёт вывода
+    enqueue: bool = True
+    # Строки сверх очереди отбрасываются
+    queue_size: int = 10_000
+    # Значения переменных в трейсбеках: полезно при отладке, дорого и небезопасно в проде
+    diagnose: bool = False
+    colorize: bool | None = None
+    # Доля записываемых строк access-лога uvicorn (уровень REQUEST)
+    request_sample_rate: float = Field(default=1.0, ge=0.0, le=1.0)
+    request_id_header: str = "X-Request-ID"
 
 
 class Settings(BaseSettings):
@@ -23,6 +182,19 @@ class Settings(BaseSettings):
 
     mongo: MongoSettings
     server: ServerSettings = ServerSettings()
+    reply_worker: ReplyWorkerSettings = ReplyWorkerSettings()
+    http_client: HttpClientSettings = HttpClientSettings()
+    outbox: OutboxSettings = OutboxSettings()
+    circuit_breaker: CircuitBreakerSettings = CircuitBreakerSettings()
+    dedup: DedupSettings = DedupSettings()
+    lookup_cache: LookupCacheSettings = LookupCacheSettings()
+    context: ContextSettings = ContextSettings()
+    streaming: StreamingSettings = StreamingSettings()
+    llm: LLMSettings = LLMSettings()
+    response_cache: ResponseCacheSettings = ResponseCacheSettings()
+    retention: RetentionSettings = RetentionSettings()
+    live: LivePushSettings = LivePushSettings()
+    log: LogSettings = LogSettings()
 
 
 settings = Settings()  # type: ignore[call-arg]
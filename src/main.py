@@ -1,21 +1,65 @@
+import os
+from importlib.util import find_spec
+from typing import Any
+
 import uvicorn
 from loguru import logger
 
 from core.logs import configure_logger, get_uvicorn_log_config
-from core.settings_model import settings
+from core.settings_model import ServerSettings, settings
+
+
+def worker_count(config: ServerSettings) -> int:
+    return config.workers or os.process_cpu_count() or 1
+
+
+def resolve_loop(config: ServerSettings) -> str:
+    if config.loop != "auto":
+        return config.loop
+    return "uvloop" if find_spec("uvloop") else "asyncio"
+
 
+def resolve_http(config: ServerSettings) -> str:
+    if config.http != "auto":
+        return config.http
+    return "httptools" if find_spec("httptools") else "h11"
 
-def main() -> None:
+
+def server_options(config: ServerSettings) -> dict[str, Any]:
+    """Параметры uvicorn.run из настроек сервера."""
+    return {
+        "host": config.host,
+        "port": config.port,
+        "workers": worker_count(config),
+        "loop": resolve_loop(config),
+        "http": resolve_http(config),
+        "backlog": config.backlog,
+        "timeout_keep_alive": config.keepalive_timeout,
+        "limit_concurrency": config.limit_concurrency,
+        "timeout_graceful_shutdown": config.graceful_shutdown_timeout,
+        "access_log": config.access_log,
+    }
+
+
+def main(app: str = "app.app:app") -> None:
+    """
+    Запустить uvicorn.
+
+    С несколькими воркерами каждый процесс импортирует приложение заново и
+    сам проходит lifespan: логи, пулы Mongo и HTTP, фоновые воркеры у каждого свои.
+    """
     configure_logger()
-    logger.info("Starting app...")
-
-    uvicorn.run(
-        "app.app:app",
-        log_config=get_uvicorn_log_config(),
-        port=80,
-        host="0.0.0.0",  # noqa: S104
-        workers=settings.server.workers,
+    options = server_options(settings.server)
+    logger.info(
+        f"Starting app: {options['workers']} workers, {options['loop']} loop, "
+        f"{options['http']} parser on {options['host']}:{options['port']}",
     )
+    if options["workers"] > 1 and not settings.reply_worker.chat_lock:
+        logger.warning(
+            "Several workers without REPLY_WORKER__CHAT_LOCK: replies in a chat may be generated out of order",
+        )
+
+    uvicorn.run(app, log_config=get_uvicorn_log_config(), **options)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+import json
+from abc import ABC, abstractmethod
+from asyncio import sleep
+from collections.abc import AsyncIterator
+from contextlib import AbstractAsyncContextManager
+from random import uniform
+from typing import Any, Protocol
+
+import httpx
+
+from core.database.models import ContextMessage
+
+LLM_RESPONSE_CHUNKS = ("New ", "message ", "from ", "llm")
+
+
+class HttpClient(Protocol):
+    """Часть интерфейса httpx.AsyncClient, нужная бэкенду: подходит и реестр пулов приложения."""
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response: ...
+
+    def stream(self, method: str, url: str, **kwargs: Any) -> AbstractAsyncContextManager[httpx.Response]: ...
+
+
+class LLMBackend(ABC):
+    """
+    Провайдер LLM.
+
+    generate принимает сразу несколько промптов, чтобы планировщик мог
+    объединять одновременные запросы в один вызов провайдера. stream
+    отдаёт ответ на один промпт по частям.
+    """
+
+    # Уходит ли пачка промптов к провайдеру одним запросом; иначе планировщик шлёт промпты по одному
+    batching: bool = True
+
+    @abstractmethod
+    async def generate(self, prompts: list[list[ContextMessage]]) -> list[str]: ...
+
+    async def stream(self, prompt: list[ContextMessage]) -> AsyncIterator[str]:
+        (text,) = await self.generate([prompt])
+        yield text
+
+
+class MockBackend(LLMBackend):
+    """Заглушка: одинаковый ответ после случайной задержки, пачка стоит как один запрос."""
+
+    def __init__(self, min_delay: float = 1.0, max_delay: float = 5.0) -> None:
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+
+    async def generate(self, prompts: list[list[ContextMessage]]) -> list[str]:
+        await sleep(uniform(self.min_delay, self.max_delay))
+        return ["".join(LLM_RESPONSE_CHUNKS)] * len(prompts)
+
+    async def stream(self, prompt: list[ContextMessage]) -> AsyncIterator[str]:
+        chunk_delay = uniform(self.min_delay, self.max_delay) / len(LLM_RESPONSE_CHUNKS)
+        for chunk in LLM_RESPONSE_CHUNKS:
+            await sleep(chunk_delay)
+            yield chunk
+
+
+def render_messages(prompt: list[ContextMessage]) -> list[dict[str, str]]:
+    """Промпт в формате messages для /chat/completions, роли сохраняются."""
+    return [{"role": str(message.role), "content": message.text} for message in prompt]
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    Провайдер с OpenAI-совместимым API.
+
+    Все запросы идут в /chat/completions с ролями сообщений. Пакетного
+    режима у него нет, поэтому batching выключен: планировщик отправляет
+    каждый промпт отдельным запросом, и на каждый запрос приходится своё
+    место в max_concurrency и свой токен rate_limit. Потоковые ответы
+    идут туда же со stream.
+    """
+
+    batching = False
+
+    def __init__(
+        self,
+        http: HttpClient,
+        base_url: str,
+        model: str,
+        api_key: str | None = None,
+        request_timeout: float = 60.0,
+    ) -> None:
+        self.http = http
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.request_timeout = request_timeout
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+    async def generate(self, prompts: list[list[ContextMessage]]) -> list[str]:
+        return [await self.complete(prompt) for prompt in prompts]
+
+    async def complete(self, prompt: list[ContextMessage]) -> str:
+        response = await self.http.post(
+            f"{self.base_url}/chat/completions",
+            json={"model": self.model, "messages": render_messages(prompt)},
+            headers=self.headers,
+            timeout=self.request_timeout,
+        )
+        response.raise_for_status()
+        (choice,) = response.json()["choices"]
+        return choice["message"]["content"].strip()
+
+    async def stream(self, prompt: list[ContextMessage]) -> AsyncIterator[str]:
+        payload = {
+            "model": self.model,
+            "messages": render_messages(prompt),
+            "stream": True,
+        }
+        async with self.http.stream(
+            "POST",
+            f"{self.base_url}/chat/completions",
+            json=payload,
+            headers=self.headers,
+            timeout=self.request_timeout,
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line.removeprefix("data:").strip()
+                if data == "[DONE]":
+                    break
+                for choice in json.loads(data)["choices"]:
+                    if content := choice["delta"].get("content"):
+                        yield content
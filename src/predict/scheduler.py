@@ -0,0 +1,164 @@
+import asyncio
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Hashable
+from contextlib import asynccontextmanager, suppress
+from typing import NamedTuple
+
+from loguru import logger
+
+from core.database.models import ContextMessage
+from core.settings_model import LLMSettings
+from predict.backends import LLMBackend
+
+
+class TokenBucket:
+    """Ограничение частоты: rate токенов в секунду, не больше capacity подряд. rate <= 0 - без ограничения."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        # Ожидающие обслуживаются по очереди, а не тот, кто проснулся первым
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+
+class KeyedSemaphore:
+    """Семафор на каждый ключ; семафоры без пользователей удаляются, чтобы словарь не рос."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._semaphores: dict[Hashable, asyncio.Semaphore] = {}
+        self._users: Counter[Hashable] = Counter()
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        semaphore = self._semaphores.setdefault(key, asyncio.Semaphore(self.limit))
+        self._users[key] += 1
+        try:
+            async with semaphore:
+                yield
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._semaphores[key]
+
+
+class PendingPrompt(NamedTuple):
+    prompt: list[ContextMessage]
+    future: asyncio.Future[str]
+
+
+class LLMScheduler:
+    """
+    Планировщик запросов к LLM.
+
+    Одновременные запросы без стриминга собираются в пачки: первая ждёт
+    не дольше batch_wait, пачка не больше max_batch_size, и уходит одним
+    вызовом провайдера. Пока заняты все max_concurrency вызовов, пачки
+    продолжают набираться, поэтому под нагрузкой они крупнее. Провайдер
+    без пакетного режима (backend.batching = False) получает промпты по
+    одному, так что лимиты всегда считаются по реальным запросам к нему.
+    Каждый вызов провайдера проходит через ограничение частоты, а число
+    одновременных запросов одного бота ограничено per_bot_concurrency.
+    """
+
+    def __init__(self, backend: LLMBackend, config: LLMSettings) -> None:
+        self.backend = backend
+        self.config = config
+        self.batches = 0
+        self.batched_prompts = 0
+        self._calls = asyncio.Semaphore(config.max_concurrency)
+        self._per_bot = KeyedSemaphore(config.per_bot_concurrency)
+        self._rate = TokenBucket(config.rate_limit, config.rate_burst)
+        self._pending: asyncio.Queue[PendingPrompt] = asyncio.Queue()
+        self._collector: asyncio.Task[None] | None = None
+        self._dispatches: set[asyncio.Task[None]] = set()
+
+    async def complete(self, bot_id: Hashable, prompt: list[ContextMessage]) -> str:
+        """Получить ответ целиком, запрос может уйти к провайдеру в пачке с другими."""
+        async with self._per_bot.hold(bot_id):
+            future: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+            self._pending.put_nowait(PendingPrompt(prompt, future))
+            if self._collector is None or self._collector.done():
+                self._collector = asyncio.create_task(self._collect(), name="llm-batch-collector")
+            return await future
+
+    async def stream(self, bot_id: Hashable, prompt: list[ContextMessage]) -> AsyncIterator[str]:
+        """Получать ответ по частям; потоковые запросы не объединяются."""
+        async with self._per_bot.hold(bot_id), self._calls:
+            await self._rate.acquire()
+            async for chunk in self.backend.stream(prompt):
+                yield chunk
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch_size = self.config.max_batch_size if self.backend.batching else 1
+        while True:
+            batch = [await self._pending.get()]
+            deadline = loop.time() + self.config.batch_wait
+            while len(batch) < batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(self._pending.get(), deadline - loop.time()))
+                except TimeoutError:
+                    break
+
+            await self._calls.acquire()
+            dispatch = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(dispatch)
+            dispatch.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: list[PendingPrompt]) -> None:
+        try:
+            # Отменённые запросы провайдеру не нужны
+            batch = [pending for pending in batch if not pending.future.done()]
+            if not batch:
+                return
+            await self._rate.acquire()
+            self.batches += 1
+            self.batched_prompts += len(batch)
+            try:
+                responses = await self.backend.generate([pending.prompt for pending in batch])
+                if len(responses) != len(batch):
+                    raise RuntimeError(f"LLM returned {len(responses)} responses for {len(batch)} prompts")
+            except Exception as e:
+                logger.warning(f"LLM call for {len(batch)} prompts failed: {e!r}")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+                return
+            for pending, response in zip(batch, responses, strict=True):
+                if not pending.future.done():
+                    pending.future.set_result(response)
+        finally:
+            self._calls.release()
+            # При остановке ожидающие не должны зависнуть
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.cancel()
+
+    async def aclose(self) -> None:
+        tasks = [task for task in (self._collector, *self._dispatches) if task is not None]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._collector = None
+        while not self._pending.empty():
+            self._pending.get_nowait().future.cancel()
@@ -0,0 +1,110 @@
+"""
+OpenAI-совместимый сервер-заглушка для тестов и нагрузочных прогонов.
+
+    PYTHONPATH=src python -m predict.stub_server --port 8001 --delay 0.5
+
+Приложение можно направить на него через LLM__BACKEND=openai и
+LLM__BASE_URL=http://127.0.0.1:8001/v1. Ответ всегда один и тот же,
+каждый вызов /chat/completions занимает delay секунд.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterator
+from typing import Any
+from uuid import uuid4
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from predict.backends import LLM_RESPONSE_CHUNKS
+
+
+class ChatMessage(BaseModel):
+    role: str
+    content: str
+
+
+class ChatCompletionRequest(BaseModel):
+    model: str
+    messages: list[ChatMessage]
+    stream: bool = False
+
+
+class StubStats(BaseModel):
+    requests: int = 0
+    prompts: int = 0
+
+
+def create_app(delay: float = 0.0) -> FastAPI:
+    """
+    Args:
+        delay: Время генерации одного ответа, в потоковом режиме делится между частями
+    """
+    app = FastAPI(title="LLM stub")
+    stats = StubStats()
+
+    def completion_id() -> str:
+        return f"cmpl-{uuid4().hex}"
+
+    @app.get("/v1/models")
+    async def list_models() -> dict[str, Any]:
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]}
+
+    @app.post("/v1/chat/completions", response_model=None)
+    async def chat_completions(request: ChatCompletionRequest) -> dict[str, Any] | StreamingResponse:
+        stats.requests += 1
+        stats.prompts += 1
+        if not request.stream:
+            await asyncio.sleep(delay)
+            return {
+                "id": completion_id(),
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(LLM_RESPONSE_CHUNKS)},
+                        "finish_reason": "stop",
+                    },
+                ],
+            }
+
+        async def events() -> AsyncIterator[str]:
+            chunk_id = completion_id()
+            for chunk in LLM_RESPONSE_CHUNKS:
+                await asyncio.sleep(delay / len(LLM_RESPONSE_CHUNKS))
+                event = {
+                    "id": chunk_id,
+                    "object": "chat.completion.chunk",
+                    "model": request.model,
+                    "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(event)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def get_stats() -> StubStats:
+        return stats
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--delay", type=float, default=1.0, help="Время генерации ответа, с")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.delay), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+from collections.abc import Hashable
+
+from core.database.models import ContextMessage, MessageRole
+from predict.scheduler import LLMScheduler
+
+SUMMARY_INSTRUCTION = (
+    "Summarize the conversation below in a few sentences. Keep names, facts, requests and promises "
+    "that later replies may depend on."
+)
+
+
+def summary_prompt(summary: str | None, chat_history: list[ContextMessage]) -> list[ContextMessage]:
+    """Промпт для свёртки: инструкция, прошлое summary и новые сообщения диалога."""
+    instruction = SUMMARY_INSTRUCTION
+    if summary:
+        instruction += f"\n\nSummary so far:\n{summary}"
+    return [
+        ContextMessage(role=MessageRole.SYSTEM, text=instruction, timestamp=chat_history[0].timestamp),
+        *chat_history,
+    ]
+
+
+async def summarize(
+    llm: LLMScheduler,
+    bot_id: Hashable,
+    summary: str | None,
+    chat_history: list[ContextMessage],
+) -> str:
+    """Дописать в summary новые сообщения; запрос идёт через планировщик с лимитами бота."""
+    return await llm.complete(bot_id, summary_prompt(summary, chat_history))
@@ -1,13 +1,17 @@
 import asyncio
 from asyncio import AbstractEventLoop
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Awaitable, Callable
 
-import motor.motor_asyncio
 import pytest
 from httpx import ASGITransport, AsyncClient
 
+from app.services.circuit_breaker import channel_breakers
+from app.services.lookup_cache import lookup_cache
+from app.services.response_cache import response_cache
 from core import settings
-from core.database import initialize_database
+from core.database import get_client, initialize_database
+from core.database.models.channel import Channel
+from core.database.models.chat_bot import ChatBot
 from src.app.app import app
 
 
@@ -27,8 +31,12 @@ async def drop_db() -> None:
     if not settings.mongo.db_name.lower().endswith("test"):
         raise RuntimeError
 
-    mongo: motor.motor_asyncio.AsyncIOMotorClient = motor.motor_asyncio.AsyncIOMotorClient(settings.mongo.url)
-    await mongo.drop_database(settings.mongo.db_name)
+    await get_client().drop_database(settings.mongo.db_name)
+    # Индексы удаляются вместе с базой, а на уникальных индексах держится идемпотентность
+    await initialize_database()
+    lookup_cache.clear()
+    response_cache.clear()
+    channel_breakers.clear()
 
 
 @pytest.fixture(scope="session")
@@ -39,3 +47,24 @@ async def client() -> AsyncGenerator[AsyncClient]:
         base_url="http://testserver",
     ) as client:
         yield client
+
+
+type BotWithChannelFactory = Callable[[str], Awaitable[tuple[ChatBot, Channel]]]
+
+
+@pytest.fixture
+def create_bot_with_channel() -> BotWithChannelFactory:
+    """Фабрика бота с одним каналом доставки, токен бота передаётся аргументом"""
+
+    async def create(token: str) -> tuple[ChatBot, Channel]:
+        bot = ChatBot(name="Test Bot", secret_token=token)
+        await bot.insert()
+        channel = Channel(
+            bot_id=str(bot.id),
+            channel_url="http://example.com/webhook",
+            channel_token="chan-token",  # noqa: S106
+        )
+        await channel.insert()
+        return bot, channel
+
+    return create
@@ -0,0 +1,34 @@
+import pytest
+
+from core.cache import TTLCache
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    """Тест: при переполнении вытесняется давно не использованная запись"""
+    cache: TTLCache[str, int] = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats().evictions == 1
+
+
+def test_cache_expires_entries(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест: записи старше ttl не возвращаются"""
+    now = 1000.0
+    monkeypatch.setattr("core.cache.time.monotonic", lambda: now)
+    cache: TTLCache[str, int] = TTLCache(max_size=10, ttl=5)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    now += 10
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    stats = cache.stats()
+    assert (stats.hits, stats.misses) == (1, 1)
@@ -1,8 +1,11 @@
+import json
+
 import pytest
 from fastapi import status
 from httpx import AsyncClient
 
 from app.schemas import ChannelRead
+from core import settings
 from core.database.models.channel import Channel
 from core.database.models.chat_bot import ChatBot
 
@@ -153,6 +156,42 @@ async def test_create_channel_invalid_data(client: AsyncClient) -> None:
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
 
+@pytest.mark.asyncio
+async def test_create_channel_delivery_timeout_exceeds_lease(client: AsyncClient) -> None:
+    """Тест: таймаут доставки не может быть больше аренды outbox, иначе сообщение доставится дважды"""
+    payload = {
+        "bot_id": "bot-123",
+        "channel_url": "http://example.com/webhook",
+        "delivery_timeout": settings.outbox.lease,
+    }
+
+    response = await client.post("/api/channels/", json=payload)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_stored_channel_readable_after_lease_lowered(
+    client: AsyncClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Тест: канал с таймаутом больше уменьшенной аренды outbox по-прежнему читается через API"""
+    channel = Channel(
+        bot_id="bot-123",
+        channel_url="http://example.com/webhook",
+        channel_token="chan-token",  # noqa: S106
+        delivery_timeout=30.0,
+    )
+    await channel.insert()
+    monkeypatch.setattr(settings.outbox, "lease", 10.0)
+
+    response = await client.get(f"/api/channels/{channel.id}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["delivery_timeout"] == 30.0
+
+    response = await client.get("/api/channels/")
+    assert response.status_code == status.HTTP_200_OK
+
+
 @pytest.mark.asyncio
 async def test_update_channel_partial_data_fail(client: AsyncClient) -> None:
     """Тест частичного обновления канала"""
@@ -210,3 +249,147 @@ async def test_empty_channels_list(client: AsyncClient) -> None:
     assert response.status_code == status.HTTP_200_OK
     data = response.json()
     assert data == []
+
+
+@pytest.mark.asyncio
+async def test_list_channels_pagination(client: AsyncClient) -> None:
+    """Тест постраничного получения каналов по курсору с фильтром по боту"""
+    channels = [
+        Channel(bot_id="page-bot", channel_url=f"http://example{i}.com", channel_token="token123")  # noqa: S106
+        for i in range(5)
+    ]
+    for channel in channels:
+        await channel.insert()
+    await Channel(bot_id="other-bot", channel_url="http://other.com", channel_token="token123").insert()  # noqa: S106
+
+    received = []
+    cursor = None
+    for _ in range(3):
+        params: dict[str, str | int] = {"bot_id": "page-bot", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/api/channels/", params=params)
+        assert response.status_code == status.HTTP_200_OK
+        received += [item["id"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+
+    assert cursor is None
+    assert received == [str(channel.id) for channel in channels]
+
+
+@pytest.mark.asyncio
+async def test_list_channels_fields_projection(client: AsyncClient) -> None:
+    """Тест выборки только запрошенных полей"""
+    channel = Channel(bot_id="bot-123", channel_url="http://example.com", channel_token="token123")  # noqa: S106
+    await channel.insert()
+
+    response = await client.get("/api/channels/", params={"fields": "channel_url"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [{"id": str(channel.id), "channel_url": "http://example.com"}]
+
+    response = await client.get("/api/channels/", params={"fields": "secret"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_list_channels_invalid_cursor(client: AsyncClient) -> None:
+    """Тест запроса с испорченным курсором"""
+    response = await client.get("/api/channels/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_list_channels_ndjson(client: AsyncClient) -> None:
+    """Тест потоковой выгрузки каналов в NDJSON"""
+    channels = [
+        Channel(bot_id="bot-123", channel_url=f"http://example{i}.com", channel_token="token123")  # noqa: S106
+        for i in range(3)
+    ]
+    for channel in channels:
+        await channel.insert()
+
+    response = await client.get("/api/channels/", params={"format": "ndjson", "fields": "bot_id"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [{"id": str(channel.id), "bot_id": "bot-123"} for channel in channels]
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_channels(client: AsyncClient) -> None:
+    """Тест массового создания каналов с результатом по каждому элементу"""
+    payload = [
+        {"bot_id": "bulk-bot", "channel_url": "http://example1.com"},
+        {"bot_id": "bulk-bot", "channel_url": "invalid-url"},
+        {"bot_id": "bulk-bot", "channel_url": "http://example3.com"},
+    ]
+
+    response = await client.post("/api/channels/bulk", params={"ordered": False}, json=payload)
+    assert response.status_code == status.HTTP_200_OK
+
+    result = response.json()
+    assert [item["status"] for item in result["results"]] == ["created", "invalid", "created"]
+    assert (result["succeeded"], result["failed"], result["skipped"]) == (2, 1, 0)
+    assert await Channel.find(Channel.bot_id == "bulk-bot").count() == 2
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_channels_ordered_ndjson(client: AsyncClient) -> None:
+    """Тест загрузки NDJSON в режиме ordered: после первой ошибки элементы не обрабатываются"""
+    lines = [
+        json.dumps({"bot_id": "bulk-bot", "channel_url": "http://example1.com"}),
+        "not json",
+        json.dumps({"bot_id": "bulk-bot", "channel_url": "http://example3.com"}),
+    ]
+
+    response = await client.post(
+        "/api/channels/bulk",
+        content="\n".join(lines),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [item["status"] for item in response.json()["results"]] == ["created", "invalid", "skipped"]
+    assert await Channel.find(Channel.bot_id == "bulk-bot").count() == 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_and_delete_channels(client: AsyncClient) -> None:
+    """Тест массового обновления и удаления каналов"""
+    channel = Channel(bot_id="bot-123", channel_url="http://old.example.com/", channel_token="token123")  # noqa: S106
+    await channel.insert()
+    missing_id = "0123456789abcdef01234567"
+
+    response = await client.patch(
+        "/api/channels/bulk",
+        params={"ordered": False},
+        json=[
+            {"id": missing_id, "bot_id": "bot-456", "channel_url": "http://new.example.com/"},
+            {"id": str(channel.id), "bot_id": "bot-456", "channel_url": "http://new.example.com/"},
+        ],
+    )
+    assert [item["status"] for item in response.json()["results"]] == ["not_found", "updated"]
+
+    updated = await Channel.get(channel.id)
+    assert updated is not None
+    assert (updated.bot_id, updated.channel_url) == ("bot-456", "http://new.example.com/")
+
+    response = await client.post("/api/channels/bulk/delete", json=[{"id": str(channel.id)}, {"id": missing_id}])
+    assert [item["status"] for item in response.json()["results"]] == ["deleted", "not_found"]
+    assert await Channel.get(channel.id) is None
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_channels_ordered_skips_after_missing(client: AsyncClient) -> None:
+    """Тест режима ordered: отсутствующие каналы после первой ошибки помечаются skipped, а не not_found"""
+    channel = Channel(bot_id="bot-123", channel_url="http://example.com/", channel_token="token123")  # noqa: S106
+    await channel.insert()
+    missing = [{"id": f"0123456789abcdef0123456{i}"} for i in range(2)]
+
+    response = await client.post("/api/channels/bulk/delete", json=[missing[0], {"id": str(channel.id)}, missing[1]])
+    assert response.status_code == status.HTTP_200_OK
+
+    result = response.json()
+    assert [item["status"] for item in result["results"]] == ["not_found", "skipped", "skipped"]
+    assert (result["succeeded"], result["failed"], result["skipped"]) == (0, 1, 2)
+    assert await Channel.get(channel.id) is not None
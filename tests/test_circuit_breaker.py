@@ -0,0 +1,206 @@
+from typing import Any
+
+import httpx
+import pytest
+from httpx import AsyncClient
+
+from app.schemas import BreakerState
+from app.services.channel_service import send_to_channel
+from app.services.circuit_breaker import CircuitBreaker, channel_breakers
+from app.services.outbox import OutboxDispatcher
+from core import settings
+from core.database.models.channel import Channel
+from core.database.models.outbox import OutboxMessage
+
+CONFIG = settings.circuit_breaker.model_copy(
+    update={"failure_threshold": 2, "open_duration": 60.0, "min_samples": 3, "timeout_multiplier": 2.0},
+)
+
+
+@pytest.fixture
+def channel_responses(monkeypatch: pytest.MonkeyPatch) -> list[int]:
+    """Коды ответов канала по порядку; каждый запрос забирает первый."""
+    responses: list[int] = []
+
+    async def fake_post(url: str, **kwargs: Any) -> httpx.Response:
+        return httpx.Response(responses.pop(0), text="status")
+
+    monkeypatch.setattr("app.services.channel_service.http_clients.post", fake_post)
+    monkeypatch.setattr(channel_breakers, "config", CONFIG)
+    return responses
+
+
+def test_breaker_opens_after_threshold_and_closes_after_probe(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест: ошибки подряд размыкают предохранитель, после паузы проходит один пробный запрос"""
+    now = 1000.0
+    monkeypatch.setattr("app.services.circuit_breaker.time.monotonic", lambda: now)
+    breaker = CircuitBreaker("http://example.com/webhook", CONFIG)
+
+    breaker.record_failure()
+    assert breaker.state == BreakerState.CLOSED
+    breaker.record_failure()
+    assert breaker.state == BreakerState.OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() == 60.0
+
+    now += 61
+    assert breaker.allow()
+    assert breaker.state == BreakerState.HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success(0.1)
+    assert breaker.state == BreakerState.CLOSED
+    assert breaker.rejected == 2
+
+
+def test_failed_probe_opens_breaker_again(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест: неудачный пробный запрос снова размыкает предохранитель"""
+    now = 1000.0
+    monkeypatch.setattr("app.services.circuit_breaker.time.monotonic", lambda: now)
+    breaker = CircuitBreaker("http://example.com/webhook", CONFIG)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    now += 61
+    assert breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state == BreakerState.OPEN
+    assert not breaker.allow()
+
+
+def test_timeout_adapts_to_p99_latency() -> None:
+    """Тест: таймаут следует за p99 задержки, но не выходит за границы из настроек"""
+    breaker = CircuitBreaker("http://example.com/webhook", CONFIG)
+    assert breaker.timeout(30.0) == 30.0
+
+    for latency in (0.5, 0.7, 2.0):
+        breaker.record_success(latency)
+    assert breaker.timeout(30.0) == 4.0
+    assert breaker.timeout(3.0) == 3.0
+
+    fast = CircuitBreaker("http://fast.example.com/webhook", CONFIG)
+    for _ in range(3):
+        fast.record_success(0.01)
+    assert fast.timeout(30.0) == CONFIG.min_timeout
+
+
+def test_timeouts_widen_adaptive_timeout() -> None:
+    """Тест: запросы, упавшие по таймауту, попадают в выборку задержек и поднимают таймаут"""
+    breaker = CircuitBreaker("http://example.com/webhook", CONFIG)
+    for _ in range(3):
+        breaker.record_success(0.1)
+    assert breaker.timeout(30.0) == CONFIG.min_timeout
+
+    breaker.record_failure(latency=CONFIG.min_timeout)
+    assert breaker.timeout(30.0) == CONFIG.min_timeout * CONFIG.timeout_multiplier
+
+
+def test_probe_gets_full_timeout(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест: пробный запрос после размыкания ждёт полный таймаут, а не p99 прошлых ответов"""
+    now = 1000.0
+    monkeypatch.setattr("app.services.circuit_breaker.time.monotonic", lambda: now)
+    breaker = CircuitBreaker("http://example.com/webhook", CONFIG)
+    for _ in range(3):
+        breaker.record_success(0.1)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    now += 61
+    assert breaker.allow()
+    assert breaker.timeout(30.0) == 30.0
+
+
+@pytest.mark.asyncio
+async def test_read_timeout_recorded_as_latency(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест: таймаут ответа канала записывается в выборку задержек со значением таймаута"""
+
+    async def timing_out_post(url: str, **kwargs: Any) -> httpx.Response:
+        raise httpx.ReadTimeout("timed out")
+
+    monkeypatch.setattr("app.services.channel_service.http_clients.post", timing_out_post)
+    monkeypatch.setattr(channel_breakers, "config", CONFIG)
+
+    result = await send_to_channel("http://slow.example.com/webhook", "token", {}, request_timeout=5.0)
+
+    assert not result.success
+    breaker = channel_breakers.get("http://slow.example.com/webhook")
+    assert breaker.failures == 1
+    assert breaker.latency(0.99) == 5.0
+
+
+@pytest.mark.asyncio
+async def test_send_without_breaker(channel_responses: list[int]) -> None:
+    """Тест: запрос мимо предохранителя не проверяет его и не меняет его счётчики"""
+    breaker = channel_breakers.get("http://down.example.com/webhook")
+    breaker.record_failure()
+    breaker.record_failure()
+    channel_responses.extend([503])
+
+    result = await send_to_channel("http://down.example.com/webhook", "token", {}, use_breaker=False)
+
+    assert result.status_code == 503
+    assert breaker.failures == 2
+    assert breaker.rejected == 0
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_fails_fast(channel_responses: list[int]) -> None:
+    """Тест: 5xx размыкают предохранитель, дальше запросы не отправляются, а 4xx его не трогают"""
+    channel_responses.extend([400, 503, 503])
+
+    assert (await send_to_channel("http://down.example.com/webhook", "token", {})).status_code == 400
+    await send_to_channel("http://down.example.com/webhook", "token", {})
+    await send_to_channel("http://down.example.com/webhook", "token", {})
+    result = await send_to_channel("http://down.example.com/webhook", "token", {})
+
+    assert not result.success
+    assert result.status_code is None
+    assert result.retry_after
+    assert channel_responses == []
+    assert channel_breakers.get("http://down.example.com/webhook").state == BreakerState.OPEN
+
+
+@pytest.mark.asyncio
+async def test_outbox_waits_for_open_breaker(channel_responses: list[int]) -> None:
+    """Тест: сообщение в разомкнутый канал откладывается не раньше, чем предохранитель пустит запрос"""
+    channel = Channel(bot_id="bot-123", channel_url="http://down.example.com/webhook", channel_token="token")  # noqa: S106
+    await channel.insert()
+    breaker = channel_breakers.get(channel.channel_url)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    dispatcher = OutboxDispatcher(settings.outbox)
+    await dispatcher.enqueue(channel, {"text": "hi"}, idempotency_key="key-breaker")
+    await dispatcher.run_once()
+
+    message = await OutboxMessage.find_one(OutboxMessage.idempotency_key == "key-breaker")
+    assert message
+    assert message.attempts == 1
+    assert message.last_error == "Circuit breaker is open"
+    delay = message.next_attempt_at - message.created_at
+    assert delay.total_seconds() > 50
+
+
+@pytest.mark.asyncio
+async def test_channel_health(client: AsyncClient, channel_responses: list[int]) -> None:
+    """Тест: состояние канала отдаётся через API"""
+    channel = Channel(bot_id="bot-123", channel_url="http://health.example.com/webhook", channel_token="token")  # noqa: S106
+    await channel.insert()
+    channel_responses.extend([200, 503, 503])
+    for _ in range(3):
+        await send_to_channel(channel.channel_url, channel.channel_token, {})
+
+    response = await client.get(f"/api/channels/{channel.id}/health")
+
+    assert response.status_code == 200
+    health = response.json()
+    assert health["id"] == str(channel.id)
+    assert health["state"] == "open"
+    assert health["successes"] == 1
+    assert health["failures"] == 2
+    assert health["latency_p99"] is not None
+    assert health["retry_after"] > 0
+
+    response = await client.get("/api/channels/507f1f77bcf86cd799439011/health")
+    assert response.status_code == 404
@@ -0,0 +1,124 @@
+from collections.abc import Hashable
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from beanie import PydanticObjectId
+
+from app.services.context_builder import ContextBuilder
+from app.services.reply_worker import reply_pool
+from core.database.models.dialogue import ContextMessage, Dialogue, DialogueMessage, MessageRole
+from core.settings_model import ContextSettings
+from predict.scheduler import LLMScheduler
+
+START = datetime(2025, 1, 1, tzinfo=UTC)
+
+
+async def create_dialogue(texts: list[str]) -> Dialogue:
+    dialogue = Dialogue(chat_bot_id=PydanticObjectId(), chat_id="chat1")
+    await dialogue.insert()
+    await DialogueMessage.insert_many(
+        [
+            DialogueMessage(
+                dialogue_id=dialogue.id,
+                chat_bot_id=dialogue.chat_bot_id,
+                message_id=str(i),
+                chat_id="chat1",
+                text=text,
+                role=MessageRole.USER,
+                timestamp=START + timedelta(seconds=i),
+            )
+            for i, text in enumerate(texts)
+        ],
+    )
+    return dialogue
+
+
+@pytest.fixture(autouse=True)
+def fast_summary(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def fake_summarize(
+        llm: LLMScheduler,
+        bot_id: Hashable,
+        summary: str | None,
+        chat_history: list[ContextMessage],
+    ) -> str:
+        return f"{summary or ''}[{chat_history[0].text}..{chat_history[-1].text}]"
+
+    monkeypatch.setattr("app.services.context_builder.summarize", fake_summarize)
+
+
+@pytest.mark.asyncio
+async def test_context_contains_only_last_messages() -> None:
+    """Тест: в контекст попадают только последние max_messages сообщений"""
+    dialogue = await create_dialogue([f"m{i}" for i in range(30)])
+    builder = ContextBuilder(ContextSettings(max_messages=5, max_tokens=1000, summarize_batch=10))
+
+    context = await builder.build(dialogue)
+
+    assert [m.text for m in context] == ["m25", "m26", "m27", "m28", "m29"]
+
+
+@pytest.mark.asyncio
+async def test_context_respects_token_budget() -> None:
+    """Тест: старые сообщения отбрасываются, если не помещаются в бюджет токенов"""
+    dialogue = await create_dialogue(["a" * 400, "b" * 400, "c" * 40])
+    builder = ContextBuilder(ContextSettings(max_messages=10, max_tokens=120, summarize_batch=10))
+
+    context = await builder.build(dialogue)
+
+    assert [m.text[0] for m in context] == ["b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_summary_is_updated_incrementally() -> None:
+    """Тест: всё, что вышло из окна, сворачивается в summary пачками, без пропусков до хвоста"""
+    dialogue = await create_dialogue([f"m{i}" for i in range(30)])
+    builder = ContextBuilder(ContextSettings(max_messages=5, max_tokens=1000, summarize_batch=10))
+
+    await builder.build(dialogue)
+    await reply_pool.join()
+    await dialogue.sync()
+    assert dialogue.summary == "[m0..m9][m10..m19][m20..m24]"
+
+    await DialogueMessage(
+        dialogue_id=dialogue.id,
+        chat_bot_id=dialogue.chat_bot_id,
+        message_id="30",
+        chat_id="chat1",
+        text="m30",
+        role=MessageRole.USER,
+        timestamp=START + timedelta(seconds=30),
+    ).insert()
+    await builder.build(dialogue)
+    await reply_pool.join()
+    await dialogue.sync()
+    assert dialogue.summary == "[m0..m9][m10..m19][m20..m24][m25..m25]"
+
+    context = await builder.build(dialogue)
+    assert context[0].role == MessageRole.SYSTEM
+    assert context[0].text == "[m0..m9][m10..m19][m20..m24][m25..m25]"
+    assert [m.text for m in context[1:]] == ["m26", "m27", "m28", "m29", "m30"]
+
+
+@pytest.mark.asyncio
+async def test_summary_goes_through_scheduler(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест: summary запрашивается через планировщик LLM от имени бота, с прошлым summary в промпте"""
+    calls: list[tuple[object, list[ContextMessage]]] = []
+
+    async def complete(bot_id: Hashable, prompt: list[ContextMessage]) -> str:
+        calls.append((bot_id, prompt))
+        return "new summary"
+
+    monkeypatch.undo()
+    monkeypatch.setattr("app.services.context_builder.llm.complete", complete)
+    dialogue = await create_dialogue([f"m{i}" for i in range(8)])
+    dialogue.summary = "old summary"
+    builder = ContextBuilder(ContextSettings(max_messages=5, max_tokens=1000, summarize_batch=10))
+
+    await builder.build(dialogue)
+    await reply_pool.join()
+
+    ((bot_id, summary_prompt),) = calls
+    assert bot_id == dialogue.chat_bot_id
+    assert summary_prompt[0].role == MessageRole.SYSTEM
+    assert "old summary" in summary_prompt[0].text
+    assert [m.text for m in summary_prompt[1:]] == ["m0", "m1", "m2"]
@@ -0,0 +1,74 @@
+import pytest
+from pymongo import MongoClient
+
+from core.database import get_client, warm_up
+from core.database.client import client_options
+from core.settings_model import MongoSettings
+
+
+def test_client_options() -> None:
+    """Тест: настройки пула, сжатия и гарантий записи передаются драйверу"""
+    config = MongoSettings(
+        url="mongodb://localhost:27017",
+        db_name="test",
+        max_pool_size=50,
+        min_pool_size=5,
+        wait_queue_timeout=2.5,
+        compressors=["zstd", "zlib"],
+        read_preference="secondaryPreferred",
+        write_concern="majority",
+        write_concern_journal=True,
+    )
+
+    options = client_options(config)
+
+    assert options["maxPoolSize"] == 50
+    assert options["minPoolSize"] == 5
+    assert options["waitQueueTimeoutMS"] == 2500
+    assert options["compressors"] == "zstd,zlib"
+    assert options["readPreference"] == "secondaryPreferred"
+    assert options["w"] == "majority"
+    assert options["journal"] is True
+
+
+def test_client_options_driver_defaults() -> None:
+    """Тест: не заданные параметры не передаются и берутся из URL"""
+    options = client_options(
+        MongoSettings(url="mongodb://localhost:27017/?w=2", db_name="test", wait_queue_timeout=None),
+    )
+
+    assert (
+        not {
+            "maxPoolSize",
+            "minPoolSize",
+            "readPreference",
+            "waitQueueTimeoutMS",
+            "compressors",
+            "w",
+            "journal",
+        }
+        & options.keys()
+    )
+
+
+def test_pool_options_from_url() -> None:
+    """Тест: размер пула и readPreference из URL не перекрываются значениями по умолчанию"""
+    config = MongoSettings(
+        url="mongodb://localhost:27017/?maxPoolSize=7&minPoolSize=2&readPreference=secondary",
+        db_name="test",
+    )
+
+    client: MongoClient = MongoClient(config.url, connect=False, **client_options(config))
+
+    assert client.options.pool_options.max_pool_size == 7
+    assert client.options.pool_options.min_pool_size == 2
+    assert client.read_preference.mongos_mode == "secondary"
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_client() -> None:
+    """Тест: все модели и сервисы используют один клиент, прогрев не ломает его"""
+    assert get_client() is get_client()
+    await warm_up(3)
+    assert await get_client().admin.command("ping")
@@ -0,0 +1,133 @@
+import json
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from beanie import PydanticObjectId
+from fastapi import status
+from httpx import AsyncClient
+
+from core.database.models.dialogue import Dialogue, DialogueMessage, MessageRole
+
+START = datetime(2026, 1, 1, tzinfo=UTC)
+
+
+@pytest.fixture
+async def dialogue() -> Dialogue:
+    """Диалог из 10 сообщений с интервалом в минуту; два последних - в одну и ту же минуту."""
+    dialogue = Dialogue(chat_bot_id=PydanticObjectId(), chat_id="chat-1")
+    await dialogue.insert()
+    await DialogueMessage.insert_many(
+        [
+            DialogueMessage(
+                dialogue_id=dialogue.id,
+                chat_bot_id=dialogue.chat_bot_id,
+                message_id=f"msg-{i}",
+                chat_id=dialogue.chat_id,
+                text=f"text {i}",
+                role=MessageRole.USER if i % 2 == 0 else MessageRole.ASSISTANT,
+                timestamp=START + timedelta(minutes=min(i, 8)),
+            )
+            for i in range(10)
+        ],
+    )
+    return dialogue
+
+
+@pytest.mark.asyncio
+async def test_list_dialogues_by_bot_and_chat(client: AsyncClient, dialogue: Dialogue) -> None:
+    """Тест: диалоги бота фильтруются по чату и листаются курсором"""
+    other = Dialogue(chat_bot_id=dialogue.chat_bot_id, chat_id="chat-2")
+    await other.insert()
+
+    response = await client.get("/api/dialogues/", params={"bot_id": str(dialogue.chat_bot_id), "limit": 1})
+    assert response.status_code == status.HTTP_200_OK
+    assert [item["id"] for item in response.json()] == [str(dialogue.id)]
+
+    response = await client.get(
+        "/api/dialogues/",
+        params={"bot_id": str(dialogue.chat_bot_id), "cursor": response.headers["X-Next-Cursor"]},
+    )
+    assert [item["id"] for item in response.json()] == [str(other.id)]
+    assert "X-Next-Cursor" not in response.headers
+
+    response = await client.get("/api/dialogues/", params={"bot_id": str(dialogue.chat_bot_id), "chat_id": "chat-2"})
+    assert [item["chat_id"] for item in response.json()] == ["chat-2"]
+
+
+@pytest.mark.asyncio
+async def test_get_dialogue(client: AsyncClient, dialogue: Dialogue) -> None:
+    """Тест: диалог по id, несуществующий и некорректный id"""
+    response = await client.get(f"/api/dialogues/{dialogue.id}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["chat_id"] == "chat-1"
+
+    assert (await client.get(f"/api/dialogues/{PydanticObjectId()}")).status_code == status.HTTP_404_NOT_FOUND
+    assert (await client.get("/api/dialogues/not-an-id")).status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_messages_pages_do_not_lose_equal_timestamps(client: AsyncClient, dialogue: Dialogue) -> None:
+    """Тест: постраничное чтение по курсору отдаёт каждое сообщение ровно один раз"""
+    message_ids = []
+    params: dict[str, str | int] = {"limit": 3}
+    while True:
+        response = await client.get(f"/api/dialogues/{dialogue.id}/messages", params=params)
+        assert response.status_code == status.HTTP_200_OK
+        message_ids += [item["message_id"] for item in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert message_ids == [f"msg-{i}" for i in range(10)]
+
+
+@pytest.mark.asyncio
+async def test_messages_time_range_and_order(client: AsyncClient, dialogue: Dialogue) -> None:
+    """Тест: окно [since, until) и обратный порядок"""
+    response = await client.get(
+        f"/api/dialogues/{dialogue.id}/messages",
+        params={
+            "since": (START + timedelta(minutes=2)).isoformat(),
+            "until": (START + timedelta(minutes=5)).isoformat(),
+            "order": "desc",
+        },
+    )
+
+    assert [item["message_id"] for item in response.json()] == ["msg-4", "msg-3", "msg-2"]
+
+
+@pytest.mark.asyncio
+async def test_messages_ndjson_export(client: AsyncClient, dialogue: Dialogue) -> None:
+    """Тест: выгрузка NDJSON отдаёт все сообщения окна без limit"""
+    response = await client.get(f"/api/dialogues/{dialogue.id}/messages", params={"format": "ndjson", "limit": 1})
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["message_id"] for line in lines] == [f"msg-{i}" for i in range(10)]
+    assert set(lines[0]) == {"id", "message_id", "chat_id", "text", "role", "timestamp"}
+
+
+@pytest.mark.asyncio
+async def test_messages_sse_resumes_from_last_event_id(client: AsyncClient, dialogue: Dialogue) -> None:
+    """Тест: SSE продолжает выгрузку с Last-Event-ID после переподключения"""
+    response = await client.get(f"/api/dialogues/{dialogue.id}/messages", params={"format": "sse"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = response.text.strip().split("\n\n")
+    assert len(events) == 11
+    assert events[-1].startswith("event: end")
+    sixth_id = events[5].split("\n")[0].removeprefix("id: ")
+
+    response = await client.get(
+        f"/api/dialogues/{dialogue.id}/messages",
+        params={"format": "sse"},
+        headers={"Last-Event-ID": sixth_id},
+    )
+    data = [json.loads(event.split("data: ")[1]) for event in response.text.strip().split("\n\n")[:-1]]
+    assert [item["message_id"] for item in data] == ["msg-6", "msg-7", "msg-8", "msg-9"]
+
+
+@pytest.mark.asyncio
+async def test_messages_invalid_cursor(client: AsyncClient, dialogue: Dialogue) -> None:
+    """Тест: повреждённый курсор отклоняется до начала ответа"""
+    response = await client.get(f"/api/dialogues/{dialogue.id}/messages", params={"cursor": "broken"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
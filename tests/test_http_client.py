@@ -0,0 +1,62 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from app.services.http_client import HttpClientRegistry, http_clients
+from core import settings
+from src.app.app import app
+
+
+@pytest.mark.asyncio
+async def test_pool_is_shared_per_host() -> None:
+    """Тест: запросы к одному хосту используют общий пул соединений"""
+    registry = HttpClientRegistry(settings.http_client)
+
+    pool = registry.get_pool("http://example.com/webhook")
+    assert registry.get_pool("http://example.com/other") is pool
+    assert registry.get_pool("http://example.com:8080/webhook") is not pool
+    assert registry.get_pool("https://example.com/webhook") is not pool
+
+    await registry.aclose()
+    assert registry.stats() == []
+
+
+@pytest.mark.asyncio
+async def test_pool_timeout_when_all_slots_busy() -> None:
+    """Тест: если все соединения к хосту заняты дольше pool_timeout, запрос падает с PoolTimeout"""
+    config = settings.http_client.model_copy(update={"max_connections_per_host": 1, "pool_timeout": 0.05})
+    release = asyncio.Event()
+
+    async def slow(request: httpx.Request) -> httpx.Response:
+        await release.wait()
+        return httpx.Response(200)
+
+    registry = HttpClientRegistry(config)
+    pool = registry.get_pool("http://slow.example.com/webhook")
+    pool.client = httpx.AsyncClient(transport=httpx.MockTransport(slow))
+
+    busy = asyncio.create_task(registry.post("http://slow.example.com/webhook"))
+    await asyncio.sleep(0)
+    with pytest.raises(httpx.PoolTimeout):
+        await registry.post("http://slow.example.com/webhook")
+    assert pool.stats().waiting == 0
+
+    release.set()
+    assert (await busy).status_code == status.HTTP_200_OK
+    await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_http_pools_stats(client: AsyncClient) -> None:
+    """Тест получения статистики пулов исходящих соединений"""
+    http_clients.get_pool("http://stats.example.com/webhook")
+
+    response = await client.get(app.url_path_for("get_http_pools"))
+    assert response.status_code == status.HTTP_200_OK
+
+    stats = {item["host"]: item for item in response.json()}
+    assert stats["http://stats.example.com"]["in_use"] == 0
+    assert stats["http://stats.example.com"]["max_connections"] == settings.http_client.max_connections_per_host
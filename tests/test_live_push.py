@@ -0,0 +1,152 @@
+import json
+
+import pytest
+from beanie import PydanticObjectId
+from fastapi import status
+from fastapi.testclient import TestClient
+from fastapi.websockets import WebSocketDisconnect
+from httpx import AsyncClient
+
+from app.routers.api.live import sse_events
+from app.services.live_push import LiveEvent, LiveHub, SubscriptionClosedError, live_hub
+from core import settings
+from core.database.models.dialogue import DialogueMessage, MessageRole
+from src.app.app import app
+from tests.conftest import BotWithChannelFactory
+
+CONFIG = settings.live.model_copy(update={"subscriber_queue_size": 2, "max_subscribers": 2})
+
+
+def event(chat_id: str, message_id: str = "1") -> LiveEvent:
+    return LiveEvent(message_id=message_id, chat_id=chat_id, data="{}")
+
+
+@pytest.mark.asyncio
+async def test_saved_messages_are_pushed_to_bot_and_chat_subscribers(
+    client: AsyncClient,
+    create_bot_with_channel: BotWithChannelFactory,
+) -> None:
+    """Тест: сохранённые сообщения приходят подписчикам бота и нужного чата, но не других чатов"""
+    bot, _ = await create_bot_with_channel("live-bot-token")
+    headers = {"Authorization": "Bearer live-bot-token"}
+
+    with (
+        live_hub.subscribe(str(bot.id)) as everything,
+        live_hub.subscribe(str(bot.id), "chat1") as chat1,
+        live_hub.subscribe(str(bot.id), "chat2") as chat2,
+    ):
+        await client.post(
+            app.url_path_for("receive_webhook"),
+            json={"message_id": "m1", "chat_id": "chat1", "text": "hello", "message_sender": "employee"},
+            headers=headers,
+        )
+        await client.post(
+            app.url_path_for("receive_webhook_batch"),
+            json=[{"message_id": "m2", "chat_id": "chat1", "text": "again", "message_sender": "employee"}],
+            headers=headers,
+        )
+
+        received = [await everything.next(0.1), await everything.next(0.1)]
+        assert [item.message_id for item in received if item] == ["m1", "m2"]
+        first = json.loads(received[0].data) if received[0] else {}
+        assert first["chat_id"] == "chat1"
+        assert first["text"] == "hello"
+        assert first["chat_bot_id"] == str(bot.id)
+        assert first["id"]
+
+        assert (await chat1.next(0.1)) is not None
+        assert (await chat2.next(0.01)) is None
+
+    assert live_hub.subscribers == 0
+
+
+def message(bot_id: PydanticObjectId, message_id: str) -> DialogueMessage:
+    return DialogueMessage(
+        id=PydanticObjectId(),
+        dialogue_id=PydanticObjectId(),
+        chat_bot_id=bot_id,
+        message_id=message_id,
+        chat_id="chat",
+        text="text",
+        role=MessageRole.USER,
+    )
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_dropped_after_buffer() -> None:
+    """Тест: переполнивший буфер подписчик отключается, уже буферизованные события он получает"""
+    hub = LiveHub(CONFIG)
+    bot_id = PydanticObjectId()
+    slow = hub.add(str(bot_id))
+    fast = hub.add(str(bot_id))
+
+    for i in range(4):
+        hub.publish(message(bot_id, str(i)))
+        if i < 2:
+            assert await fast.next(0.1) is not None
+
+    assert hub.subscribers == 1
+    assert [(await slow.next(0.1) or event("")).message_id for _ in range(2)] == ["0", "1"]
+    with pytest.raises(SubscriptionClosedError, match="slow consumer"):
+        await slow.next(0.1)
+    assert [(await fast.next(0.1) or event("")).message_id for _ in range(2)] == ["2", "3"]
+
+
+@pytest.mark.asyncio
+async def test_sse_events_format() -> None:
+    """Тест: SSE отдаёт события с id, heartbeat при простое и closed при отключении"""
+    hub = LiveHub(CONFIG)
+    subscription = hub.add("bot", "chat")
+    subscription.offer(LiveEvent(message_id="m1", chat_id="chat", data='{"text": "hi"}'))
+    events = sse_events(subscription, 0.01)
+
+    assert await anext(events) == b'id: m1\nevent: message\ndata: {"text": "hi"}\n\n'
+    assert await anext(events) == b": ping\n\n"
+    subscription.close("shutdown")
+    assert await anext(events) == b'event: closed\ndata: {"reason": "shutdown"}\n\n'
+
+
+@pytest.mark.asyncio
+async def test_too_many_subscribers(client: AsyncClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест: сверх лимита подписка отклоняется с 503"""
+    monkeypatch.setattr(live_hub, "config", CONFIG.model_copy(update={"max_subscribers": 0}))
+
+    response = await client.get("/api/live/messages", params={"bot_id": "bot"})
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+def test_websocket_pushes_messages_and_ignores_client_frames() -> None:
+    """Тест: WebSocket получает сообщения бота, кадры клиента не рвут подписку, отключение её снимает"""
+    bot_id = PydanticObjectId()
+
+    with TestClient(app).websocket_connect(f"/api/live/messages/ws?bot_id={bot_id}") as websocket:
+        websocket.send_text("hello")
+        websocket.portal.call(live_hub.publish, message(bot_id, "m1"))
+
+        assert websocket.receive_json()["message_id"] == "m1"
+        assert live_hub.subscribers == 1
+
+    assert live_hub.subscribers == 0
+
+
+def test_websocket_closed_for_slow_consumer() -> None:
+    """Тест: переполнивший буфер WebSocket подписчик получает закрытие с кодом 1013"""
+    bot_id = PydanticObjectId()
+
+    with TestClient(app).websocket_connect(f"/api/live/messages/ws?bot_id={bot_id}") as websocket:
+
+        def overflow() -> None:
+            # Синхронно, без переключений: обработчик не успевает ничего забрать из буфера
+            for i in range(settings.live.subscriber_queue_size + 1):
+                live_hub.publish(message(bot_id, str(i)))
+
+        websocket.portal.call(overflow)
+
+        received = [websocket.receive_json()["message_id"] for _ in range(settings.live.subscriber_queue_size)]
+        assert received[0] == "0"
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+        assert closed.value.code == status.WS_1013_TRY_AGAIN_LATER
+
+    assert live_hub.subscribers == 0
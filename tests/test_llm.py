@@ -0,0 +1,145 @@
+import asyncio
+import json
+import time
+from datetime import UTC, datetime
+from typing import Any
+
+import pytest
+from httpx import ASGITransport, AsyncClient, MockTransport, Request, Response
+
+from core.database.models import ContextMessage, MessageRole
+from core.settings_model import LLMSettings
+from predict.backends import LLMBackend, OpenAICompatibleBackend
+from predict.scheduler import LLMScheduler, TokenBucket
+from predict.stub_server import create_app
+
+
+def prompt(text: str) -> list[ContextMessage]:
+    return [ContextMessage(role=MessageRole.USER, text=text, timestamp=datetime.now(UTC))]
+
+
+class RecordingBackend(LLMBackend):
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.calls: list[int] = []
+        self.active = 0
+        self.max_active = 0
+
+    async def generate(self, prompts: list[list[ContextMessage]]) -> list[str]:
+        self.calls.append(len(prompts))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        return [f"re: {p[-1].text}" for p in prompts]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_batches_concurrent_prompts() -> None:
+    """Тест: одновременные запросы уходят к провайдеру одной пачкой, ответы не путаются"""
+    backend = RecordingBackend()
+    scheduler = LLMScheduler(backend, LLMSettings(max_batch_size=8, batch_wait=0.05))
+
+    responses = await asyncio.gather(*(scheduler.complete(f"bot{i}", prompt(str(i))) for i in range(10)))
+    await scheduler.aclose()
+
+    assert responses == [f"re: {i}" for i in range(10)]
+    assert backend.calls == [8, 2]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_unbatched_backend_gets_one_prompt_per_call() -> None:
+    """Тест: провайдер без пакетного режима получает промпты по одному, лимиты и ошибки - на каждый запрос"""
+
+    class SingleBackend(RecordingBackend):
+        batching = False
+
+        async def generate(self, prompts: list[list[ContextMessage]]) -> list[str]:
+            if prompts[0][-1].text == "bad":
+                raise RuntimeError("upstream error")
+            return await super().generate(prompts)
+
+    backend = SingleBackend(delay=0.01)
+    scheduler = LLMScheduler(backend, LLMSettings(max_batch_size=8, max_concurrency=2, batch_wait=0.05))
+
+    responses = await asyncio.gather(
+        *(scheduler.complete(f"bot{i}", prompt(text)) for i, text in enumerate(["0", "bad", "2", "3"])),
+        return_exceptions=True,
+    )
+    await scheduler.aclose()
+
+    assert responses[0] == "re: 0"
+    assert isinstance(responses[1], RuntimeError)
+    assert responses[2:] == ["re: 2", "re: 3"]
+    assert backend.calls == [1, 1, 1]
+    assert backend.max_active == 2
+
+
+@pytest.mark.asyncio
+async def test_scheduler_per_bot_concurrency() -> None:
+    """Тест: одновременно у провайдера не больше per_bot_concurrency запросов одного бота"""
+    backend = RecordingBackend(delay=0.01)
+    scheduler = LLMScheduler(backend, LLMSettings(per_bot_concurrency=1, batch_wait=0.01))
+
+    await asyncio.gather(*(scheduler.complete("bot", prompt(str(i))) for i in range(3)))
+    await scheduler.aclose()
+
+    assert backend.calls == [1, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_global_concurrency() -> None:
+    """Тест: число одновременных вызовов провайдера ограничено max_concurrency"""
+    backend = RecordingBackend(delay=0.02)
+    scheduler = LLMScheduler(backend, LLMSettings(max_concurrency=1, max_batch_size=1, batch_wait=0))
+
+    await asyncio.gather(*(scheduler.complete(f"bot{i}", prompt(str(i))) for i in range(3)))
+    await scheduler.aclose()
+
+    assert backend.max_active == 1
+
+
+@pytest.mark.asyncio
+async def test_token_bucket() -> None:
+    """Тест: после исчерпания запаса токены выдаются с заданной частотой"""
+    bucket = TokenBucket(rate=50, capacity=2)
+
+    started = time.monotonic()
+    for _ in range(4):
+        await bucket.acquire()
+
+    assert time.monotonic() - started >= 0.035
+
+
+@pytest.mark.asyncio
+async def test_openai_backend_with_stub_server() -> None:
+    """Тест: бэкенд работает с OpenAI-совместимым сервером пачкой и потоком"""
+    async with AsyncClient(transport=ASGITransport(app=create_app()), base_url="http://stub") as http:
+        backend = OpenAICompatibleBackend(http, base_url="http://stub/v1", model="stub")
+
+        assert await backend.generate([prompt("a"), prompt("b")]) == ["New message from llm"] * 2
+        assert [chunk async for chunk in backend.stream(prompt("a"))] == ["New ", "message ", "from ", "llm"]
+
+        stats = (await http.get("/stats")).json()
+        assert stats == {"requests": 3, "prompts": 3}
+
+
+@pytest.mark.asyncio
+async def test_openai_backend_sends_roles_to_chat_completions() -> None:
+    """Тест: промпты пачки уходят в /chat/completions отдельными запросами с ролями сообщений"""
+    requests: list[dict[str, Any]] = []
+
+    def handler(request: Request) -> Response:
+        body = json.loads(request.content)
+        requests.append({"path": request.url.path, **body})
+        answer = body["messages"][-1]["content"]
+        return Response(200, json={"choices": [{"index": 0, "message": {"role": "assistant", "content": answer}}]})
+
+    async with AsyncClient(transport=MockTransport(handler)) as http:
+        backend = OpenAICompatibleBackend(http, base_url="http://stub/v1", model="stub")
+        system = ContextMessage(role=MessageRole.SYSTEM, text="summary", timestamp=datetime.now(UTC))
+
+        assert await backend.generate([[system, *prompt("a")], prompt("b")]) == ["a", "b"]
+
+    assert {request["path"] for request in requests} == {"/v1/chat/completions"}
+    assert sorted(request["messages"][0]["role"] for request in requests) == ["system", "user"]
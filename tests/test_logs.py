@@ -0,0 +1,79 @@
+import io
+import json
+import logging
+from collections.abc import Iterator
+
+import pytest
+from httpx import AsyncClient
+from loguru import logger
+
+from core.logs import BackgroundWriter, UvicornHandler, configure_logger
+from core.settings_model import LogSettings
+
+
+@pytest.fixture
+def log_output() -> Iterator[io.StringIO]:
+    output = io.StringIO()
+    configure_logger(LogSettings(format="json", enqueue=False), sink=output)
+    yield output
+    configure_logger(LogSettings(enqueue=False))
+
+
+def access_record(path: str) -> logging.LogRecord:
+    return logging.LogRecord(
+        "uvicorn.access",
+        logging.INFO,
+        __file__,
+        0,
+        '%s - "%s %s HTTP/%s" %d',
+        ("127.0.0.1:5000", "GET", path, "1.1", 200),
+        None,
+    )
+
+
+def test_json_access_log(log_output: io.StringIO) -> None:
+    """Тест: строка access-лога пишется в JSON с уровнем REQUEST и request_id"""
+    with logger.contextualize(request_id="req-1"):
+        UvicornHandler().emit(access_record("/api/hello_world"))
+
+    line = json.loads(log_output.getvalue())
+    assert line["level"] == "REQUEST"
+    assert line["logger"] == "uvicorn.access"
+    assert line["request_id"] == "req-1"
+    assert line["message"] == '127.0.0.1:5000 - "GET /api/hello_world HTTP/1.1" 200'
+
+
+def test_access_log_sampling(log_output: io.StringIO) -> None:
+    """Тест: при sample_rate=0 строки access-лога не пишутся, остальные логи uvicorn - пишутся"""
+    handler = UvicornHandler(sample_rate=0.0)
+    handler.emit(access_record("/"))
+    handler.emit(logging.LogRecord("uvicorn.error", logging.WARNING, __file__, 0, "warning", (), None))
+
+    lines = [json.loads(line) for line in log_output.getvalue().splitlines()]
+    assert [line["level"] for line in lines] == ["WARNING"]
+
+
+def test_background_writer() -> None:
+    """Тест: фоновый writer дописывает очередь, а переполнение не блокирует запись"""
+    output = io.StringIO()
+    writer = BackgroundWriter(output, queue_size=10)
+    for i in range(5):
+        writer.write(f"line {i}\n")
+    writer.join()
+    assert output.getvalue() == "".join(f"line {i}\n" for i in range(5))
+    writer.stop()
+
+    # Поток остановлен, очередь никто не читает: лишние строки отбрасываются
+    for i in range(20):
+        writer.write(f"extra {i}\n")
+    assert writer.dropped == 10
+
+
+@pytest.mark.asyncio
+async def test_request_id_header(client: AsyncClient) -> None:
+    """Тест: request_id берётся из заголовка запроса или генерируется и возвращается в ответе"""
+    response = await client.get("/api/hello_world", headers={"X-Request-ID": "abc-123"})
+    assert response.headers["X-Request-ID"] == "abc-123"
+
+    response = await client.get("/api/hello_world")
+    assert len(response.headers["X-Request-ID"]) == 32
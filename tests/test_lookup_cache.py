@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from app.services.lookup_cache import AsyncLoadingCache, LookupCache, lookup_cache
+from core import settings
+from core.database.models.channel import Channel
+from core.database.models.chat_bot import ChatBot
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_load_once() -> None:
+    """Тест: параллельные промахи по одному ключу вызывают одну загрузку"""
+    cache: AsyncLoadingCache[str, str] = AsyncLoadingCache(max_size=10, ttl=60)
+    calls = 0
+
+    async def loader() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*(cache.get("key", loader) for _ in range(10)))
+
+    assert results == ["value"] * 10
+    assert calls == 1
+    assert await cache.get("key", loader) == "value"
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_channel_cache_invalidated_on_update(client: AsyncClient) -> None:
+    """Тест: изменение канала через API сбрасывает закэшированные каналы бота"""
+    channel = Channel(
+        bot_id="cached-bot",
+        channel_url="http://old.example.com/",
+        channel_token="token123",  # noqa: S106
+    )
+    await channel.insert()
+    cached = await lookup_cache.get_channels("cached-bot")
+    assert [c.id for c in cached] == [channel.id]
+
+    response = await client.patch(
+        f"/api/channels/{channel.id}",
+        json={"channel_url": "http://new.example.com/", "bot_id": "other-bot"},
+    )
+    assert response.status_code == 200
+
+    assert await lookup_cache.get_channels("cached-bot") == []
+    moved = await lookup_cache.get_channels("other-bot")
+    assert [c.channel_url for c in moved] == ["http://new.example.com/"]
+
+
+@pytest.mark.asyncio
+async def test_reverse_links_are_bounded() -> None:
+    """Тест: обратные ссылки для инвалидации ограничены тем же размером, что и кэш"""
+    cache = LookupCache(settings.lookup_cache.model_copy(update={"max_size": 2}))
+    for i in range(5):
+        bot = ChatBot(name="Bounded Bot", secret_token=f"bounded-token-{i}")
+        await bot.insert()
+        await Channel(bot_id=str(bot.id), channel_url="http://example.com/", channel_token="token123").insert()  # noqa: S106
+        await cache.get_bot(f"bounded-token-{i}")
+        await cache.get_channels(str(bot.id))
+
+    assert len(cache._bot_tokens) == 2
+    assert len(cache._channel_bots) == 2
+
+    cache.invalidate_bot(str(bot.id))
+    assert cache.bots.stats().size == 1
+
+
+@pytest.mark.asyncio
+async def test_moved_channel_invalidates_previous_bot_without_reverse_link(client: AsyncClient) -> None:
+    """Тест: перенос канала к другому боту сбрасывает кэш прежнего бота, даже если обратная ссылка истекла"""
+    channel = Channel(bot_id="old-bot", channel_url="http://example.com/", channel_token="token123")  # noqa: S106
+    await channel.insert()
+    assert len(await lookup_cache.get_channels("old-bot")) == 1
+    lookup_cache._channel_bots.clear()
+
+    response = await client.patch(
+        f"/api/channels/{channel.id}",
+        json={"channel_url": "http://example.com/", "bot_id": "new-bot"},
+    )
+    assert response.status_code == 200
+
+    assert await lookup_cache.get_channels("old-bot") == []
@@ -0,0 +1,101 @@
+import re
+from datetime import timedelta
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+from pymongo import monitoring
+
+from app.services import metrics
+from app.services.llm import llm
+from app.services.reply_worker import reply_pool
+from core.database.models.channel import Channel
+from core.database.models.chat_bot import ChatBot
+from core.database.monitoring import CommandMetrics, command_seconds
+from core.metrics import Counter, Histogram, Registry
+from predict.backends import MockBackend
+from src.app.app import app
+
+
+def sample(text: str, name: str) -> float:
+    match = re.search(rf"^{re.escape(name)} (\S+)$", text, re.MULTILINE)
+    assert match, f"{name} not found"
+    return float(match.group(1))
+
+
+def test_histogram_render() -> None:
+    """Тест: гистограмма отдаётся накопительными корзинами в формате Prometheus"""
+    registry = Registry()
+    histogram = registry.register(Histogram("stage_seconds", "Stage duration", ("stage",), buckets=(0.1, 1.0)))
+    counter = registry.register(Counter("events", "Events"))
+    histogram.labels("llm").observe(0.05)
+    histogram.labels("llm").observe(0.5)
+    histogram.labels("llm").observe(5)
+    counter.inc(2)
+
+    text = registry.render()
+
+    assert "# TYPE stage_seconds histogram" in text
+    assert sample(text, 'stage_seconds_bucket{stage="llm",le="0.1"}') == 1
+    assert sample(text, 'stage_seconds_bucket{stage="llm",le="1"}') == 2
+    assert sample(text, 'stage_seconds_bucket{stage="llm",le="+Inf"}') == 3
+    assert sample(text, 'stage_seconds_count{stage="llm"}') == 3
+    assert sample(text, 'stage_seconds_sum{stage="llm"}') == 5.55
+    assert sample(text, "events_total") == 2
+
+
+def test_metric_labels_checked() -> None:
+    """Тест: число меток должно совпадать с объявленным"""
+    with pytest.raises(ValueError, match="expects labels"):
+        Histogram("stage_seconds", "Stage duration", ("stage",)).labels()
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client: AsyncClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест: обработка вебхука отражается в /metrics"""
+    monkeypatch.setattr(llm, "backend", MockBackend(min_delay=0, max_delay=0))
+    bot = ChatBot(name="Metrics Bot", secret_token="metrics-bot-token")  # noqa: S106
+    await bot.insert()
+    await Channel(
+        bot_id=str(bot.id),
+        channel_url="http://example.com/webhook",
+        channel_token="chan-token",  # noqa: S106
+    ).insert()
+    llm_calls = metrics.llm_seconds.count
+    duplicates = metrics.duplicate_messages.labels().value
+
+    payload = {"message_id": "m1", "chat_id": "chat1", "text": "hi", "message_sender": "customer"}
+    headers = {"Authorization": "Bearer metrics-bot-token"}
+    assert (await client.post(app.url_path_for("receive_webhook"), json=payload, headers=headers)).status_code == 202
+    assert (await client.post(app.url_path_for("receive_webhook"), json=payload, headers=headers)).status_code == 409
+    await reply_pool.join()
+
+    response = await client.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert sample(text, 'webhook_stage_seconds_count{stage="llm"}') == llm_calls + 1
+    assert sample(text, "webhook_duplicate_messages_total") == duplicates + 1
+    assert sample(text, "reply_queue_depth") == 0
+    for stage in ("bot_lookup", "channel_lookup", "dialogue_load", "save", "context"):
+        assert f'webhook_stage_seconds_count{{stage="{stage}"}}' in text
+
+
+def test_mongo_command_metrics() -> None:
+    """Тест: задержка команд Mongo учитывается по коллекции, getMore - по коллекции курсора"""
+    listener = CommandMetrics()
+    address = ("localhost", 27017)
+    find = command_seconds.labels("dialogues", "find")
+    get_more = command_seconds.labels("dialogues", "getMore")
+    finds, get_mores = find.count, get_more.count
+
+    listener.started(monitoring.CommandStartedEvent({"find": "dialogues"}, "db", 1, address, 1))
+    listener.succeeded(monitoring.CommandSucceededEvent(timedelta(milliseconds=3), {}, "find", 1, address, 1))
+    listener.started(
+        monitoring.CommandStartedEvent({"getMore": 42, "collection": "dialogues"}, "db", 2, address, 2),
+    )
+    listener.succeeded(monitoring.CommandSucceededEvent(timedelta(milliseconds=1), {}, "getMore", 2, address, 2))
+
+    assert find.count == finds + 1
+    assert get_more.count == get_mores + 1
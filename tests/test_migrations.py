@@ -0,0 +1,126 @@
+from datetime import UTC, datetime
+
+import pytest
+from beanie import PydanticObjectId
+
+from core import settings
+from core.database import get_client, initialize_database
+from core.database.migrations.dedupe_bot_tokens import dedupe_bot_tokens
+from core.database.migrations.merge_duplicate_dialogues import merge_duplicate_dialogues
+from core.database.migrations.split_message_list import MessageIdConflictError, split_message_list
+from core.database.models.chat_bot import ChatBot
+from core.database.models.dialogue import Dialogue, DialogueMessage, MessageRole
+
+
+@pytest.mark.asyncio
+async def test_split_message_list() -> None:
+    """Тест переноса встроенного списка сообщений в отдельную коллекцию"""
+    sent_at = datetime(2025, 1, 1, tzinfo=UTC)
+    result = await Dialogue.get_motor_collection().insert_one(
+        {
+            "chat_bot_id": PydanticObjectId(),
+            "chat_id": "chat1",
+            "created_at": sent_at,
+            "updated_at": sent_at,
+            "message_list": [
+                {"message_id": "1", "chat_id": "chat1", "text": "hi", "role": "user", "timestamp": sent_at},
+                {"message_id": "1-bot", "chat_id": "chat1", "text": "hello", "role": "assistant", "timestamp": sent_at},
+            ],
+        },
+    )
+
+    assert await split_message_list() == 1
+    # Повторный запуск ничего не делает
+    assert await split_message_list() == 0
+
+    messages = await DialogueMessage.find(DialogueMessage.dialogue_id == result.inserted_id).to_list()
+    assert [(m.message_id, m.role) for m in messages] == [("1", MessageRole.USER), ("1-bot", MessageRole.ASSISTANT)]
+
+    raw = await Dialogue.get_motor_collection().find_one({"_id": result.inserted_id})
+    assert raw
+    assert "message_list" not in raw
+
+
+@pytest.mark.asyncio
+async def test_split_message_list_keeps_conflicting_dialogue() -> None:
+    """Тест: диалог с message_id, занятым в другом чате бота, не теряет сообщения"""
+    bot_id = PydanticObjectId()
+    sent_at = datetime(2025, 1, 1, tzinfo=UTC)
+    dialogue_ids = []
+    for chat_id in ("chat1", "chat2"):
+        result = await Dialogue.get_motor_collection().insert_one(
+            {
+                "chat_bot_id": bot_id,
+                "chat_id": chat_id,
+                "created_at": sent_at,
+                "updated_at": sent_at,
+                "message_list": [
+                    {"message_id": "1", "chat_id": chat_id, "text": "hi", "role": "user", "timestamp": sent_at},
+                ],
+            },
+        )
+        dialogue_ids.append(result.inserted_id)
+
+    with pytest.raises(MessageIdConflictError):
+        await split_message_list()
+
+    raw = await Dialogue.get_motor_collection().find_one({"_id": dialogue_ids[1]})
+    assert raw
+    assert raw["message_list"][0]["text"] == "hi"
+    assert await DialogueMessage.find(DialogueMessage.dialogue_id == dialogue_ids[0]).count() == 1
+
+
+@pytest.mark.asyncio
+async def test_merge_duplicate_dialogues() -> None:
+    """Тест: дубли диалога сливаются в самый ранний, после чего уникальный индекс строится"""
+    collection = Dialogue.get_motor_collection()
+    await collection.drop_index("chat_bot_id_1_chat_id_1")
+    bot_id = PydanticObjectId()
+    dialogue_ids = []
+    for day in (1, 2, 3):
+        created_at = datetime(2025, 1, day, tzinfo=UTC)
+        result = await collection.insert_one(
+            {"chat_bot_id": bot_id, "chat_id": "chat1", "created_at": created_at, "updated_at": created_at},
+        )
+        dialogue_ids.append(result.inserted_id)
+        await DialogueMessage(
+            dialogue_id=result.inserted_id,
+            chat_bot_id=bot_id,
+            message_id=str(day),
+            chat_id="chat1",
+            text="hi",
+            role=MessageRole.USER,
+        ).insert()
+    await collection.update_one({"_id": dialogue_ids[0]}, {"$set": {"summary": "partial", "summary_until": created_at}})
+
+    assert await merge_duplicate_dialogues(get_client().get_database(settings.mongo.db_name)) == 2
+    assert await merge_duplicate_dialogues(get_client().get_database(settings.mongo.db_name)) == 0
+
+    (dialogue,) = await Dialogue.find(Dialogue.chat_bot_id == bot_id).to_list()
+    assert dialogue.id == dialogue_ids[0]
+    assert dialogue.summary is None
+    assert dialogue.updated_at.replace(tzinfo=UTC) == datetime(2025, 1, 3, tzinfo=UTC)
+    assert await DialogueMessage.find(DialogueMessage.dialogue_id == dialogue.id).count() == 3
+    await initialize_database()
+
+
+@pytest.mark.asyncio
+async def test_dedupe_bot_tokens() -> None:
+    """Тест: токен остаётся у самого раннего бота, остальные получают новые"""
+    collection = ChatBot.get_motor_collection()
+    assert collection.name == ChatBot.__name__
+    await collection.drop_index("secret_token_1")
+    first, second = (ChatBot(name=name, secret_token="shared-token") for name in ("first", "second"))  # noqa: S106
+    await collection.insert_many([first.model_dump(exclude={"id"}), second.model_dump(exclude={"id"})])
+    first_id, second_id = [document["_id"] async for document in collection.find().sort("_id")]
+
+    assert await dedupe_bot_tokens(get_client().get_database(settings.mongo.db_name)) == [str(second_id)]
+    assert await dedupe_bot_tokens(get_client().get_database(settings.mongo.db_name)) == []
+
+    kept = await ChatBot.get(first_id)
+    rotated = await ChatBot.get(second_id)
+    assert kept
+    assert rotated
+    assert kept.secret_token == "shared-token"  # noqa: S105
+    assert rotated.secret_token != "shared-token"  # noqa: S105
+    await initialize_database()
@@ -0,0 +1,187 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import pytest
+
+from app.services.channel_service import DeliveryResult
+from app.services.outbox import OutboxDispatcher
+from core import settings
+from core.database.models.channel import Channel
+from core.database.models.outbox import DeadLetterMessage, OutboxMessage
+
+
+@pytest.fixture
+async def channel() -> Channel:
+    channel = Channel(
+        bot_id="bot-123",
+        channel_url="http://example.com/webhook",
+        channel_token="chan-token",  # noqa: S106
+    )
+    await channel.insert()
+    return channel
+
+
+@pytest.fixture
+def failing_channel(monkeypatch: pytest.MonkeyPatch) -> list[str | None]:
+    keys: list[str | None] = []
+
+    async def fake_send_to_channel(url: str, token: str, payload: dict[str, Any], **kwargs: Any) -> DeliveryResult:
+        keys.append(kwargs.get("idempotency_key"))
+        return DeliveryResult(success=False, status_code=503, error="unavailable")
+
+    monkeypatch.setattr("app.services.outbox.send_to_channel", fake_send_to_channel)
+    return keys
+
+
+@pytest.mark.asyncio
+async def test_enqueue_is_idempotent(channel: Channel) -> None:
+    """Тест: повторная постановка сообщения с тем же ключом не создаёт дубль"""
+    dispatcher = OutboxDispatcher(settings.outbox)
+
+    await dispatcher.enqueue(channel, {"text": "hi"}, idempotency_key="key-1")
+    await dispatcher.enqueue(channel, {"text": "hi"}, idempotency_key="key-1")
+
+    assert await OutboxMessage.find_all().count() == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_delivery_is_retried_later(channel: Channel, failing_channel: list[str | None]) -> None:
+    """Тест: неудачная доставка откладывается с экспоненциальной задержкой"""
+    dispatcher = OutboxDispatcher(settings.outbox)
+    await dispatcher.enqueue(channel, {"text": "hi"}, idempotency_key="key-2")
+
+    assert await dispatcher.run_once() == 1
+    assert failing_channel == ["key-2"]
+
+    message = await OutboxMessage.find_one(OutboxMessage.idempotency_key == "key-2")
+    assert message
+    assert message.attempts == 1
+    assert message.last_error == "unavailable"
+    assert message.locked_until is None
+    assert message.next_attempt_at.replace(tzinfo=UTC) > datetime.now(UTC)
+
+    assert await dispatcher.run_once() == 0
+
+
+@pytest.mark.asyncio
+async def test_delivered_message_kept_when_lease_was_taken_over(
+    channel: Channel,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Тест: если аренда истекла и сообщение забрал другой воркер, первый не удаляет его чужую аренду"""
+    dispatcher = OutboxDispatcher(settings.outbox)
+    await dispatcher.enqueue(channel, {"text": "hi"}, idempotency_key="key-lease")
+    (message,) = await dispatcher.claim_batch()
+
+    async def delivered_after_lease(url: str, token: str, payload: dict[str, Any], **kwargs: Any) -> DeliveryResult:
+        await OutboxMessage.find_one(OutboxMessage.id == message.id).update({"$set": {"lock_id": "other-worker"}})
+        return DeliveryResult(success=True, status_code=200)
+
+    monkeypatch.setattr("app.services.outbox.send_to_channel", delivered_after_lease)
+    await dispatcher.process(message)
+
+    stored = await OutboxMessage.find_one(OutboxMessage.idempotency_key == "key-lease")
+    assert stored
+    assert stored.lock_id == "other-worker"
+
+
+@pytest.mark.asyncio
+async def test_failure_does_not_touch_message_taken_over(channel: Channel, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест: неудача после потери аренды не сбрасывает чужую аренду и не уводит сообщение в dead letters"""
+    await OutboxDispatcher(settings.outbox).enqueue(channel, {"text": "hi"}, idempotency_key="key-lost")
+
+    async def failed_after_lease(url: str, token: str, payload: dict[str, Any], **kwargs: Any) -> DeliveryResult:
+        await OutboxMessage.find_one(OutboxMessage.idempotency_key == "key-lost").update(
+            {"$set": {"lock_id": "other-worker"}},
+        )
+        return DeliveryResult(success=False, status_code=503, error="unavailable")
+
+    monkeypatch.setattr("app.services.outbox.send_to_channel", failed_after_lease)
+    # Обычная повторная попытка и последняя, после которой сообщение ушло бы в dead letters
+    for max_attempts in (5, 1):
+        dispatcher = OutboxDispatcher(settings.outbox.model_copy(update={"max_attempts": max_attempts}))
+        (message,) = await dispatcher.claim_batch()
+        await dispatcher.process(message)
+
+        stored = await OutboxMessage.find_one(OutboxMessage.idempotency_key == "key-lost")
+        assert stored
+        assert stored.lock_id == "other-worker"
+        assert stored.attempts == 0
+        await stored.set({OutboxMessage.lock_id: None, OutboxMessage.locked_until: None})
+
+    assert await DeadLetterMessage.find_all().count() == 0
+
+
+@pytest.mark.asyncio
+async def test_exhausted_message_moved_to_dead_letters(channel: Channel, failing_channel: list[str | None]) -> None:
+    """Тест: после исчерпания попыток сообщение переносится в dead letters"""
+    dispatcher = OutboxDispatcher(settings.outbox.model_copy(update={"max_attempts": 1}))
+    await dispatcher.enqueue(channel, {"text": "hi"}, idempotency_key="key-3")
+
+    await dispatcher.run_once()
+
+    assert await OutboxMessage.find_all().count() == 0
+    dead_letter = await DeadLetterMessage.find_one(DeadLetterMessage.idempotency_key == "key-3")
+    assert dead_letter
+    assert dead_letter.attempts == 1
+    assert dead_letter.payload == {"text": "hi"}
+
+
+@pytest.mark.asyncio
+async def test_slow_channel_does_not_block_others(channel: Channel, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест: пока медленный канал отвечает, сообщения в другие каналы доставляются и записываются"""
+    slow_started = asyncio.Event()
+    release_slow = asyncio.Event()
+    timeouts: dict[str, float | None] = {}
+
+    async def fake_send_to_channel(url: str, token: str, payload: dict[str, Any], **kwargs: Any) -> DeliveryResult:
+        timeouts[url] = kwargs.get("request_timeout")
+        if url == "http://crm.example.com/":
+            slow_started.set()
+            await release_slow.wait()
+        return DeliveryResult(success=True, status_code=200)
+
+    monkeypatch.setattr("app.services.outbox.send_to_channel", fake_send_to_channel)
+    crm = Channel(
+        bot_id="bot-123",
+        channel_url="http://crm.example.com/",
+        channel_token="crm-token",  # noqa: S106
+        fanout=True,
+        delivery_timeout=10.0,
+    )
+    await crm.insert()
+    dispatcher = OutboxDispatcher(settings.outbox.model_copy(update={"poll_interval": 0.01}))
+    await dispatcher.enqueue_many([crm, channel], {"text": "first"}, message_key="m1")
+
+    dispatcher.start()
+    try:
+        await asyncio.wait_for(slow_started.wait(), 5)
+        # Новое сообщение в быстрый канал доставляется, пока CRM ещё не ответила
+        await dispatcher.enqueue(channel, {"text": "second"}, idempotency_key="fast-2")
+        for _ in range(100):
+            remaining = {m.idempotency_key for m in await OutboxMessage.find_all().to_list()}
+            if remaining == {f"{crm.id}:m1"}:
+                break
+            await asyncio.sleep(0.01)
+        assert remaining == {f"{crm.id}:m1"}
+    finally:
+        release_slow.set()
+        await dispatcher.stop(drain_timeout=5)
+
+    assert await OutboxMessage.find_all().count() == 0
+    assert timeouts == {"http://crm.example.com/": 10.0, "http://example.com/webhook": None}
+
+
+@pytest.mark.asyncio
+async def test_dead_letter_expires_when_ttl_is_set(channel: Channel, failing_channel: list[str | None]) -> None:
+    """Тест: с dead_letter_ttl_days dead letter получает срок хранения для TTL индекса"""
+    dispatcher = OutboxDispatcher(settings.outbox.model_copy(update={"max_attempts": 1, "dead_letter_ttl_days": 7}))
+    await dispatcher.enqueue(channel, {"text": "hi"}, idempotency_key="key-ttl")
+
+    await dispatcher.run_once()
+
+    dead_letter = await DeadLetterMessage.find_one(DeadLetterMessage.idempotency_key == "key-ttl")
+    assert dead_letter
+    assert dead_letter.expires_at
+    assert dead_letter.expires_at.replace(tzinfo=UTC) > datetime.now(UTC) + timedelta(days=6)
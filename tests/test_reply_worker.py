@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from app.services.chat_lock import ChatLock
+from app.services.reply_worker import ReplyJob, ReplyWorkerPool
+
+
+@pytest.mark.asyncio
+async def test_lane_runs_jobs_in_order_and_lanes_in_parallel() -> None:
+    """Тест: задачи одного чата выполняются по очереди, разных чатов - параллельно"""
+    pool = ReplyWorkerPool(concurrency=4, queue_size=10)
+    events: list[str] = []
+    running: set[str] = set()
+    max_parallel = 0
+
+    def job(lane: str, name: str) -> ReplyJob:
+        async def run() -> None:
+            nonlocal max_parallel
+            assert lane not in running
+            running.add(lane)
+            max_parallel = max(max_parallel, len(running))
+            await asyncio.sleep(0.01)
+            events.append(name)
+            running.discard(lane)
+
+        return run
+
+    for lane, name in [("a", "a1"), ("b", "b1"), ("a", "a2"), ("b", "b2"), ("a", "a3")]:
+        with pool.reserve() as slot:
+            slot.submit(job(lane, name), lane=lane)
+    await pool.join()
+    await pool.stop(drain_timeout=1)
+
+    assert [e for e in events if e.startswith("a")] == ["a1", "a2", "a3"]
+    assert [e for e in events if e.startswith("b")] == ["b1", "b2"]
+    assert max_parallel == 2
+
+
+@pytest.mark.asyncio
+async def test_pending_jobs_are_coalesced() -> None:
+    """Тест: серия задач одного чата сворачивается в одну ожидающую задачу"""
+    pool = ReplyWorkerPool(concurrency=1, queue_size=10)
+    started = asyncio.Event()
+    release = asyncio.Event()
+    done: list[int] = []
+
+    async def blocking() -> None:
+        started.set()
+        await release.wait()
+        done.append(0)
+
+    def job(n: int) -> ReplyJob:
+        async def run() -> None:
+            done.append(n)
+
+        return run
+
+    with pool.reserve() as slot:
+        slot.submit(blocking, lane="chat", coalesce=True)
+    await started.wait()
+    for n in (1, 2, 3):
+        with pool.reserve() as slot:
+            slot.submit(job(n), lane="chat", coalesce=True)
+
+    assert pool.depth == 1
+    release.set()
+    await pool.join()
+    await pool.stop(drain_timeout=1)
+
+    assert done == [0, 3]
+    assert pool.coalesced == 2
+
+
+@pytest.mark.asyncio
+async def test_chat_lock_is_exclusive() -> None:
+    """Тест: аренду чата может держать только один воркер"""
+    first, second = ChatLock(ttl=60), ChatLock(ttl=60)
+
+    assert await first.acquire("bot:chat")
+    assert not await second.acquire("bot:chat")
+    assert await first.acquire("bot:chat")
+
+    await first.release("bot:chat")
+    assert await second.acquire("bot:chat")
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import UTC, datetime
+
+import pytest
+
+from app.services.response_cache import ResponseCache, cache_key
+from core.database.models import CachedResponse, ContextMessage, MessageRole
+from core.database.models.chat_bot import ChatBot, ResponseCacheConfig
+from core.settings_model import ResponseCacheSettings
+
+
+def context(*texts: str) -> list[ContextMessage]:
+    return [ContextMessage(role=MessageRole.USER, text=text, timestamp=datetime.now(UTC)) for text in texts]
+
+
+async def create_bot(enabled: bool = True, context_messages: int | None = None) -> ChatBot:
+    bot = ChatBot(
+        name="Cache Bot",
+        secret_token="cache-bot-token",  # noqa: S106
+        response_cache=ResponseCacheConfig(enabled=enabled, context_messages=context_messages),
+    )
+    await bot.insert()
+    return bot
+
+
+class Generator:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return f"answer {self.calls}"
+
+
+@pytest.mark.asyncio
+async def test_cache_disabled_by_default() -> None:
+    """Тест: без включения в настройках бота кэш не используется"""
+    bot = await create_bot(enabled=False)
+    cache = ResponseCache(ResponseCacheSettings())
+    generate = Generator()
+
+    await cache.get_or_generate(bot, context("hi"), generate)
+    await cache.get_or_generate(bot, context("hi"), generate)
+
+    assert generate.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_normalized_hit() -> None:
+    """Тест: одинаковые с точностью до регистра и пробелов вопросы получают сохранённый ответ"""
+    bot = await create_bot()
+    cache = ResponseCache(ResponseCacheSettings())
+    generate = Generator()
+
+    assert await cache.get_or_generate(bot, context("Where is my order?"), generate) == "answer 1"
+    assert await cache.get_or_generate(bot, context("  where is my   ORDER"), generate) == "answer 1"
+    assert generate.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_mongo_tier() -> None:
+    """Тест: ответ из Mongo доступен другому процессу с пустым кэшем в памяти"""
+    bot = await create_bot()
+    generate = Generator()
+
+    await ResponseCache(ResponseCacheSettings()).get_or_generate(bot, context("hi"), generate)
+    other_worker = ResponseCache(ResponseCacheSettings())
+    assert await other_worker.get_or_generate(bot, context("hi"), generate) == "answer 1"
+
+    assert generate.calls == 1
+    assert other_worker.stats().mongo_hits == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_coalesces_inflight() -> None:
+    """Тест: одновременные одинаковые запросы ждут одну генерацию"""
+    bot = await create_bot()
+    cache = ResponseCache(ResponseCacheSettings())
+    generate = Generator(delay=0.05)
+
+    responses = await asyncio.gather(*(cache.get_or_generate(bot, context("hi"), generate) for _ in range(5)))
+
+    assert responses == ["answer 1"] * 5
+    assert generate.calls == 1
+    assert cache.stats().coalesced == 4
+
+
+@pytest.mark.asyncio
+async def test_cache_key_ignores_summary() -> None:
+    """Тест: summary диалога не входит в ключ, и с context_messages, и без него"""
+    bot = await create_bot()
+    summary = ContextMessage(role=MessageRole.SYSTEM, text="earlier talk", timestamp=datetime.now(UTC))
+
+    assert cache_key(bot, [summary, *context("hello", "hi")]) == cache_key(bot, context("hello", "hi"))
+    bot.response_cache.context_messages = 1
+    assert cache_key(bot, [summary, *context("hi")]) == cache_key(bot, context("hi"))
+
+
+@pytest.mark.asyncio
+async def test_cache_key_last_messages() -> None:
+    """Тест: с context_messages ключ зависит только от последних сообщений"""
+    bot = await create_bot(context_messages=1)
+
+    assert cache_key(bot, context("hello", "hi")) == cache_key(bot, context("good morning", "hi"))
+    bot.response_cache.context_messages = None
+    assert cache_key(bot, context("hello", "hi")) != cache_key(bot, context("good morning", "hi"))
+
+
+@pytest.mark.asyncio
+async def test_cache_trim() -> None:
+    """Тест: при превышении лимита удаляются самые старые записи"""
+    bot = await create_bot()
+    cache = ResponseCache(ResponseCacheSettings(max_entries=2, trim_every=1))
+
+    for text in ("a", "b", "c"):
+        await cache.get_or_generate(bot, context(text), Generator())
+
+    assert await CachedResponse.count() == 2
+    assert cache.stats().mongo_evictions == 1
@@ -0,0 +1,193 @@
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import pytest
+from beanie import PydanticObjectId
+from starlette.requests import Request
+
+from app.schemas import IncomingMessage
+from app.services.dialogue_service import DialogueService
+from app.services.retention import ArchiveWriter, RetentionJob
+from core import settings
+from core.database.models.archive import ArchivedDialogue
+from core.database.models.chat_bot import ChatBot
+from core.database.models.dialogue import Dialogue, DialogueMessage, MessageRole
+
+CONFIG = settings.retention.model_copy(
+    update={"batch_pause": 0.0, "archive_chunk_messages": 2, "archive_after_days": 30.0, "trim_after_days": 7.0},
+)
+NOW = datetime.now(UTC)
+
+
+async def create_dialogue(chat_id: str, updated_at: datetime, count: int, **fields: Any) -> Dialogue:
+    dialogue = Dialogue(chat_bot_id=PydanticObjectId(), chat_id=chat_id, updated_at=updated_at, **fields)
+    await dialogue.insert()
+    await DialogueMessage.insert_many(
+        [
+            DialogueMessage(
+                dialogue_id=dialogue.id,
+                chat_bot_id=dialogue.chat_bot_id,
+                message_id=f"{chat_id}-{i}",
+                chat_id=chat_id,
+                text=f"message {i} " * 50,
+                role=MessageRole.USER,
+                timestamp=updated_at - timedelta(days=count - i),
+            )
+            for i in range(count)
+        ],
+    )
+    return dialogue
+
+
+@pytest.mark.asyncio
+async def test_idle_dialogue_moved_to_archive() -> None:
+    """Тест: давно неактивный диалог переносится в архив сжатыми частями, активный остаётся"""
+    idle = await create_dialogue("idle", NOW - timedelta(days=60), count=5)
+    active = await create_dialogue("active", NOW, count=1)
+
+    report = await RetentionJob(CONFIG).run_once()
+
+    assert report.archived_dialogues == 1
+    assert report.archived_messages == 5
+    assert 0 < report.archive_bytes < report.bytes_reclaimed
+    assert await Dialogue.get(idle.id) is None
+    assert await DialogueMessage.find(DialogueMessage.dialogue_id == idle.id).count() == 0
+    assert await Dialogue.get(active.id) is not None
+
+    parts = await ArchivedDialogue.find(ArchivedDialogue.dialogue_id == idle.id).sort("+part").to_list()
+    assert [part.messages for part in parts] == [2, 2, 1]
+    assert parts[0].dialogue is not None
+    assert parts[0].dialogue["chat_id"] == "idle"
+    messages = [message for part in parts for message in part.unpack()]
+    assert [message["message_id"] for message in messages] == [f"idle-{i}" for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_dialogue_revived_while_archiving_is_kept(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест: если в диалог пришло сообщение, пока писался архив, архив отбрасывается"""
+    dialogue = await create_dialogue("revived", NOW - timedelta(days=60), count=3)
+    add = ArchiveWriter.add
+
+    async def add_and_revive(self: ArchiveWriter, message: dict[str, Any]) -> None:
+        await add(self, message)
+        await Dialogue.get_motor_collection().update_one({"_id": dialogue.id}, {"$set": {"updated_at": NOW}})
+
+    monkeypatch.setattr(ArchiveWriter, "add", add_and_revive)
+
+    report = await RetentionJob(CONFIG).run_once()
+
+    assert report.archived_dialogues == 0
+    assert await DialogueMessage.find(DialogueMessage.dialogue_id == dialogue.id).count() == 3
+    assert await ArchivedDialogue.find_all().count() == 0
+
+
+@pytest.mark.asyncio
+async def test_interrupted_archive_is_completed() -> None:
+    """Тест: после прерванного прохода удаляются диалог и сообщения, уже записанные в архив"""
+    dialogue = await create_dialogue("interrupted", NOW - timedelta(days=60), count=3)
+    raw = await Dialogue.get_motor_collection().find_one({"_id": dialogue.id})
+    writer = ArchiveWriter(raw, CONFIG)
+    async for message in DialogueMessage.get_motor_collection().find({"dialogue_id": dialogue.id}).sort("timestamp"):
+        await writer.add(message)
+    await writer.flush()
+    await Dialogue.get_motor_collection().update_one({"_id": dialogue.id}, {"$set": {"archived_at": NOW}})
+
+    report = await RetentionJob(CONFIG).run_once()
+
+    assert report.archived_dialogues == 1
+    assert await Dialogue.get(dialogue.id) is None
+    assert await DialogueMessage.find(DialogueMessage.dialogue_id == dialogue.id).count() == 0
+    assert await ArchivedDialogue.find(ArchivedDialogue.dialogue_id == dialogue.id).count() == 2
+
+
+@pytest.mark.asyncio
+async def test_summarized_messages_are_trimmed() -> None:
+    """Тест: удаляются только старые сообщения, уже свёрнутые в summary"""
+    dialogue = await create_dialogue(
+        "summarized",
+        NOW,
+        count=20,
+        summary="summary",
+        summary_until=NOW - timedelta(days=5),
+    )
+    unsummarized = await create_dialogue("unsummarized", NOW, count=20)
+
+    report = await RetentionJob(CONFIG).run_once()
+
+    # Сообщения от 20 до 7 дней назад старше границы в 7 дней и свёрнуты в summary
+    assert report.trimmed_messages == 14
+    remaining = await DialogueMessage.find(DialogueMessage.dialogue_id == dialogue.id).count()
+    assert remaining == 6
+    assert await DialogueMessage.find(DialogueMessage.dialogue_id == unsummarized.id).count() == 20
+
+
+@pytest.mark.asyncio
+async def test_revived_dialogue_archive_is_appended() -> None:
+    """Тест: диалог, оживший после архивации, при повторной архивации дописывается, а не затирает архив"""
+    dialogue = await create_dialogue("twice", NOW - timedelta(days=90), count=3)
+    raw = await Dialogue.get_motor_collection().find_one({"_id": dialogue.id})
+    writer = ArchiveWriter(raw, CONFIG)
+    async for message in DialogueMessage.get_motor_collection().find({"dialogue_id": dialogue.id}).sort("timestamp"):
+        await writer.add(message)
+    await writer.flush()
+    # Первая архивация записала и удалила старые сообщения, но диалог ожил до удаления
+    await ArchivedDialogue.find(ArchivedDialogue.dialogue_id == dialogue.id).update({"$set": {"committed": True}})
+    await DialogueMessage.find(DialogueMessage.dialogue_id == dialogue.id).delete()
+    await DialogueMessage.insert_many(
+        [
+            DialogueMessage(
+                dialogue_id=dialogue.id,
+                chat_bot_id=dialogue.chat_bot_id,
+                message_id=f"twice-new-{i}",
+                chat_id="twice",
+                text="new",
+                role=MessageRole.USER,
+                timestamp=NOW - timedelta(days=60, minutes=-i),
+            )
+            for i in range(2)
+        ],
+    )
+
+    report = await RetentionJob(CONFIG).run_once()
+
+    assert report.archived_dialogues == 1
+    parts = await ArchivedDialogue.find(ArchivedDialogue.dialogue_id == dialogue.id).sort("+part").to_list()
+    assert [part.part for part in parts] == [0, 1, 2]
+    assert all(part.committed for part in parts)
+    messages = [message["message_id"] for part in parts for message in part.unpack()]
+    assert messages == ["twice-0", "twice-1", "twice-2", "twice-new-0", "twice-new-1"]
+    assert parts[2].dialogue is not None
+
+
+@pytest.mark.asyncio
+async def test_dialogue_revived_after_interrupted_pass_is_archived_whole() -> None:
+    """Тест: диалог, оживший после прохода, прерванного сразу за пометкой, архивируется заново без сирот"""
+    dialogue = await create_dialogue("crashed", NOW - timedelta(days=60), count=3)
+    raw = await Dialogue.get_motor_collection().find_one({"_id": dialogue.id})
+    writer = ArchiveWriter(raw, CONFIG)
+    async for message in DialogueMessage.get_motor_collection().find({"dialogue_id": dialogue.id}).sort("timestamp"):
+        await writer.add(message)
+    await writer.flush()
+    await Dialogue.get_motor_collection().update_one({"_id": dialogue.id}, {"$set": {"archived_at": NOW}})
+
+    # Процесс упал после пометки, затем в чат пришло новое сообщение
+    service = DialogueService(Request({"type": "http", "headers": []}))
+    bot = ChatBot(id=dialogue.chat_bot_id, name="Retention Bot", secret_token="retention-token")  # noqa: S106
+    incoming = IncomingMessage(message_id="crashed-new", chat_id="crashed", text="back", message_sender="customer")
+    revived = await service.get_or_create_dialogue(bot, incoming)
+    assert revived.archived_at is None
+    await service.save_message(service.build_message(bot, revived, incoming))
+
+    # Диалог снова простаивает
+    await Dialogue.get_motor_collection().update_one(
+        {"_id": dialogue.id},
+        {"$set": {"updated_at": NOW - timedelta(days=40)}},
+    )
+    report = await RetentionJob(CONFIG).run_once()
+
+    assert report.archived_dialogues == 1
+    assert await DialogueMessage.find(DialogueMessage.dialogue_id == dialogue.id).count() == 0
+    parts = await ArchivedDialogue.find(ArchivedDialogue.dialogue_id == dialogue.id).sort("+part").to_list()
+    assert all(part.committed for part in parts)
+    messages = [message["message_id"] for part in parts for message in part.unpack()]
+    assert messages == ["crashed-0", "crashed-1", "crashed-2", "crashed-new"]
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+import uvicorn
+
+import main
+from core.settings_model import ServerSettings
+
+
+def test_server_options_auto(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Тест: воркеры по числу CPU, uvloop и httptools выбираются, только если установлены"""
+    monkeypatch.setattr(main, "find_spec", lambda name: object() if name == "uvloop" else None)
+
+    options = main.server_options(ServerSettings(workers=0, limit_concurrency=500))
+
+    assert options["workers"] == os.process_cpu_count()
+    assert options["loop"] == "uvloop"
+    assert options["http"] == "h11"
+    assert options["limit_concurrency"] == 500
+
+
+def test_server_options_accepted_by_uvicorn() -> None:
+    """Тест: все параметры профиля понимает uvicorn"""
+    options = main.server_options(ServerSettings(workers=2, loop="asyncio", http="h11", backlog=4096))
+
+    config = uvicorn.Config("app.app:app", **options)
+
+    assert config.workers == 2
+    assert config.backlog == 4096
+    assert config.timeout_graceful_shutdown == 30
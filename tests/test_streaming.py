@@ -0,0 +1,86 @@
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+
+from app.services.channel_service import DeliveryResult, stream_to_channel
+from app.services.circuit_breaker import channel_breakers
+from core import settings
+from core.database.models.channel import Channel, DeliveryMode
+from core.settings_model import StreamingSettings
+
+
+async def chunks() -> AsyncIterator[str]:
+    for chunk in ("New ", "message ", "from ", "llm"):
+        yield chunk
+
+
+@pytest.fixture
+def sent_events(monkeypatch: pytest.MonkeyPatch) -> list[dict[str, Any]]:
+    sent: list[dict[str, Any]] = []
+
+    async def fake_send_to_channel(url: str, token: str, payload: dict[str, Any], **kwargs: Any) -> DeliveryResult:
+        sent.append(payload)
+        return DeliveryResult(success=True, status_code=200)
+
+    monkeypatch.setattr("app.services.channel_service.send_to_channel", fake_send_to_channel)
+    return sent
+
+
+def make_channel(delivery_mode: DeliveryMode) -> Channel:
+    return Channel(
+        bot_id="bot-123",
+        channel_url="http://example.com/webhook",
+        channel_token="chan-token",  # noqa: S106
+        delivery_mode=delivery_mode,
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_partial_messages(sent_events: list[dict[str, Any]]) -> None:
+    """Тест: в режиме partial канал получает накопленный текст по мере генерации"""
+    channel = make_channel(DeliveryMode.PARTIAL)
+
+    text = await stream_to_channel(channel, "chat1", chunks(), StreamingSettings(partial_interval=0))
+
+    assert text == "New message from llm"
+    assert sent_events
+    assert sent_events[0] == {"event_type": "partial_message", "chat_id": "chat1", "text": "New ", "sequence": 1}
+    assert all(event["event_type"] == "partial_message" for event in sent_events)
+
+
+@pytest.mark.asyncio
+async def test_stream_typing_is_throttled(sent_events: list[dict[str, Any]]) -> None:
+    """Тест: события набора отправляются не чаще интервала"""
+    channel = make_channel(DeliveryMode.TYPING)
+
+    text = await stream_to_channel(channel, "chat1", chunks(), StreamingSettings(typing_interval=60))
+
+    assert text == "New message from llm"
+    assert sent_events == [{"event_type": "typing", "chat_id": "chat1"}]
+
+
+@pytest.mark.asyncio
+async def test_stream_message_mode_sends_nothing(sent_events: list[dict[str, Any]]) -> None:
+    """Тест: в режиме message промежуточных событий нет"""
+    channel = make_channel(DeliveryMode.MESSAGE)
+
+    text = await stream_to_channel(channel, "chat1", chunks(), StreamingSettings())
+
+    assert text == "New message from llm"
+    assert sent_events == []
+
+
+@pytest.mark.asyncio
+async def test_stream_skips_events_while_breaker_open(sent_events: list[dict[str, Any]]) -> None:
+    """Тест: пока предохранитель канала разомкнут, промежуточные события не отправляются"""
+    channel = make_channel(DeliveryMode.PARTIAL)
+    breaker = channel_breakers.get(channel.channel_url)
+    for _ in range(settings.circuit_breaker.failure_threshold):
+        breaker.record_failure()
+
+    text = await stream_to_channel(channel, "chat1", chunks(), StreamingSettings(partial_interval=0))
+
+    assert text == "New message from llm"
+    assert sent_events == []
+    assert breaker.rejected == 0